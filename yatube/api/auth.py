@@ -0,0 +1,26 @@
+from django.contrib.auth.models import AnonymousUser
+
+from .models import Token
+
+KEYWORD = 'Token'
+
+
+class AuthenticationFailed(Exception):
+    pass
+
+
+def authenticate(request):
+    """Пользователь по заголовку ``Authorization: Token <key>``.
+
+    Сессию API не читает: без cookie не нужна и защита от CSRF.
+    """
+    header = request.META.get('HTTP_AUTHORIZATION', '').split()
+    if not header:
+        return AnonymousUser()
+    if len(header) != 2 or header[0] != KEYWORD:
+        raise AuthenticationFailed('Ожидается заголовок "Token <ключ>"')
+    token = (Token.objects.select_related('user')
+             .filter(key=header[1]).first())
+    if token is None or not token.user.is_active:
+        raise AuthenticationFailed('Неверный токен')
+    return token.user
@@ -0,0 +1,114 @@
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.http import Http404, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+
+from posts.utils import CURSOR_PARAM, CursorPaginator
+
+from .auth import AuthenticationFailed, authenticate
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+LIMIT_PARAM = 'limit'
+FIELDS_PARAM = 'fields'
+
+
+class BadRequest(Exception):
+    pass
+
+
+def respond(data, status=200, **kwargs):
+    return JsonResponse(data, status=status, safe=False,
+                        json_dumps_params={'ensure_ascii': False}, **kwargs)
+
+
+def error(status, detail, **extra):
+    return respond({'detail': detail, **extra}, status=status)
+
+
+def api_view(*methods, anonymous=False):
+    """JSON-ошибки, проверка метода и токен вместо сессии.
+
+    Изменяющие методы требуют авторизации, если не указано ``anonymous``.
+    """
+    def decorator(view):
+        @csrf_exempt
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method not in methods:
+                response = error(405, 'Метод не разрешён')
+                response['Allow'] = ', '.join(methods)
+                return response
+            try:
+                request.user = authenticate(request)
+            except AuthenticationFailed as exc:
+                return error(401, str(exc))
+            if (request.method not in SAFE_METHODS and not anonymous
+                    and not request.user.is_authenticated):
+                return error(401, 'Нужна авторизация')
+            try:
+                return view(request, *args, **kwargs)
+            except Http404:
+                return error(404, 'Не найдено')
+            except BadRequest as exc:
+                return error(400, str(exc))
+        return wrapped
+    return decorator
+
+
+def request_data(request):
+    """Данные запроса из JSON или формы и файлы (только у формы)."""
+    if request.content_type != 'application/json':
+        return request.POST, request.FILES
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        raise BadRequest('Некорректный JSON')
+    if not isinstance(data, dict):
+        raise BadRequest('Ожидается JSON-объект')
+    return data, None
+
+
+def form_errors(form):
+    return error(400, 'Ошибка в данных', errors=form.errors.get_json_data())
+
+
+def page_size(request):
+    try:
+        limit = int(request.GET.get(LIMIT_PARAM, settings.API_PAGE_SIZE))
+    except ValueError:
+        raise BadRequest('limit должен быть числом')
+    return max(1, min(limit, settings.API_MAX_PAGE_SIZE))
+
+
+def _page_link(request, cursor):
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params[CURSOR_PARAM] = cursor
+    return request.build_absolute_uri(
+        '%s?%s' % (request.path, params.urlencode()))
+
+
+def paginated(request, queryset, serializer_class, ordering):
+    """Страница по курсору: ``results``, ``next`` и ``previous``."""
+    serializer = serializer_class(request, request.GET.get(FIELDS_PARAM))
+    fields = [field.lstrip('-') for field in ordering]
+    paginator = CursorPaginator(serializer.optimize(queryset, fields),
+                                per_page=page_size(request),
+                                ordering=ordering)
+    page = paginator.page(request.GET.get(CURSOR_PARAM))
+    return respond({
+        'results': [serializer.dump(obj) for obj in page],
+        'next': _page_link(request, page.next_cursor),
+        'previous': _page_link(request, page.previous_cursor),
+    })
+
+
+def detail(request, queryset, serializer_class, status=200, **lookup):
+    serializer = serializer_class(request, request.GET.get(FIELDS_PARAM))
+    obj = serializer.optimize(queryset).filter(**lookup).first()
+    if obj is None:
+        raise Http404
+    return respond(serializer.dump(obj), status=status)
@@ -0,0 +1,161 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+from ..models import Token
+
+User = get_user_model()
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader',
+                                            password='secret')
+        cls.author = User.objects.create_user(
+            username='author', first_name='Имя', last_name='Фамилия')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.post = Post.objects.create(text='Первый пост', author=cls.author,
+                                       group=cls.group)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        self.client = Client()
+        self.auth = {'HTTP_AUTHORIZATION': 'Token %s' % self.token.key}
+
+    def post_json(self, url, data, **extra):
+        return self.client.post(url, json.dumps(data),
+                                content_type='application/json', **extra)
+
+    def test_obtain_token(self):
+        response = self.post_json(reverse('api:token'), {
+            'username': 'reader', 'password': 'secret'})
+        self.assertEqual(response.json(), {'token': self.token.key})
+        response = self.post_json(reverse('api:token'), {
+            'username': 'reader', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_post_list_embeds_author_and_group(self):
+        response = self.client.get(reverse('api:posts'))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertIsNone(data['next'])
+        post = data['results'][0]
+        self.assertEqual(post['text'], 'Первый пост')
+        self.assertEqual(post['author'], {
+            'id': self.author.pk, 'username': 'author',
+            'first_name': 'Имя', 'last_name': 'Фамилия'})
+        self.assertEqual(post['group']['slug'], 'group')
+        self.assertEqual(post['comments_count'], 0)
+
+    def test_sparse_fieldsets(self):
+        response = self.client.get(reverse('api:posts'),
+                                   {'fields': 'id,text'})
+        self.assertEqual(response.json()['results'],
+                         [{'id': self.post.pk, 'text': 'Первый пост'}])
+        response = self.client.get(reverse('api:posts'),
+                                   {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_page_of_100_queries(self):
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=self.author, group=self.group)
+            for i in range(120))
+        # Посты с автором и группой плюс один prefetch вариантов картинок.
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('api:posts'), {'limit': 100})
+        self.assertEqual(len(response.json()['results']), 100)
+        with self.assertNumQueries(1):
+            self.client.get(reverse('api:posts'),
+                            {'limit': 100, 'fields': 'id,author,group'})
+
+    def test_cursor_pagination(self):
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=self.author) for i in range(4))
+        seen = []
+        url = reverse('api:posts') + '?limit=2&fields=id'
+        while url:
+            data = self.client.get(url).json()
+            seen.extend(post['id'] for post in data['results'])
+            url = data['next']
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(len(set(seen)), 5)
+
+    def test_filters(self):
+        Post.objects.create(text='Без группы', author=self.user)
+        response = self.client.get(reverse('api:posts'), {'group': 'group'})
+        self.assertEqual([post['id'] for post in response.json()['results']],
+                         [self.post.pk])
+        response = self.client.get(reverse('api:posts'), {'author': 'reader'})
+        self.assertEqual(response.json()['results'][0]['text'], 'Без группы')
+
+    def test_create_post_requires_token(self):
+        url = reverse('api:posts')
+        self.assertEqual(self.post_json(url, {'text': 'x'}).status_code, 401)
+        response = self.post_json(url, {'text': 'x'},
+                                  HTTP_AUTHORIZATION='Token wrong')
+        self.assertEqual(response.status_code, 401)
+        response = self.post_json(
+            url, {'text': 'Из API', 'group': self.group.pk}, **self.auth)
+        self.assertEqual(response.status_code, 201)
+        created = Post.objects.get(text='Из API')
+        self.assertEqual(created.author, self.user)
+        self.assertEqual(response.json()['id'], created.pk)
+        self.assertTrue(response['Location'].endswith(
+            reverse('api:post', args=[created.pk])))
+
+    def test_create_post_validation(self):
+        response = self.post_json(reverse('api:posts'), {'group': 999},
+                                  **self.auth)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('text', response.json()['errors'])
+
+    def test_comments(self):
+        url = reverse('api:post_comments', args=[self.post.pk])
+        response = self.post_json(url, {'text': 'Комментарий'}, **self.auth)
+        self.assertEqual(response.status_code, 201)
+        comment = Comment.objects.get()
+        self.assertEqual(comment.author, self.user)
+        data = self.client.get(url).json()
+        self.assertEqual(data['results'][0]['author']['username'], 'reader')
+        response = self.client.get(reverse('api:comment', args=[comment.pk]))
+        self.assertEqual(response.json()['post'], self.post.pk)
+
+    def test_groups(self):
+        response = self.client.get(reverse('api:group', args=['group']))
+        self.assertEqual(response.json()['title'], 'Группа')
+        data = {'title': 'Новая', 'slug': 'new', 'description': '...'}
+        response = self.post_json(reverse('api:groups'), data, **self.auth)
+        self.assertEqual(response.status_code, 403)
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        response = self.post_json(reverse('api:groups'), data, **self.auth)
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Group.objects.filter(slug='new').exists())
+
+    def test_follows(self):
+        url = reverse('api:follows')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        response = self.post_json(url, {'author': 'author'}, **self.auth)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['author']['username'], 'author')
+        response = self.post_json(url, {'author': 'author'}, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        response = self.post_json(url, {'author': 'reader'}, **self.auth)
+        self.assertEqual(response.status_code, 400)
+        follows = self.client.get(url, **self.auth).json()['results']
+        self.assertEqual(len(follows), 1)
+        response = self.client.delete(
+            reverse('api:follow', args=[follows[0]['id']]), **self.auth)
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_not_found_and_method(self):
+        response = self.client.get(reverse('api:post', args=[999]))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['detail'], 'Не найдено')
+        response = self.client.delete(reverse('api:posts'))
+        self.assertEqual(response.status_code, 405)
@@ -0,0 +1,142 @@
+from django.contrib.auth import authenticate
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+
+from core.db_router import read_only
+from posts.forms import CommentForm, GroupForm, PostForm
+from posts.models import Comment, Follow, Group, Post, User
+from posts.utils import FEED_ORDERING
+
+from .http import (api_view, detail, error, form_errors, paginated,
+                   request_data, respond)
+from .models import Token
+from .serializers import (CommentSerializer, FollowSerializer,
+                          GroupSerializer, PostSerializer)
+
+COMMENT_ORDERING = ('pub_date', 'id')
+GROUP_ORDERING = ('id',)
+FOLLOW_ORDERING = ('-id',)
+
+
+def _created(request, serializer_class, obj, url_name, url_arg=None):
+    response = detail(request, obj._meta.model.objects, serializer_class,
+                      status=201, pk=obj.pk)
+    response['Location'] = request.build_absolute_uri(
+        reverse(url_name, args=[url_arg or obj.pk]))
+    return response
+
+
+@api_view('POST', anonymous=True)
+def obtain_token(request):
+    data, _ = request_data(request)
+    user = authenticate(request, username=data.get('username'),
+                        password=data.get('password'))
+    if user is None:
+        return error(400, 'Неверное имя пользователя или пароль')
+    token, _ = Token.objects.get_or_create(user=user)
+    return respond({'token': token.key})
+
+
+@read_only
+@api_view('GET', 'POST')
+def posts(request):
+    if request.method == 'POST':
+        data, files = request_data(request)
+        form = PostForm(data, files)
+        if not form.is_valid():
+            return form_errors(form)
+        post = form.save(commit=False)
+        post.author = request.user
+        post.save()
+        return _created(request, PostSerializer, post, 'api:post')
+    queryset = Post.objects.all()
+    if request.GET.get('group'):
+        queryset = queryset.filter(group__slug=request.GET['group'])
+    if request.GET.get('author'):
+        queryset = queryset.filter(author__username=request.GET['author'])
+    return paginated(request, queryset, PostSerializer, FEED_ORDERING)
+
+
+@read_only
+@api_view('GET')
+def post(request, post_id):
+    return detail(request, Post.objects, PostSerializer, pk=post_id)
+
+
+@read_only
+@api_view('GET', 'POST')
+def post_comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    if request.method == 'POST':
+        data, _ = request_data(request)
+        form = CommentForm(data)
+        if not form.is_valid():
+            return form_errors(form)
+        comment = form.save(commit=False)
+        comment.author = request.user
+        comment.post = post
+        comment.save()
+        return _created(request, CommentSerializer, comment, 'api:comment')
+    return paginated(request, Comment.objects.filter(post=post),
+                     CommentSerializer, COMMENT_ORDERING)
+
+
+@read_only
+@api_view('GET')
+def comment(request, comment_id):
+    return detail(request, Comment.objects, CommentSerializer, pk=comment_id)
+
+
+@read_only
+@api_view('GET', 'POST')
+def groups(request):
+    if request.method == 'POST':
+        # Как и в HTML-интерфейсе, группы заводят только сотрудники.
+        if not request.user.is_staff:
+            return error(403, 'Недостаточно прав')
+        data, _ = request_data(request)
+        form = GroupForm(data)
+        if not form.is_valid():
+            return form_errors(form)
+        group = form.save()
+        return _created(request, GroupSerializer, group, 'api:group',
+                        group.slug)
+    return paginated(request, Group.objects.all(), GroupSerializer,
+                     GROUP_ORDERING)
+
+
+@read_only
+@api_view('GET')
+def group(request, slug):
+    return detail(request, Group.objects, GroupSerializer, slug=slug)
+
+
+@api_view('GET', 'POST')
+def follows(request):
+    if not request.user.is_authenticated:
+        return error(401, 'Нужна авторизация')
+    if request.method == 'POST':
+        data, _ = request_data(request)
+        author = get_object_or_404(User, username=data.get('author'))
+        if author == request.user:
+            return error(400, 'Нельзя подписаться на себя')
+        follow, created = Follow.objects.get_or_create(
+            user=request.user, author=author)
+        response = _created(request, FollowSerializer, follow, 'api:follow')
+        if not created:
+            response.status_code = 200
+        return response
+    return paginated(request, Follow.objects.filter(user=request.user),
+                     FollowSerializer, FOLLOW_ORDERING)
+
+
+@api_view('GET', 'DELETE')
+def follow(request, follow_id):
+    if not request.user.is_authenticated:
+        return error(401, 'Нужна авторизация')
+    queryset = Follow.objects.filter(user=request.user)
+    if request.method == 'DELETE':
+        get_object_or_404(queryset, pk=follow_id).delete()
+        return HttpResponse(status=204)
+    return detail(request, queryset, FollowSerializer, pk=follow_id)
@@ -0,0 +1,5 @@
+from core import testing
+
+
+def pytest_configure(config):
+    testing.configure()
@@ -0,0 +1,168 @@
+"""ASGI-обёртка над WSGI-приложением Django.
+
+В Django 2.2 нет своего ASGI-обработчика, а представления синхронные.
+``WsgiToAsgi`` принимает соединения в цикле событий и исполняет само
+приложение в пуле из ``threads`` потоков. Соединений может быть намного
+больше, чем потоков: медленный клиент, пока шлёт тело запроса или
+читает ответ, ждёт в цикле событий и не держит поток. Потоки заняты,
+только пока работает Django, и число одновременных обращений к базе
+ограничено размером пула.
+
+Ответ отдаётся по частям, как его выдаёт приложение, поэтому потоковые
+ответы (выгрузка постов) не собираются в памяти. Ответ с
+``async_streaming_content`` (поток SSE, ``core.sse``) читается прямо в
+цикле событий и поток пула не держит; закончится он, когда иссякнет или
+когда клиент отключится. Чтобы представления знали, что такой поток
+здесь можно открыть, в окружение запроса кладётся ``ASYNC_STREAMS``.
+"""
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections
+
+ASYNC_STREAMS = 'yatube.async_streams'
+
+
+def environ(scope, body):
+    """WSGI-окружение для HTTP-запроса ASGI."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    result = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        # WSGI передаёт путь байтами, раскодированными как latin-1.
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/%s' % scope.get('http_version', '1.1'),
+        'REMOTE_ADDR': client[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+        ASYNC_STREAMS: True,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = 'HTTP_' + name
+        value = value.decode('latin-1')
+        if name in result:
+            value = result[name] + ',' + value
+        result[name] = value
+    return result
+
+
+class WsgiToAsgi:
+    def __init__(self, wsgi_application, threads=32):
+        self.wsgi_application = wsgi_application
+        self.executor = ThreadPoolExecutor(max_workers=threads,
+                                           thread_name_prefix='asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+        else:
+            raise ValueError('Неподдерживаемый тип соединения %r'
+                             % scope['type'])
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def http(self, scope, receive, send):
+        body = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body.append(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(
+            self.executor, self.run, environ(scope, b''.join(body)),
+            loop, send)
+        if response is not None:
+            await self.stream(response, receive, send)
+
+    async def stream(self, response, receive, send):
+        async def pump():
+            async for chunk in response.async_streaming_content():
+                await send({'type': 'http.response.body', 'body': chunk,
+                            'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+
+        async def disconnect():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        tasks = [asyncio.ensure_future(pump()),
+                 asyncio.ensure_future(disconnect())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.get_running_loop().run_in_executor(
+                self.executor, response.close)
+
+    def run(self, environ, loop, send):
+        """Исполняется в потоке пула; сообщения отправляет циклу событий
+        и ждёт их отправки, так что медленный клиент тормозит выдачу.
+        Асинхронный поток возвращает, не читая, — его ведёт ``stream``."""
+        def emit(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and response.get('sent'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            response['start'] = {
+                'type': 'http.response.start',
+                'status': int(status.split(' ', 1)[0]),
+                'headers': [(name.lower().encode('latin-1'),
+                             value.encode('latin-1'))
+                            for name, value in headers],
+            }
+
+        def start():
+            if not response.get('sent'):
+                emit(response['start'])
+                response['sent'] = True
+
+        result = self.wsgi_application(environ, start_response)
+        if hasattr(result, 'async_streaming_content'):
+            start()
+            # close() ответа позовут из другого потока пула, а соединение
+            # с базой у этого потока своё.
+            close_old_connections()
+            return result
+        try:
+            for chunk in result:
+                if chunk:
+                    start()
+                    emit({'type': 'http.response.body', 'body': chunk,
+                          'more_body': True})
+            start()
+            emit({'type': 'http.response.body', 'body': b''})
+        finally:
+            # Django закрывает соединения с базой по сигналу
+            # request_finished, который шлёт close() ответа.
+            if hasattr(result, 'close'):
+                result.close()
@@ -0,0 +1,240 @@
+"""Бэкенд кеша Django поверх протокола Redis (RESP).
+
+Зависимостей нет: клиент говорит с сервером через сокет напрямую, поэтому
+бэкенд работает и с настоящим Redis, и с совместимыми серверами, включая
+встроенный ``core.resp_server`` для локальной разработки и тестов.
+Целые числа хранятся как есть, чтобы ``incr`` выполнялся сервером
+атомарно, остальные значения сериализуются pickle.
+"""
+import pickle
+import select
+import socket
+from urllib.parse import urlparse
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+# Проверка и увеличение одной командой: INCRBY сам создал бы истёкший
+# ключ заново, уже без срока.
+INCR_SCRIPT = ("if redis.call('EXISTS', KEYS[1]) == 1 then "
+               "return redis.call('INCRBY', KEYS[1], ARGV[1]) end")
+
+
+class RedisError(Exception):
+    pass
+
+
+def _retryable(args):
+    """Повтор команды, которую сервер, возможно, уже выполнил, ничего
+    не испортит. INCRBY и EVAL увеличили бы счётчик дважды, SET NX
+    ответил бы, что ключ уже есть."""
+    command = args[0].upper()
+    if command == 'SET':
+        return 'NX' not in args[3:]
+    return command in ('GET', 'MGET', 'EXISTS', 'DEL', 'PEXPIRE',
+                       'PERSIST', 'PTTL', 'FLUSHDB', 'PING')
+
+
+class RespClient:
+    def __init__(self, host, port, db=0, password=None, socket_timeout=5):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.socket_timeout = socket_timeout
+        self._sock = None
+        self._file = None
+
+    def connect(self):
+        self._sock = socket.create_connection(
+            (self.host, self.port), timeout=self.socket_timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._file = self._sock.makefile('rb')
+        if self.password:
+            self._call('AUTH', self.password)
+        if self.db:
+            self._call('SELECT', self.db)
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._file.close()
+                self._sock.close()
+            finally:
+                self._sock = self._file = None
+
+    def execute(self, *args):
+        if self._sock is not None and self._closed_by_server():
+            self.close()
+        if self._sock is None:
+            self.connect()
+        try:
+            return self._call(*args)
+        except (OSError, EOFError):
+            # Ответа нет, а команда могла выполниться: повторяем её один
+            # раз на новом сокете, только если это безопасно.
+            self.close()
+            if not _retryable(args):
+                raise
+            self.connect()
+            return self._call(*args)
+
+    def _closed_by_server(self):
+        # Между командами сокет читается, только если сервер закрыл
+        # простаивавшее соединение: тогда переподключаемся до отправки.
+        return bool(select.select([self._sock], [], [], 0)[0])
+
+    def _call(self, *args):
+        self._sock.sendall(self._pack(args))
+        return self._read()
+
+    @staticmethod
+    def _pack(args):
+        chunks = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            if isinstance(arg, str):
+                arg = arg.encode()
+            elif isinstance(arg, int):
+                arg = b'%d' % arg
+            chunks.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        return b''.join(chunks)
+
+    def _read(self):
+        line = self._file.readline()
+        if not line:
+            raise EOFError('Соединение с сервером кеша закрыто')
+        kind, payload = line[:1], line[1:-2]
+        if kind == b'+':
+            return payload.decode()
+        if kind == b'-':
+            raise RedisError(payload.decode())
+        if kind == b':':
+            return int(payload)
+        if kind == b'$':
+            length = int(payload)
+            if length == -1:
+                return None
+            data = self._file.read(length + 2)
+            return data[:-2]
+        if kind == b'*':
+            length = int(payload)
+            if length == -1:
+                return None
+            return [self._read() for _ in range(length)]
+        raise RedisError('Неизвестный ответ сервера: %r' % line)
+
+
+class RedisCache(BaseCache):
+    def __init__(self, server, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        url = urlparse(server if '://' in server else 'redis://' + server)
+        self._client = RespClient(
+            url.hostname or '127.0.0.1',
+            url.port or 6379,
+            db=int(url.path.lstrip('/') or 0),
+            password=url.password,
+            socket_timeout=options.get('SOCKET_TIMEOUT', 5),
+        )
+
+    def get_backend_timeout(self, timeout=DEFAULT_TIMEOUT):
+        """Относительный срок в секундах, None — бессрочно, -1 — сразу."""
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return None
+        return timeout if timeout > 0 else -1
+
+    def _encode(self, value):
+        if isinstance(value, int) and not isinstance(value, bool):
+            return b'%d' % value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _decode(data):
+        if data is None:
+            return None
+        if data[:1] == b'\x80':
+            return pickle.loads(data)
+        return int(data)
+
+    def _expiry_args(self, timeout):
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is None:
+            return []
+        return ['PX', max(int(timeout * 1000), 1)]
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        if self.get_backend_timeout(timeout) == -1:
+            return False
+        return self._client.execute(
+            'SET', key, self._encode(value), 'NX',
+            *self._expiry_args(timeout)) is not None
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        value = self._decode(self._client.execute('GET', key))
+        return default if value is None else value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        if self.get_backend_timeout(timeout) == -1:
+            self._client.execute('DEL', key)
+            return
+        self._client.execute('SET', key, self._encode(value),
+                             *self._expiry_args(timeout))
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is None:
+            return bool(self._client.execute('PERSIST', key)
+                        or self._client.execute('EXISTS', key))
+        if timeout == -1:
+            return bool(self._client.execute('DEL', key))
+        return bool(self._client.execute(
+            'PEXPIRE', key, max(int(timeout * 1000), 1)))
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._client.execute('DEL', key)
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        if not keys:
+            return {}
+        made = [self.make_key(key, version=version) for key in keys]
+        values = self._client.execute('MGET', *made)
+        return {key: self._decode(value)
+                for key, value in zip(keys, values) if value is not None}
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        return bool(self._client.execute('EXISTS', key))
+
+    def incr(self, key, delta=1, version=None):
+        made = self.make_key(key, version=version)
+        try:
+            value = self._client.execute('EVAL', INCR_SCRIPT, 1, made, delta)
+        except RedisError:
+            raise ValueError("Key '%s' is not an integer" % key)
+        if value is None:
+            raise ValueError("Key '%s' not found" % key)
+        return value
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_key(key, version=version) for key in keys]
+        if keys:
+            self._client.execute('DEL', *keys)
+
+    def clear(self):
+        self._client.execute('FLUSHDB')
+
+    def close(self, **kwargs):
+        # Соединение держится между запросами, как у memcached-бэкендов.
+        pass
@@ -0,0 +1,58 @@
+"""Cache-aside с защитой от «набега» на пересчёт.
+
+``get_or_compute`` хранит рядом со значением время его вычисления и
+логический срок жизни. Незадолго до истечения срока запросы с
+вероятностью, растущей к концу срока, начинают пересчёт заранее
+(алгоритм XFetch), а блокировка в самом кеше гарантирует, что пересчитывает
+только один процесс: остальные в это время отдают прежнее значение.
+Если значения нет совсем, ожидающие ждут результата владельца
+блокировки не дольше ``lock_timeout`` секунд.
+"""
+import math
+import random
+import time
+
+from django.core.cache import cache as default_cache
+
+LOCK_KEY = '%s:lock'
+POLL_INTERVAL = 0.05
+
+
+def _should_refresh(delta, expires_at, beta):
+    jitter = -delta * beta * math.log(1 - random.random())
+    return time.time() + jitter >= expires_at
+
+
+def get_or_compute(key, compute, timeout, cache=None, lock_timeout=10,
+                   beta=1.0):
+    cache = cache or default_cache
+    entry = cache.get(key)
+    if entry is not None:
+        value, delta, expires_at = entry
+        if not _should_refresh(delta, expires_at, beta):
+            return value
+        if not cache.add(LOCK_KEY % key, 1, lock_timeout):
+            return value
+        return _compute(key, compute, timeout, cache)
+    if cache.add(LOCK_KEY % key, 1, lock_timeout):
+        return _compute(key, compute, timeout, cache)
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+        if cache.add(LOCK_KEY % key, 1, lock_timeout):
+            return _compute(key, compute, timeout, cache)
+    return compute()
+
+
+def _compute(key, compute, timeout, cache):
+    try:
+        started = time.time()
+        value = compute()
+        delta = time.time() - started
+        cache.set(key, (value, delta, time.time() + timeout), timeout)
+        return value
+    finally:
+        cache.delete(LOCK_KEY % key)
@@ -0,0 +1,36 @@
+"""Настройка соединений с базой.
+
+Django 2.2 не проверяет, живо ли постоянное соединение, прежде чем
+отдать его следующему запросу, и не умеет задавать PRAGMA для SQLite в
+настройках. Оба действия повешены на сигналы.
+"""
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute('PRAGMA %s = %s' % (name, value))
+
+
+@receiver(request_started)
+def check_connections(**kwargs):
+    """Закрывает постоянные соединения, которые порвала база или сеть.
+
+    Срабатывает после ``close_old_connections``, так что проверяются
+    только соединения, которые Django собирается переиспользовать.
+    """
+    for connection in connections.all():
+        if (connection.connection is None
+                or connection.in_atomic_block
+                or not connection.settings_dict.get('CONN_HEALTH_CHECKS')):
+            continue
+        if not connection.is_usable():
+            connection.close()
@@ -0,0 +1,114 @@
+"""Чтение с реплик для страниц, которые только читают.
+
+Представление помечается декоратором ``read_only``. Такой GET-запрос
+целиком читает с одной реплики из ``REPLICA_DATABASES`` (реплики
+выбираются по кругу от запроса к запросу): реплики отстают по-разному,
+и страница из двух не была бы согласованной. Всё остальное (записи,
+прочие представления, команды, фоновые потоки) идёт в ``default``.
+
+Реплика отстаёт от основной базы, поэтому после записи клиент
+``REPLICA_PIN_SECONDS`` секунд читает с основной базы: свой комментарий
+он увидит сразу. Браузер привязывается cookie ``REPLICA_PIN_COOKIE``,
+клиент API, который cookie не хранит, — по заголовку Authorization:
+отметка о записи лежит в кеше под хешем заголовка.
+"""
+import hashlib
+import itertools
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PIN_KEY = 'replica-pin:%s'
+
+_state = threading.local()
+_counter = itertools.count()
+
+
+def read_only(view):
+    """Помечает представление, которое можно обслуживать с реплики."""
+    view.read_only = True
+    return view
+
+
+def current_replica():
+    """Реплика текущего запроса или None."""
+    return getattr(_state, 'replica', None)
+
+
+def choose_replica():
+    replicas = settings.REPLICA_DATABASES
+    if not replicas:
+        return None
+    return replicas[next(_counter) % len(replicas)]
+
+
+def _pin_key(request):
+    authorization = request.META.get('HTTP_AUTHORIZATION')
+    if not authorization:
+        return None
+    return PIN_KEY % hashlib.sha256(authorization.encode()).hexdigest()
+
+
+def is_pinned(request):
+    if settings.REPLICA_PIN_COOKIE in request.COOKIES:
+        return True
+    key = _pin_key(request)
+    return key is not None and cache.get(key) is not None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return current_replica() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Включает реплики для помеченных представлений и ставит cookie
+    привязки к основной базе после запросов, которые что-то записали.
+
+    Должен стоять перед SessionMiddleware, чтобы увидеть и запись сессии.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.replica = None
+        _state.wrote = False
+        try:
+            response = self.get_response(request)
+            if _state.wrote:
+                self.pin(request, response)
+            return response
+        finally:
+            _state.replica = None
+            _state.wrote = False
+
+    def pin(self, request, response):
+        response.set_cookie(
+            settings.REPLICA_PIN_COOKIE, '1',
+            max_age=settings.REPLICA_PIN_SECONDS, httponly=True)
+        key = _pin_key(request)
+        if key is not None:
+            cache.set(key, 1, settings.REPLICA_PIN_SECONDS)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (getattr(view_func, 'read_only', False)
+                and request.method in SAFE_METHODS
+                and not is_pinned(request)):
+            _state.replica = choose_replica()
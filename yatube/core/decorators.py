@@ -0,0 +1,75 @@
+"""Условные GET и политика кеширования для страниц.
+
+``conditional_page`` строит ETag и Last-Modified из дешёвого запроса
+состояния страницы, и при совпадении валидаторов ``condition`` отвечает
+304, не вызывая представление и не трогая шаблоны. ``cache_policy``
+разрешает общим кешам хранить страницы анонимов, а страницы
+пользователей отдаёт только с перепроверкой.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+
+def _viewer(request):
+    """Часть ETag, зависящая от того, кто смотрит страницу."""
+    user = request.user
+    if not user.is_authenticated:
+        return ['anonymous']
+    # В форме на странице лежит CSRF-токен: после смены cookie старая
+    # копия страницы уже не годится.
+    return [user.pk, user.username,
+            request.COOKIES.get(settings.CSRF_COOKIE_NAME)]
+
+
+def conditional_page(state_func):
+    """``state_func(request, *args, **kwargs)`` возвращает
+    ``(last_modified, parts)`` или None, если объекта нет: тогда
+    представление отработает как обычно (например, вернёт 404).
+    """
+    def state(request, *args, **kwargs):
+        # condition зовёт обе функции ниже, а запрос нужен один.
+        if not hasattr(request, '_page_state'):
+            request._page_state = state_func(request, *args, **kwargs)
+        return request._page_state
+
+    def etag(request, *args, **kwargs):
+        page_state = state(request, *args, **kwargs)
+        if page_state is None:
+            return None
+        parts = [request.get_full_path(), *page_state[1], *_viewer(request)]
+        return hashlib.md5(repr(parts).encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        page_state = state(request, *args, **kwargs)
+        return page_state[0] if page_state is not None else None
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def page_state(request):
+    """Состояние, которое уже получил ``conditional_page`` снаружи."""
+    return request._page_state
+
+
+def cache_policy(view):
+    """Анонимам — ``public, max-age``, пользователям — ``private, no-cache``.
+
+    Страница зависит от cookie сессии, поэтому всегда ``Vary: Cookie``.
+    """
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if request.method not in ('GET', 'HEAD'):
+            return response
+        if request.user.is_authenticated:
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            patch_cache_control(response, public=True,
+                                max_age=settings.ANONYMOUS_CACHE_MAX_AGE)
+        patch_vary_headers(response, ['Cookie'])
+        return response
+    return wrapped
@@ -0,0 +1,44 @@
+import multiprocessing
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core import tasks
+
+
+class Command(BaseCommand):
+    help = ('Выполняет фоновые задачи из очереди core.Task в нескольких '
+            'потоках и, при --processes, в нескольких процессах')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int,
+                            default=settings.TASKS_WORKER_THREADS)
+        parser.add_argument('--processes', type=int, default=1)
+        parser.add_argument('--burst', action='store_true',
+                            help='Выйти, когда очередь опустеет')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Пауза при пустой очереди, секунды')
+
+    def handle(self, *args, **options):
+        work = (options['threads'], options['burst'],
+                options['poll_interval'])
+        self.stdout.write('Воркер: процессов %d, потоков %d' % (
+            options['processes'], options['threads']))
+        if options['processes'] == 1:
+            tasks.work_in_threads(*work)
+            return
+        # Дочерние процессы наследуют открытые соединения при fork.
+        connections.close_all()
+        processes = [multiprocessing.Process(target=tasks.work_in_threads,
+                                             args=work)
+                     for _ in range(options['processes'])]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            # Ctrl+C получают и дочерние процессы, остаётся дождаться их.
+            for process in processes:
+                process.join()
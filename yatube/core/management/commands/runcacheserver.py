@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from core.resp_server import RespServer
+
+
+class Command(BaseCommand):
+    help = ('Запускает встроенный Redis-совместимый сервер кеша, общий '
+            'для всех воркеров (CACHE_BACKEND=redis)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=6379)
+
+    def handle(self, *args, **options):
+        server = RespServer((options['host'], options['port']))
+        self.stdout.write(f'Сервер кеша слушает {server.url}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 
 class CreatedModel(models.Model):
@@ -7,3 +8,51 @@ class CreatedModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class TimestampedModel(CreatedModel):
+    # Массовые update() в обход save() должны выставлять поле сами.
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
+
+    class Meta:
+        abstract = True
+
+
+class Task(models.Model):
+    """Отложенный вызов функции, помеченной ``core.tasks.task``."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField('Функция', max_length=200)
+    args = models.TextField('Аргументы (JSON)', default='[]')
+    # Задача с тем же ключом, пока она ждёт в очереди, второй раз не
+    # ставится. Выполняемая не мешает: изменения, сделанные после её
+    # старта, подхватит новая.
+    key = models.CharField('Ключ', max_length=200, null=True, blank=True)
+    state = models.CharField('Состояние', max_length=10, choices=STATES,
+                             default=PENDING)
+    attempts = models.PositiveIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveIntegerField('Предел попыток')
+    run_at = models.DateTimeField('Выполнить после', default=timezone.now)
+    locked_until = models.DateTimeField('Занята до', null=True, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created_at = models.DateTimeField('Создана', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+        indexes = [models.Index(fields=['state', 'run_at'])]
+        constraints = [
+            models.UniqueConstraint(fields=['key'],
+                                    condition=models.Q(state='pending'),
+                                    name='core_task_pending_key'),
+        ]
+
+    def __str__(self):
+        return '%s #%s' % (self.name, self.pk)
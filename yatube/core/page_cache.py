@@ -0,0 +1,114 @@
+"""Кеш страниц целиком с «дырами» под части, свои у каждого зрителя.
+
+``cached_page(key_func)`` хранит тело ответа представления в кеше по
+адресу страницы и списку, который возвращает ``key_func`` (состояние
+страницы и поколения её областей кеша). Пока список не изменился,
+представление, контекстные процессоры и шаблоны не вызываются вовсе.
+
+Тело одно на всех зрителей: всё, что зависит от пользователя (шапка со
+входом, кнопка подписки, ссылка на редактирование, форма с CSRF-токеном),
+шаблон выводит тегом ``{% hole 'имя' ключ=значение %}``. При отрисовке
+для кеша тег оставляет метку с именем и аргументами, а перед отдачей
+``fill`` заменяет метки результатом функций, зарегистрированных
+``register``, — для текущего запроса. Вне ``cached_page`` тег сразу
+выводит результат функции.
+"""
+import base64
+import hashlib
+import json
+import re
+from functools import partial, wraps
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+
+from .caching import get_or_compute
+
+PAGE_KEY = 'page:%s'
+MARKER = '<!--hole:%s:%s-->'
+MARKER_RE = re.compile(rb'<!--hole:([\w-]+):([\w=-]*)-->')
+
+registry = {}
+
+
+def register(name):
+    """Регистрирует ``func(request, **kwargs)``, возвращающую HTML дыры."""
+    def decorator(func):
+        registry[name] = func
+        return func
+    return decorator
+
+
+def render(request, name, kwargs):
+    return registry[name](request, **kwargs)
+
+
+def marker(name, kwargs):
+    # Аргументы в base64: в HTML-комментарии не должно оказаться «-->».
+    payload = base64.urlsafe_b64encode(json.dumps(kwargs).encode())
+    return MARKER % (name, payload.decode())
+
+
+def punching(request):
+    return getattr(request, '_punch_holes', False)
+
+
+def fill(request, content):
+    def replace(match):
+        kwargs = json.loads(base64.urlsafe_b64decode(match.group(2)))
+        return render(request, match.group(1).decode(), kwargs).encode()
+    return MARKER_RE.sub(replace, content)
+
+
+class _Uncacheable(Exception):
+    def __init__(self, response):
+        self.response = response
+
+
+def _render(view, request, args, kwargs):
+    request._punch_holes = True
+    try:
+        response = view(request, *args, **kwargs)
+    finally:
+        request._punch_holes = False
+    if response.streaming:
+        raise _Uncacheable(response)
+    if response.status_code != 200:
+        response.content = fill(request, response.content)
+        raise _Uncacheable(response)
+    return response.content, response['Content-Type']
+
+
+def cached_page(key_func):
+    """``key_func(request, *args, **kwargs)`` возвращает список, от
+    которого зависит тело страницы, или None — тогда кеш не используется.
+    Кешируются только ответы 200."""
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            parts = None
+            if request.method in ('GET', 'HEAD'):
+                parts = key_func(request, *args, **kwargs)
+            if parts is None:
+                return view(request, *args, **kwargs)
+            key = PAGE_KEY % hashlib.md5(repr(
+                [request.get_full_path(), *parts]).encode()).hexdigest()
+            try:
+                content, content_type = get_or_compute(
+                    key, partial(_render, view, request, args, kwargs),
+                    settings.PAGE_CACHE_TIMEOUT)
+            except _Uncacheable as uncacheable:
+                return uncacheable.response
+            return HttpResponse(fill(request, content),
+                                content_type=content_type)
+        return wrapped
+    return decorator
+
+
+@register('header')
+def header(request, view_name):
+    return render_to_string('includes/header_user.html', {
+        'user': request.user,
+        'view_name': view_name,
+    })
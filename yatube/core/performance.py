@@ -0,0 +1,356 @@
+"""Замеры запросов в рабочем окружении.
+
+``PerformanceMiddleware`` на время запроса собирает:
+
+* число и время SQL-запросов — через ``execute_wrapper`` всех
+  соединений;
+* время отрисовки шаблонов — обёрткой ``Template.render`` (вложенные
+  ``include`` не считаются дважды);
+* попадания и промахи кеша — обёрткой ``get``/``get_many`` бэкендов из
+  ``CACHES``;
+* повторы SQL одного вида — признак N+1. Если ``NPLUSONE_MODE`` задан,
+  запросы группируются по виду с точностью до значений, и вид,
+  повторившийся больше ``NPLUSONE_THRESHOLD`` раз, попадает в журнал
+  (``log``) или роняет запрос исключением ``NPlusOneError`` (``raise``,
+  так работают тесты) вместе со строкой шаблона и кода, откуда он пришёл.
+
+Итог уходит в заголовок ``Server-Timing``, медленные запросы пишутся в
+журнал ``core.performance`` вместе с самыми долгими SQL, а гистограммы
+по представлениям копятся в памяти процесса и отдаются ``metrics`` в
+текстовом формате Prometheus. У каждого процесса сервера свои счётчики:
+Prometheus складывает их сам, если опрашивать процессы по отдельности.
+
+Обёртки ставит ``install`` из ``CoreConfig.ready``; вне запроса они
+только проверяют, что замера нет.
+"""
+import heapq
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.template.base import Template
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограммы длительности, в секундах.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SQL_LOG_LENGTH = 300
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+\b')
+PLACEHOLDERS_RE = re.compile(r'\((?:%s, )+%s\)')
+
+_state = threading.local()
+_missing = object()
+
+
+class NPlusOneError(Exception):
+    pass
+
+
+def query_shape(sql):
+    """SQL без значений: запросы по разным id и спискам IN совпадают."""
+    sql = STRING_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    return PLACEHOLDERS_RE.sub('(%s, ...)', sql)
+
+
+def _culprit():
+    """Ближайшая строка шаблона и ближайшая строка кода проекта."""
+    template = code = None
+    frame = sys._getframe(1)
+    while frame is not None and not (template and code):
+        filename = frame.f_code.co_filename
+        if template is None and frame.f_code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                template = 'шаблон %s:%s' % (
+                    origin.template_name or origin.name, token.lineno)
+        if (code is None and filename.startswith(settings.BASE_DIR)
+                and 'site-packages' not in filename
+                and filename != __file__):
+            code = '%s:%s' % (os.path.relpath(filename, settings.BASE_DIR),
+                              frame.f_lineno)
+        frame = frame.f_back
+    return ', '.join(filter(None, [template, code])) or 'неизвестно'
+
+
+def current():
+    """Замер текущего запроса или None."""
+    return getattr(_state, 'stats', None)
+
+
+class RequestStats:
+    def __init__(self, slow_queries, repeat_threshold=None):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.slow_queries = slow_queries
+        # Куча из самых долгих запросов: в N+1 их могут быть тысячи.
+        self.top_queries = []
+        self.repeat_threshold = repeat_threshold
+        self.shapes = Counter()
+        self.repeated = {}
+
+    def add_query(self, sql, duration):
+        self.queries += 1
+        self.db_time += duration
+        entry = (duration, self.queries, sql)
+        if len(self.top_queries) < self.slow_queries:
+            heapq.heappush(self.top_queries, entry)
+        elif self.top_queries and duration > self.top_queries[0][0]:
+            heapq.heapreplace(self.top_queries, entry)
+        if self.repeat_threshold is not None:
+            shape = query_shape(sql)
+            self.shapes[shape] += 1
+            if self.shapes[shape] == self.repeat_threshold + 1:
+                self.repeated[shape] = _culprit()
+
+    def repeats_report(self):
+        return ''.join(
+            '\n  %d раз (%s): %s'
+            % (self.shapes[shape], where, shape[:SQL_LOG_LENGTH])
+            for shape, where in self.repeated.items())
+
+    def slowest(self):
+        return [(duration, sql) for duration, _, sql
+                in sorted(self.top_queries, reverse=True)]
+
+
+def _record_query(execute, sql, params, many, context):
+    stats = current()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add_query(sql, time.perf_counter() - started)
+
+
+def _timed_render(render):
+    @wraps(render)
+    def wrapped(self, context):
+        stats = current()
+        if stats is None or stats.template_depth:
+            return render(self, context)
+        stats.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            stats.template_time += time.perf_counter() - started
+            stats.template_depth -= 1
+    wrapped.performance = True
+    return wrapped
+
+
+def _counted(method, count):
+    """Считает попадания внешнего вызова: locmem, например, реализует
+    ``get_many`` через ``get``."""
+    @wraps(method)
+    def wrapped(self, *args, **kwargs):
+        stats = current()
+        if stats is None or stats.cache_depth:
+            return method(self, *args, **kwargs)
+        stats.cache_depth += 1
+        try:
+            hits, misses, result = count(method, self, *args, **kwargs)
+        finally:
+            stats.cache_depth -= 1
+        stats.cache_hits += hits
+        stats.cache_misses += misses
+        return result
+    wrapped.performance = True
+    return wrapped
+
+
+def _count_get(get, cache, key, default=None, version=None):
+    value = get(cache, key, _missing, version=version)
+    if value is _missing:
+        return 0, 1, default
+    return 1, 0, value
+
+
+def _count_get_many(get_many, cache, keys, version=None):
+    keys = list(keys)
+    found = get_many(cache, keys, version=version)
+    return len(found), len(keys) - len(found), found
+
+
+def _wrap(cls, name, decorator):
+    method = getattr(cls, name)
+    if not getattr(method, 'performance', False):
+        setattr(cls, name, decorator(method))
+
+
+def install():
+    _wrap(Template, 'render', _timed_render)
+    for alias in settings.CACHES:
+        backend = type(caches[alias])
+        _wrap(backend, 'get', lambda method: _counted(method, _count_get))
+        _wrap(backend, 'get_many',
+              lambda method: _counted(method, _count_get_many))
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        for index, bound in enumerate(BUCKETS):
+            if value <= bound:
+                break
+        else:
+            index = len(BUCKETS)
+        self.counts[index] += 1
+        self.sum += value
+
+
+class Registry:
+    """Метрики процесса по ``(представление, метод)``."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.durations = defaultdict(Histogram)
+        self.responses = defaultdict(int)
+        self.totals = defaultdict(lambda: defaultdict(float))
+
+    def observe(self, view, method, status, total, stats):
+        labels = (view, method)
+        with self.lock:
+            self.durations[labels].observe(total)
+            self.responses[labels + (status,)] += 1
+            totals = self.totals[labels]
+            totals['db_queries'] += stats.queries
+            totals['db_seconds'] += stats.db_time
+            totals['template_seconds'] += stats.template_time
+            totals['cache_hits'] += stats.cache_hits
+            totals['cache_misses'] += stats.cache_misses
+
+    def render(self):
+        lines = [
+            '# HELP yatube_request_duration_seconds Время ответа.',
+            '# TYPE yatube_request_duration_seconds histogram',
+        ]
+        with self.lock:
+            for (view, method), histogram in sorted(self.durations.items()):
+                labels = 'view="%s",method="%s"' % (view, method)
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ('+Inf',),
+                                        histogram.counts):
+                    cumulative += count
+                    lines.append(
+                        'yatube_request_duration_seconds_bucket'
+                        '{%s,le="%s"} %d' % (labels, bound, cumulative))
+                lines.append('yatube_request_duration_seconds_sum{%s} %f'
+                             % (labels, histogram.sum))
+                lines.append('yatube_request_duration_seconds_count{%s} %d'
+                             % (labels, cumulative))
+            lines.append('# TYPE yatube_responses_total counter')
+            for (view, method, status), count in sorted(
+                    self.responses.items()):
+                lines.append(
+                    'yatube_responses_total'
+                    '{view="%s",method="%s",status="%s"} %d'
+                    % (view, method, status, count))
+            names = sorted({name for totals in self.totals.values()
+                            for name in totals})
+            for name in names:
+                lines.append('# TYPE yatube_%s_total counter' % name)
+                for (view, method), totals in sorted(self.totals.items()):
+                    lines.append('yatube_%s_total{view="%s",method="%s"} %s'
+                                 % (name, view, method, totals[name]))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name or match._func_path
+
+
+def server_timing(total, stats):
+    return ', '.join([
+        'total;dur=%.1f' % (total * 1000),
+        'db;dur=%.1f;desc="%d queries"' % (stats.db_time * 1000,
+                                           stats.queries),
+        'tpl;dur=%.1f' % (stats.template_time * 1000),
+        'cache;desc="%d hits, %d misses"' % (stats.cache_hits,
+                                             stats.cache_misses),
+    ])
+
+
+class PerformanceMiddleware:
+    """Должен стоять первым, чтобы замер охватил остальные middleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = RequestStats(
+            settings.PERFORMANCE_SLOW_QUERIES_LOGGED,
+            settings.NPLUSONE_THRESHOLD if settings.NPLUSONE_MODE else None)
+        _state.stats = stats
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(_record_query))
+                response = self.get_response(request)
+        finally:
+            _state.stats = None
+        total = time.perf_counter() - started
+        view = _view_name(request)
+        registry.observe(view, request.method, response.status_code,
+                         total, stats)
+        if settings.PERFORMANCE_SERVER_TIMING:
+            response['Server-Timing'] = server_timing(total, stats)
+        if total * 1000 >= settings.PERFORMANCE_SLOW_REQUEST_MS:
+            self.log_slow(request, view, total, stats)
+        if stats.repeated:
+            self.report_repeats(request, view, stats)
+        return response
+
+    def report_repeats(self, request, view, stats):
+        message = 'N+1 в %s %s (%s):%s' % (
+            request.method, request.get_full_path(), view,
+            stats.repeats_report())
+        if settings.NPLUSONE_MODE == 'raise':
+            raise NPlusOneError(message)
+        logger.warning(message)
+
+    def log_slow(self, request, view, total, stats):
+        queries = ''.join(
+            '\n  %.1f ms: %s' % (duration * 1000, sql[:SQL_LOG_LENGTH])
+            for duration, sql in stats.slowest())
+        logger.warning(
+            'Медленный запрос %s %s (%s): %.0f ms, SQL: %d за %.0f ms, '
+            'шаблоны: %.0f ms, кеш: %d/%d%s',
+            request.method, request.get_full_path(), view, total * 1000,
+            stats.queries, stats.db_time * 1000, stats.template_time * 1000,
+            stats.cache_hits, stats.cache_hits + stats.cache_misses, queries)
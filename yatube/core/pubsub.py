@@ -0,0 +1,134 @@
+"""Публикация событий для потоков SSE (``core.sse``).
+
+События всех каналов образуют один журнал с общей нумерацией:
+подписчик помнит номер последнего прочитанного события (это и есть
+``Last-Event-ID`` в SSE) и забирает новые события своих каналов.
+Получается «опрос», а не настоящий push, зато журналу хватает обычного
+кеша, общего для всех процессов сервера.
+
+``CacheBroker`` хранит журнал в кеше ``default``: счётчик и по ключу на
+событие, живущему ``PUBSUB_RETENTION`` секунд. ``MemoryBroker`` держит
+журнал в памяти процесса и нужен тестам. Брокер выбирается настройкой
+``PUBSUB_BROKER``.
+"""
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+# Больше событий за одно чтение не отдаётся, остальные — в следующем.
+READ_LIMIT: int = 100
+# Событие, номер которого выдан, но которое ещё не записано, ждём
+# столько секунд, а потом считаем потерянным.
+GAP_TIMEOUT: float = 5
+# Ждать есть смысл только недавно выданные номера: пропуск дальше этого
+# от последнего номера — событие, истёкшее за PUBSUB_RETENTION.
+GAP_WINDOW: int = 100
+
+
+class CacheBroker:
+    sequence_key = 'pubsub:sequence'
+    event_key = 'pubsub:event:%d'
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Пропуски в журнале: номер → когда его впервые не нашли.
+        self.gaps = {}
+
+    def publish(self, channel, event, data):
+        try:
+            number = cache.incr(self.sequence_key)
+        except ValueError:
+            cache.add(self.sequence_key, 0, None)
+            number = cache.incr(self.sequence_key)
+        cache.set(self.event_key % number, (channel, event, data),
+                  settings.PUBSUB_RETENTION)
+        return number
+
+    def last_id(self):
+        return cache.get(self.sequence_key, 0)
+
+    def read(self, after, channels):
+        """События каналов ``channels`` с номерами больше ``after``:
+        список ``(номер, событие, данные)`` и номер, с которого читать
+        дальше."""
+        issued = self.last_id()
+        if issued < after:
+            # Счётчик вытеснен из кеша и начался заново.
+            after = 0
+        numbers = range(after + 1, min(issued, after + READ_LIMIT) + 1)
+        found = cache.get_many([self.event_key % number
+                                for number in numbers])
+        events = []
+        lost = False
+        for number in numbers:
+            value = found.get(self.event_key % number)
+            if value is None:
+                # Потерян первый номер пропуска — значит, и весь пропуск.
+                lost = (lost or issued - number >= GAP_WINDOW
+                        or self._lost(number))
+                if not lost:
+                    # Номер выдан, а событие ещё пишется: читаем отсюда
+                    # позже.
+                    break
+            else:
+                lost = False
+            after = number
+            if value is not None and value[0] in channels:
+                events.append((number, value[1], value[2]))
+        return events, after
+
+    def _lost(self, number):
+        now = time.monotonic()
+        with self.lock:
+            first_seen = self.gaps.setdefault(number, now)
+            for stale in [key for key, seen in self.gaps.items()
+                          if now - seen > GAP_TIMEOUT * 2]:
+                del self.gaps[stale]
+        return now - first_seen > GAP_TIMEOUT
+
+
+class MemoryBroker:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events = deque(maxlen=1000)
+        self.number = 0
+
+    def publish(self, channel, event, data):
+        with self.lock:
+            self.number += 1
+            self.events.append((self.number, channel, event, data))
+            return self.number
+
+    def last_id(self):
+        return self.number
+
+    def read(self, after, channels):
+        with self.lock:
+            events = [(number, event, data)
+                      for number, channel, event, data in self.events
+                      if number > after and channel in channels]
+            return events[:READ_LIMIT], (
+                events[READ_LIMIT - 1][0] if len(events) > READ_LIMIT
+                else self.number)
+
+
+@lru_cache(maxsize=None)
+def _broker(path):
+    return import_string(path)()
+
+
+def get_broker():
+    return _broker(settings.PUBSUB_BROKER)
+
+
+def publish_on_commit(channel, event, data):
+    """Публикует событие после фиксации транзакции: подписчик, получив
+    его, сразу запросит новые данные и должен их увидеть."""
+    transaction.on_commit(
+        lambda: get_broker().publish(channel, event, data))
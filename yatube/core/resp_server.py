@@ -0,0 +1,187 @@
+"""Встроенный сервер с подмножеством протокола Redis.
+
+Нужен там, где настоящего Redis нет: для локального запуска нескольких
+воркеров с общим кешем (``manage.py runcacheserver``) и для тестов
+``core.cache_backends.redis``. Данные хранятся в памяти процесса.
+"""
+import socketserver
+import threading
+import time
+
+from .cache_backends.redis import INCR_SCRIPT
+
+
+class RespError(Exception):
+    pass
+
+
+class Store:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = {}
+        self.expires = {}
+
+    def _alive(self, key):
+        expires = self.expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def execute(self, command, args):
+        handler = getattr(self, 'cmd_' + command.lower(), None)
+        if handler is None:
+            raise RespError('ERR unknown command \'%s\'' % command)
+        with self.lock:
+            return handler(*args)
+
+    def cmd_ping(self, *args):
+        return args[0] if args else 'PONG'
+
+    def cmd_select(self, db):
+        return 'OK'
+
+    def cmd_auth(self, *args):
+        return 'OK'
+
+    def cmd_get(self, key):
+        return self.data[key] if self._alive(key) else None
+
+    def cmd_mget(self, *keys):
+        return [self.cmd_get(key) for key in keys]
+
+    def cmd_set(self, key, value, *options):
+        options = [option.decode().upper() if isinstance(option, bytes)
+                   else option for option in options]
+        if 'NX' in options and self._alive(key):
+            return None
+        if 'XX' in options and not self._alive(key):
+            return None
+        self.data[key] = value
+        self.expires.pop(key, None)
+        for unit, scale in (('PX', 1000), ('EX', 1)):
+            if unit in options:
+                ttl = int(options[options.index(unit) + 1])
+                self.expires[key] = time.monotonic() + ttl / scale
+        return 'OK'
+
+    def cmd_del(self, *keys):
+        deleted = 0
+        for key in keys:
+            if self._alive(key):
+                deleted += 1
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return deleted
+
+    def cmd_exists(self, *keys):
+        return sum(1 for key in keys if self._alive(key))
+
+    def cmd_incrby(self, key, delta):
+        value = self.data[key] if self._alive(key) else b'0'
+        try:
+            value = int(value) + int(delta)
+        except ValueError:
+            raise RespError('ERR value is not an integer or out of range')
+        self.data[key] = b'%d' % value
+        return value
+
+    def cmd_eval(self, script, numkeys, *args):
+        # Lua здесь не исполняется: сервер знает только скрипт incr
+        # бэкенда кеша.
+        if script != INCR_SCRIPT.encode():
+            raise RespError('ERR scripts are not supported')
+        key, delta = args
+        return self.cmd_incrby(key, delta) if self._alive(key) else None
+
+    def cmd_pexpire(self, key, ttl):
+        if not self._alive(key):
+            return 0
+        self.expires[key] = time.monotonic() + int(ttl) / 1000
+        return 1
+
+    def cmd_persist(self, key):
+        if not self._alive(key) or key not in self.expires:
+            return 0
+        del self.expires[key]
+        return 1
+
+    def cmd_pttl(self, key):
+        if not self._alive(key):
+            return -2
+        expires = self.expires.get(key)
+        if expires is None:
+            return -1
+        return int((expires - time.monotonic()) * 1000)
+
+    def cmd_flushdb(self, *args):
+        self.data.clear()
+        self.expires.clear()
+        return 'OK'
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                args = self.read_command()
+            except (ConnectionError, ValueError):
+                return
+            if args is None:
+                return
+            try:
+                reply = self.server.store.execute(args[0].decode(), args[1:])
+            except RespError as error:
+                self.wfile.write(b'-%s\r\n' % str(error).encode())
+                continue
+            except TypeError:
+                self.wfile.write(b'-ERR wrong number of arguments\r\n')
+                continue
+            self.wfile.write(self.encode(reply))
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if line[:1] != b'*':
+            return line.split()
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def encode(self, reply):
+        if reply is None:
+            return b'$-1\r\n'
+        if isinstance(reply, str):
+            return b'+%s\r\n' % reply.encode()
+        if isinstance(reply, int):
+            return b':%d\r\n' % reply
+        if isinstance(reply, list):
+            return b'*%d\r\n' % len(reply) + b''.join(
+                self.encode(item) for item in reply)
+        return b'$%d\r\n%s\r\n' % (len(reply), reply)
+
+
+class RespServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=('127.0.0.1', 0)):
+        super().__init__(address, RespHandler)
+        self.store = Store()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return 'redis://%s:%d/0' % (host, port)
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,98 @@
+"""Потоки server-sent events по каналам ``core.pubsub``.
+
+Представление проверяет права, выбирает каналы и возвращает
+``EventStreamResponse``. ``core.asgi`` узнаёт такой ответ по
+``async_streaming_content`` и ведёт поток в цикле событий: поток пула
+освобождается, как только представление вернуло ответ, и тысячи
+открытых соединений не занимают ни потоков, ни соединений с базой.
+
+Под WSGI поток держал бы поток сервера всё время соединения, поэтому
+``event_stream_view`` отвечает там 204 — EventSource на такой ответ
+больше не переподключается, — а страницы проверяют ``available`` и
+не подключаются вовсе.
+
+Соединение закрывается через ``SSE_MAX_AGE`` секунд: EventSource сам
+переподключится с заголовком ``Last-Event-ID`` и ничего не потеряет.
+"""
+import asyncio
+import json
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+
+from .asgi import ASYNC_STREAMS
+from .pubsub import get_broker
+
+
+def available(request):
+    """Запрос пришёл через ``core.asgi`` и поток его не задержит."""
+    return request.META.get(ASYNC_STREAMS, False)
+
+
+def event_stream_view(view):
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if not available(request):
+            return HttpResponse(status=204)
+        return view(request, *args, **kwargs)
+    return wrapped
+
+
+def format_event(number, event, data):
+    return ('id: %d\nevent: %s\ndata: %s\n\n'
+            % (number, event, json.dumps(data))).encode()
+
+
+class EventStreamResponse(StreamingHttpResponse):
+    def __init__(self, channels, last_event_id=None):
+        self.channels = frozenset(channels)
+        try:
+            self.after = int(last_event_id)
+        except (TypeError, ValueError):
+            # Новый подписчик получает только события после подключения.
+            self.after = get_broker().last_id()
+        super().__init__(self.sync_streaming_content(),
+                         content_type='text/event-stream')
+        self['Cache-Control'] = 'no-cache'
+        # Иначе nginx копит поток в буфере.
+        self['X-Accel-Buffering'] = 'no'
+
+    def start(self):
+        now = time.monotonic()
+        self.deadline = now + settings.SSE_MAX_AGE
+        self.last_sent = now
+        return b'retry: %d\n\n' % settings.SSE_RETRY_MS
+
+    def poll(self):
+        """Новые события одним куском, пинг или b''."""
+        events, self.after = get_broker().read(self.after, self.channels)
+        chunk = b''.join(format_event(*event) for event in events)
+        now = time.monotonic()
+        if not chunk and now - self.last_sent >= settings.SSE_HEARTBEAT:
+            chunk = b': ping\n\n'
+        if chunk:
+            self.last_sent = now
+        return chunk
+
+    def open(self):
+        return time.monotonic() < self.deadline
+
+    def sync_streaming_content(self):
+        yield self.start()
+        while self.open():
+            chunk = self.poll()
+            if chunk:
+                yield chunk
+            time.sleep(settings.SSE_POLL_INTERVAL)
+
+    async def async_streaming_content(self):
+        loop = asyncio.get_running_loop()
+        yield self.start()
+        while self.open():
+            # Брокер может ходить в сеть, цикл событий ждать не должен.
+            chunk = await loop.run_in_executor(None, self.poll)
+            if chunk:
+                yield chunk
+            await asyncio.sleep(settings.SSE_POLL_INTERVAL)
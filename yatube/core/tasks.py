@@ -0,0 +1,164 @@
+"""Очередь фоновых задач в таблице ``core.Task``.
+
+Функция, помеченная ``@task``, получает метод ``enqueue(*args, key=None)``.
+Строка задачи вставляется после фиксации транзакции, в которой её
+поставили: если запрос откатится, задачи не будет, а воркер не увидит
+ещё не зафиксированные данные. Аргументы хранятся в JSON, поэтому
+передаются id, а не объекты; задача сама читает их текущее состояние и
+должна быть идемпотентной — повторный запуск после сбоя не должен ничего
+ломать.
+
+Задачи выполняет ``manage.py run_worker``. Воркер помечает задачу
+``running`` условным UPDATE и берёт её в аренду на ``TASKS_LEASE``
+секунд: задачу упавшего воркера по истечении аренды подхватит другой.
+Ошибка откладывает повтор на ``TASKS_RETRY_DELAY * 2 ** (попытка - 1)``
+секунд; после ``max_attempts`` попыток задача остаётся в таблице в
+состоянии ``failed``. Выполненные задачи удаляются.
+
+С ``TASKS_EAGER`` задача выполняется сразу при постановке: так работают
+тесты, где on_commit внутри ``TestCase`` не срабатывает.
+"""
+import json
+import logging
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS: int = 5
+
+registry = {}
+
+
+def task(func=None, *, max_attempts=MAX_ATTEMPTS):
+    """Регистрирует функцию как задачу под её полным именем."""
+    if func is None:
+        return lambda func: task(func, max_attempts=max_attempts)
+    name = '%s.%s' % (func.__module__, func.__qualname__)
+    func.task_name = name
+    func.max_attempts = max_attempts
+    func.enqueue = lambda *args, key=None: enqueue(func, *args, key=key)
+    registry[name] = func
+    return func
+
+
+def enqueue(func, *args, key=None):
+    if settings.TASKS_EAGER:
+        func(*args)
+        return
+    row = Task(name=func.task_name, args=json.dumps(args), key=key,
+               max_attempts=func.max_attempts)
+    # Повтор с тем же ключом молча пропускается уникальным индексом.
+    transaction.on_commit(
+        lambda: Task.objects.bulk_create([row], ignore_conflicts=True))
+
+
+def _resolve(name):
+    if name not in registry:
+        # Модуль задачи импортируется и регистрирует её.
+        import_string(name)
+    return registry[name]
+
+
+def _available(now):
+    return (Q(state=Task.PENDING, run_at__lte=now)
+            | Q(state=Task.RUNNING, locked_until__lt=now))
+
+
+def claim():
+    """Берёт в работу ближайшую готовую задачу или возвращает None."""
+    while True:
+        now = timezone.now()
+        pk = (Task.objects.filter(_available(now))
+              .order_by('run_at', 'pk').values_list('pk', flat=True)
+              .first())
+        if pk is None:
+            return None
+        # Задачу мог перехватить другой воркер между SELECT и UPDATE.
+        claimed = Task.objects.filter(_available(now), pk=pk).update(
+            state=Task.RUNNING, attempts=F('attempts') + 1,
+            locked_until=now + timedelta(seconds=settings.TASKS_LEASE))
+        if claimed:
+            return Task.objects.get(pk=pk)
+
+
+def execute(row):
+    try:
+        func = _resolve(row.name)
+        func(*json.loads(row.args))
+    except Exception:
+        _failed(row, traceback.format_exc())
+    else:
+        Task.objects.filter(pk=row.pk).delete()
+
+
+def _failed(row, error):
+    if row.attempts >= row.max_attempts:
+        logger.error('Задача %s не выполнена за %d попыток:\n%s',
+                     row, row.attempts, error)
+        Task.objects.filter(pk=row.pk).update(
+            state=Task.FAILED, locked_until=None, last_error=error)
+        return
+    delay = settings.TASKS_RETRY_DELAY * 2 ** (row.attempts - 1)
+    logger.warning('Задача %s, попытка %d: повтор через %s с\n%s',
+                   row, row.attempts, delay, error)
+    try:
+        with transaction.atomic():
+            Task.objects.filter(pk=row.pk).update(
+                state=Task.PENDING, locked_until=None, last_error=error,
+                run_at=timezone.now() + timedelta(seconds=delay))
+    except IntegrityError:
+        # В очереди уже есть задача с тем же ключом, она и повторит.
+        Task.objects.filter(pk=row.pk).delete()
+
+
+def run_next():
+    """Выполняет одну задачу; False, если очередь пуста."""
+    row = claim()
+    if row is None:
+        return False
+    try:
+        execute(row)
+    finally:
+        close_old_connections()
+    return True
+
+
+def work(stop=None, burst=False, poll_interval=1.0):
+    """Цикл воркера. ``burst`` — выйти, когда очередь опустеет."""
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        if run_next():
+            continue
+        close_old_connections()
+        if burst:
+            return
+        stop.wait(poll_interval)
+
+
+def work_in_threads(threads, burst=False, poll_interval=1.0):
+    stop = threading.Event()
+    workers = [
+        threading.Thread(target=work, args=(stop, burst, poll_interval),
+                         name='tasks-%d' % number)
+        for number in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            while worker.is_alive():
+                worker.join(poll_interval)
+    except KeyboardInterrupt:
+        stop.set()
+    for worker in workers:
+        worker.join()
@@ -0,0 +1,14 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from core import page_cache
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, hole_name, **kwargs):
+    request = context['request']
+    if page_cache.punching(request):
+        return mark_safe(page_cache.marker(hole_name, kwargs))
+    return mark_safe(page_cache.render(request, hole_name, kwargs))
@@ -5,3 +5,13 @@ register = template.Library()
 @register.filter
 def addclass(field, css):
     return field.as_widget(attrs={'class': css})
+
+
+@register.simple_tag(takes_context=True)
+def cursor_url(context, cursor=None, param='cursor'):
+    query = context['request'].GET.copy()
+    query.pop('page', None)
+    query.pop(param, None)
+    if cursor:
+        query[param] = cursor
+    return '?' + query.urlencode() if query else '?'
@@ -0,0 +1,11 @@
+from django.test.runner import DiscoverRunner
+
+from . import testing
+
+
+class TestRunner(DiscoverRunner):
+    """Применяет настройки ``core.testing``, как и conftest.py для pytest."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        testing.configure()
@@ -0,0 +1,21 @@
+"""Настройки, с которыми тесты идут под любым раннером.
+
+Их применяют и ``manage.py test`` (``core.test_runner``), и pytest
+(``conftest.py``). Отдельный тест может вернуть своё значение через
+``override_settings``.
+"""
+from django.conf import settings
+
+TEST_SETTINGS = {
+    # Тесты падают на N+1 в любом запросе через тестовый клиент.
+    'NPLUSONE_MODE': 'raise',
+    # Фоновые задачи выполняются сразу при постановке, без воркера.
+    'TASKS_EAGER': True,
+    # События SSE живут в памяти процесса.
+    'PUBSUB_BROKER': 'core.pubsub.MemoryBroker',
+}
+
+
+def configure():
+    for name, value in TEST_SETTINGS.items():
+        setattr(settings, name, value)
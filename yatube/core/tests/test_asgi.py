@@ -0,0 +1,87 @@
+import asyncio
+
+from django.core.wsgi import get_wsgi_application
+from django.test import SimpleTestCase
+
+from core.asgi import ASYNC_STREAMS, WsgiToAsgi
+
+
+def run(application, scope, messages):
+    """Прогоняет соединение, возвращает отправленные приложением
+    сообщения."""
+    incoming = list(messages)
+    sent = []
+
+    async def receive():
+        return incoming.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    async def main():
+        await application(scope, receive, send)
+
+    asyncio.run(main())
+    return sent
+
+
+def http_scope(path='/', method='GET', query=b'', headers=()):
+    return {'type': 'http', 'method': method, 'path': path,
+            'query_string': query, 'headers': list(headers),
+            'server': ('testserver', 80), 'client': ('10.0.0.1', 5000)}
+
+
+class WsgiToAsgiTest(SimpleTestCase):
+    def echo(self, environ, start_response):
+        self.environ = environ
+        start_response('201 Created', [('Content-Type', 'text/plain')])
+        return [b'', environ['wsgi.input'].read(), b'!']
+
+    def test_request_is_translated_to_environ(self):
+        sent = run(WsgiToAsgi(self.echo, threads=2), http_scope(
+            path='/посты/', method='POST', query=b'page=2',
+            headers=[(b'content-type', b'text/plain'),
+                     (b'x-tag', b'a'), (b'x-tag', b'b')],
+        ), [
+            {'type': 'http.request', 'body': b'te', 'more_body': True},
+            {'type': 'http.request', 'body': b'xt'},
+        ])
+        environ = self.environ
+        self.assertEqual(environ['REQUEST_METHOD'], 'POST')
+        self.assertEqual(
+            environ['PATH_INFO'].encode('latin-1').decode(), '/посты/')
+        self.assertEqual(environ['QUERY_STRING'], 'page=2')
+        self.assertEqual(environ['CONTENT_TYPE'], 'text/plain')
+        self.assertEqual(environ['HTTP_X_TAG'], 'a,b')
+        self.assertEqual(environ['REMOTE_ADDR'], '10.0.0.1')
+        self.assertTrue(environ[ASYNC_STREAMS])
+        self.assertEqual(sent[0], {
+            'type': 'http.response.start', 'status': 201,
+            'headers': [(b'content-type', b'text/plain')]})
+        self.assertEqual([message['body'] for message in sent[1:]],
+                         [b'text', b'!', b''])
+        self.assertFalse(sent[-1].get('more_body'))
+
+    def test_disconnect_before_body_skips_application(self):
+        self.environ = None
+        sent = run(WsgiToAsgi(self.echo, threads=1), http_scope(),
+                   [{'type': 'http.disconnect'}])
+        self.assertEqual(sent, [])
+        self.assertIsNone(self.environ)
+
+    def test_lifespan(self):
+        sent = run(WsgiToAsgi(self.echo, threads=1), {'type': 'lifespan'},
+                   [{'type': 'lifespan.startup'},
+                    {'type': 'lifespan.shutdown'}])
+        self.assertEqual([message['type'] for message in sent],
+                         ['lifespan.startup.complete',
+                          'lifespan.shutdown.complete'])
+
+    def test_django_application(self):
+        sent = run(WsgiToAsgi(get_wsgi_application(), threads=1),
+                   http_scope(path='/about/author/',
+                              headers=[(b'host', b'testserver')]),
+                   [{'type': 'http.request', 'body': b''}])
+        self.assertEqual(sent[0]['status'], 200)
+        body = b''.join(message.get('body', b'') for message in sent[1:])
+        self.assertIn(b'</html>', body)
@@ -0,0 +1,145 @@
+import socket
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from posts import feed_cache
+from ..cache_backends.redis import RedisCache
+from ..caching import get_or_compute
+from ..resp_server import RespServer
+
+
+class RedisCacheTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = RespServer().start()
+        cls.settings_override = override_settings(CACHES={
+            'default': {
+                'BACKEND': 'core.cache_backends.redis.RedisCache',
+                'LOCATION': cls.server.url,
+            }
+        })
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+
+    def worker_cache(self):
+        return RedisCache(self.server.url, {})
+
+    def test_basic_operations(self):
+        cache.set('key', {'value': 1})
+        self.assertEqual(cache.get('key'), {'value': 1})
+        self.assertFalse(cache.add('key', 'другое'))
+        self.assertTrue(cache.add('new', 'значение'))
+        cache.set_many({'a': 1, 'b': 'два'})
+        self.assertEqual(cache.get_many(['a', 'b', 'missing']),
+                         {'a': 1, 'b': 'два'})
+        self.assertEqual(cache.incr('a', 5), 6)
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+        cache.delete('key')
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(cache.get('key', 'по умолчанию'), 'по умолчанию')
+
+    def test_incr_does_not_revive_expired_key(self):
+        cache.set('counter', 1, 0.05)
+        time.sleep(0.1)
+        with self.assertRaises(ValueError):
+            cache.incr('counter')
+        self.assertFalse(cache.has_key('counter'))
+        cache.set('text', 'не число')
+        with self.assertRaises(ValueError):
+            cache.incr('text')
+
+    def lose_reply(self, worker):
+        """Первый ответ сервера теряется, как при socket.timeout."""
+        read = worker._client._read
+        replies = iter([socket.timeout()])
+
+        def flaky_read():
+            error = next(replies, None)
+            if error is not None:
+                raise error
+            return read()
+        return mock.patch.object(worker._client, '_read', flaky_read)
+
+    def test_lost_reply_is_not_retried_for_incr(self):
+        worker = self.worker_cache()
+        worker.set('counter', 1)
+        with self.lose_reply(worker), self.assertRaises(socket.timeout):
+            worker.incr('counter')
+        # Сервер успел увеличить счётчик, повтора не было.
+        self.assertEqual(worker.get('counter'), 2)
+
+    def test_lost_reply_is_retried_for_get(self):
+        worker = self.worker_cache()
+        worker.set('key', 'значение')
+        with self.lose_reply(worker):
+            self.assertEqual(worker.get('key'), 'значение')
+
+    def test_reconnects_after_server_closed_connection(self):
+        worker = self.worker_cache()
+        worker.set('counter', 1)
+        # Сервер закрыл соединение, пока оно простаивало.
+        worker._client._sock.shutdown(socket.SHUT_RD)
+        self.assertEqual(worker.incr('counter'), 2)
+
+    def test_timeout(self):
+        cache.set('short', 1, 0.05)
+        cache.set('forever', 1, None)
+        time.sleep(0.1)
+        self.assertIsNone(cache.get('short'))
+        self.assertEqual(cache.get('forever'), 1)
+
+    def test_invalidation_reaches_other_workers(self):
+        first, second = self.worker_cache(), self.worker_cache()
+        scope = feed_cache.group_scope(1)
+        before = feed_cache.generations([scope])[scope]
+        key = feed_cache.GENERATION_KEY % scope
+        self.assertEqual(first.get(key), before)
+        feed_cache.bump([scope])
+        self.assertEqual(second.get(key), before + 1)
+        second.incr(key)
+        self.assertEqual(feed_cache.generations([scope])[scope], before + 2)
+
+    def test_stampede_protection(self):
+        calls = []
+
+        def slow_compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'страница'
+
+        results = []
+
+        def worker():
+            results.append(get_or_compute(
+                'page', slow_compute, 60, cache=self.worker_cache()))
+
+        threads = [threading.Thread(target=worker) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['страница'] * 5)
+
+    def test_early_recomputation_serves_stale_value(self):
+        cache.set('page', ('старое', 1.0, time.time() - 1), 60)
+        cache.add('page:lock', 1, 10)
+        self.assertEqual(
+            get_or_compute('page', lambda: 'новое', 60), 'старое')
+        cache.delete('page:lock')
+        self.assertEqual(
+            get_or_compute('page', lambda: 'новое', 60), 'новое')
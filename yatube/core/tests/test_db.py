@@ -0,0 +1,41 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from core import db
+
+
+class SQLitePragmasTest(TestCase):
+    def test_pragmas_applied_on_connect(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Только для SQLite')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            # 1 == NORMAL
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 20000)
+
+
+class HealthCheckTest(SimpleTestCase):
+    def make_connection(self, usable, checks=True, atomic=False):
+        conn = mock.Mock(in_atomic_block=atomic,
+                         settings_dict={'CONN_HEALTH_CHECKS': checks})
+        conn.is_usable.return_value = usable
+        return conn
+
+    def test_closes_broken_connections_only(self):
+        broken = self.make_connection(usable=False)
+        alive = self.make_connection(usable=True)
+        unchecked = self.make_connection(usable=False, checks=False)
+        in_transaction = self.make_connection(usable=False, atomic=True)
+        closed = self.make_connection(usable=False)
+        closed.connection = None
+        with mock.patch.object(db, 'connections') as connections:
+            connections.all.return_value = [
+                broken, alive, unchecked, in_transaction, closed]
+            db.check_connections()
+        broken.close.assert_called_once_with()
+        for conn in (alive, unchecked, in_transaction, closed):
+            conn.close.assert_not_called()
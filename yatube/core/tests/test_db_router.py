@@ -0,0 +1,125 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from api.models import Token
+from posts.models import Post
+from .. import db_router
+
+User = get_user_model()
+
+REPLICA = 'replica'
+
+
+class ReplicaRoutingTest(TestCase):
+    """Основная база — тестовая default, реплика — отдельный файл SQLite.
+
+    Данные между ними не реплицируются, поэтому по содержимому страницы
+    видно, из какой базы она прочитана.
+    """
+    databases = {'default', REPLICA}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.replica_dir = tempfile.mkdtemp()
+        cls.replica_settings = override_settings(REPLICA_DATABASES=[REPLICA])
+        cls.replica_settings.enable()
+        connections.databases[REPLICA] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(cls.replica_dir, 'replica.sqlite3'),
+        }
+        call_command('migrate', database=REPLICA, verbosity=0,
+                     interactive=False)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.replica_settings.disable()
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.databases[REPLICA]
+        shutil.rmtree(cls.replica_dir, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='writer')
+        cls.post = Post.objects.create(text='Пост в основной базе',
+                                       author=cls.user)
+        # Сигналы на реплике не нужны: она получает только копии строк.
+        User.objects.using(REPLICA).bulk_create([User(username='writer')])
+        Post.objects.using(REPLICA).bulk_create([Post(
+            text='Пост на реплике',
+            author=User.objects.using(REPLICA).get(username='writer'))])
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_read_only_view_reads_replica(self):
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, 'Пост на реплике')
+        self.assertNotContains(response, 'Пост в основной базе')
+
+    def test_other_views_read_primary(self):
+        response = self.client.get(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}))
+        self.assertContains(response, 'Пост в основной базе')
+
+    def test_write_pins_reads_to_primary(self):
+        response = self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'Комментарий'})
+        self.assertIn('pin_primary', response.cookies)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Пост в основной базе')
+        self.assertNotContains(response, 'Пост на реплике')
+
+    def test_token_write_pins_api_reads(self):
+        token = Token.objects.create(user=self.user)
+        auth = {'HTTP_AUTHORIZATION': 'Token %s' % token.key}
+        # У клиента API нет cookie: каждый запрос — с чистого клиента.
+        response = Client().post(
+            reverse('api:post_comments', kwargs={'post_id': self.post.pk}),
+            json.dumps({'text': 'Комментарий'}),
+            content_type='application/json', **auth)
+        self.assertEqual(response.status_code, 201)
+        response = Client().get(reverse('api:posts'), **auth)
+        self.assertContains(response, 'Пост в основной базе')
+        response = Client().get(reverse('api:posts'))
+        self.assertContains(response, 'Пост на реплике')
+
+    def test_reads_do_not_pin(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn('pin_primary', response.cookies)
+
+
+@override_settings(REPLICA_DATABASES=['replica_1', 'replica_2'])
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        self.router = db_router.ReplicaRouter()
+
+    def test_one_replica_per_request(self):
+        chosen = []
+        for _ in range(2):
+            db_router._state.replica = db_router.choose_replica()
+            try:
+                chosen.append({self.router.db_for_read(Post)
+                               for _ in range(3)})
+            finally:
+                db_router._state.replica = None
+        self.assertEqual([len(replicas) for replicas in chosen], [1, 1])
+        self.assertEqual(chosen[0] | chosen[1], {'replica_1', 'replica_2'})
+
+    def test_primary_outside_read_only_request(self):
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        self.assertEqual(self.router.db_for_write(Post), 'default')
@@ -0,0 +1,50 @@
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotFound
+from django.template import Context, Template
+from django.test import RequestFactory, SimpleTestCase
+
+from core import page_cache
+
+
+@page_cache.register('test_viewer')
+def viewer(request, name):
+    return '%s:%s' % (name, request.viewer)
+
+
+class PageCacheTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+        self.status = 200
+
+    def view(self, request):
+        self.calls += 1
+        content = Template(
+            "{% load holes %}<p>{% hole 'test_viewer' name='-->' %}</p>"
+        ).render(Context({'request': request}))
+        response_class = (HttpResponse if self.status == 200
+                          else HttpResponseNotFound)
+        return response_class(content)
+
+    def get(self, viewer, parts=('v1',), method='get'):
+        request = getattr(RequestFactory(), method)('/page/')
+        request.viewer = viewer
+        view = page_cache.cached_page(lambda request: parts)(self.view)
+        return view(request)
+
+    def test_body_is_shared_and_holes_are_filled(self):
+        self.assertEqual(self.get('anna').content, b'<p>-->:anna</p>')
+        self.assertEqual(self.get('boris').content, b'<p>-->:boris</p>')
+        self.assertEqual(self.calls, 1)
+        self.get('anna', parts=('v2',))
+        self.assertEqual(self.calls, 2)
+
+    def test_only_successful_get_is_cached(self):
+        self.get('anna', method='post')
+        self.get('anna', parts=None)
+        self.status = 404
+        response = self.get('anna')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.content, b'<p>-->:anna</p>')
+        self.get('anna')
+        self.assertEqual(self.calls, 4)
@@ -0,0 +1,146 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from core import performance
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+class PerformanceMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+        Post.objects.create(text='Пост', author=cls.user)
+
+    def setUp(self):
+        performance.registry.reset()
+        cache.clear()
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'total;dur=[\d.]+')
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertNotIn('tpl;dur=0.0,', timing)
+        self.assertRegex(timing, r'cache;desc="\d+ hits, [1-9]\d* misses"')
+
+    def test_counts_cache_hits_and_misses(self):
+        def view(request):
+            cache.get('missing')
+            cache.set('present', 1)
+            cache.get('present')
+            cache.get_many(['present', 'missing'])
+            return HttpResponse()
+
+        middleware = performance.PerformanceMiddleware(view)
+        response = middleware(RequestFactory().get('/'))
+        self.assertIn('cache;desc="2 hits, 2 misses"',
+                      response['Server-Timing'])
+        self.assertIsNone(cache.get('missing'))
+        self.assertEqual(cache.get('missing', 'default'), 'default')
+
+    @override_settings(PERFORMANCE_SLOW_REQUEST_MS=0)
+    def test_slow_request_is_logged_with_queries(self):
+        with self.assertLogs('core.performance', 'WARNING') as logs:
+            self.client.get(reverse('posts:index'))
+        self.assertIn('posts:index', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('posts:index'))
+        self.client.get('/no-such-page/')
+        response = self.client.get(reverse('metrics'))
+        body = response.content.decode()
+        self.assertIn(
+            'yatube_request_duration_seconds_count'
+            '{view="posts:index",method="GET"} 1', body)
+        self.assertIn(
+            'yatube_responses_total'
+            '{view="unresolved",method="GET",status="404"} 1', body)
+        self.assertIn('yatube_db_queries_total{view="posts:index"', body)
+        self.assertIn(
+            'yatube_request_duration_seconds_bucket'
+            '{view="posts:index",method="GET",le="+Inf"} 1', body)
+
+    def test_metrics_hidden_from_other_addresses(self):
+        response = self.client.get(reverse('metrics'),
+                                   REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 404)
+
+
+class NPlusOneTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='Пост', author=cls.user)
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=str(i))
+            for i in range(8))
+
+    def call(self, view):
+        middleware = performance.PerformanceMiddleware(view)
+        return middleware(RequestFactory().get('/'))
+
+    def test_query_shape_ignores_values(self):
+        self.assertEqual(
+            performance.query_shape(
+                "SELECT * FROM t WHERE id IN (%s, %s, %s) AND x = 'a''b' "
+                "LIMIT 21"),
+            'SELECT * FROM t WHERE id IN (%s, ...) AND x = ? LIMIT ?')
+
+    def test_raises_with_python_frame(self):
+        def view(request):
+            for comment in Comment.objects.all():
+                comment.author.username
+            return HttpResponse()
+
+        with self.assertRaises(performance.NPlusOneError) as error:
+            self.call(view)
+        self.assertIn('8 раз', str(error.exception))
+        self.assertIn('core/tests/test_performance.py', str(error.exception))
+
+    def test_reports_template_line(self):
+        template = Template('{% for comment in comments %}\n'
+                            '{{ comment.author.username }}\n'
+                            '{% endfor %}')
+
+        def view(request):
+            return HttpResponse(template.render(Context({
+                'comments': Comment.objects.all()})))
+
+        with self.assertRaisesRegex(performance.NPlusOneError,
+                                    r'шаблон .*:2'):
+            self.call(view)
+
+    def test_select_related_passes(self):
+        def view(request):
+            for comment in Comment.objects.select_related('author'):
+                comment.author.username
+            return HttpResponse()
+
+        self.assertEqual(self.call(view).status_code, 200)
+
+    @override_settings(NPLUSONE_MODE='log')
+    def test_log_mode(self):
+        def view(request):
+            for comment in Comment.objects.all():
+                comment.author.username
+            return HttpResponse()
+
+        with self.assertLogs('core.performance', 'WARNING') as logs:
+            self.assertEqual(self.call(view).status_code, 200)
+        self.assertIn('N+1', logs.output[0])
+
+    @override_settings(NPLUSONE_MODE='')
+    def test_disabled(self):
+        def view(request):
+            for comment in Comment.objects.all():
+                comment.author.username
+            return HttpResponse()
+
+        self.assertEqual(self.call(view).status_code, 200)
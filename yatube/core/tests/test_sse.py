@@ -0,0 +1,144 @@
+import asyncio
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from core import pubsub
+from core.asgi import WsgiToAsgi
+from core.sse import EventStreamResponse
+
+
+class BrokerTest(SimpleTestCase):
+    def check_read(self, broker):
+        start = broker.last_id()
+        broker.publish('a', 'post', {'id': 1})
+        broker.publish('b', 'post', {'id': 2})
+        last = broker.publish('a', 'comment', {'id': 3})
+        events, after = broker.read(start, {'a'})
+        self.assertEqual(events, [(start + 1, 'post', {'id': 1}),
+                                  (last, 'comment', {'id': 3})])
+        self.assertEqual(after, last)
+        self.assertEqual(broker.read(after, {'a'}), ([], last))
+
+    def test_memory_broker(self):
+        self.check_read(pubsub.MemoryBroker())
+
+    def test_cache_broker(self):
+        cache.clear()
+        self.check_read(pubsub.CacheBroker())
+
+    def test_cache_broker_waits_for_unwritten_event(self):
+        cache.clear()
+        broker = pubsub.CacheBroker()
+        first = broker.publish('a', 'post', {'id': 1})
+        # Номер выдан, но событие ещё не записано.
+        cache.incr(broker.sequence_key)
+        broker.publish('a', 'post', {'id': 3})
+        events, after = broker.read(0, {'a'})
+        self.assertEqual(len(events), 1)
+        self.assertEqual(after, first)
+        with mock.patch.object(pubsub, 'GAP_TIMEOUT', 0):
+            events, after = broker.read(after, {'a'})
+        self.assertEqual(events, [(first + 2, 'post', {'id': 3})])
+
+    def expire(self, broker, count):
+        for _ in range(count):
+            cache.delete(broker.event_key
+                         % broker.publish('a', 'post', {'id': 0}))
+        return broker.publish('a', 'post', {'id': 9})
+
+    def test_cache_broker_skips_old_expired_events_at_once(self):
+        cache.clear()
+        broker = pubsub.CacheBroker()
+        with mock.patch.object(pubsub, 'GAP_WINDOW', 3):
+            number = self.expire(broker, 8)
+            # Старые номера истекли, и пропуск целиком пропущен без
+            # ожидания.
+            self.assertEqual(broker.read(0, {'a'}),
+                             ([(number, 'post', {'id': 9})], number))
+            # Недавно выданный номер без события ещё ждём.
+            cache.incr(broker.sequence_key)
+            self.assertEqual(broker.read(number, {'a'}), ([], number))
+
+    def test_cache_broker_skips_expired_run_after_one_wait(self):
+        cache.clear()
+        broker = pubsub.CacheBroker()
+        number = self.expire(broker, 8)
+        self.assertEqual(broker.read(0, {'a'}), ([], 0))
+        with mock.patch.object(pubsub, 'GAP_TIMEOUT', 0):
+            events, after = broker.read(0, {'a'})
+        self.assertEqual(events, [(number, 'post', {'id': 9})])
+        self.assertEqual(after, number)
+
+
+@override_settings(PUBSUB_BROKER='core.pubsub.MemoryBroker',
+                   SSE_POLL_INTERVAL=0.01, SSE_MAX_AGE=0.2, SSE_RETRY_MS=500)
+class EventStreamTest(SimpleTestCase):
+    def test_sync_stream(self):
+        broker = pubsub.get_broker()
+        response = EventStreamResponse(['a'])
+        number = broker.publish('a', 'post', {'id': 7})
+        broker.publish('b', 'post', {'id': 8})
+        body = b''.join(response.streaming_content).decode()
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertTrue(body.startswith('retry: 500\n\n'))
+        self.assertIn('id: %d\nevent: post\ndata: {"id": 7}\n\n' % number,
+                      body)
+        self.assertNotIn('"id": 8', body)
+
+    def test_last_event_id_replays_missed_events(self):
+        broker = pubsub.get_broker()
+        number = broker.publish('a', 'post', {'id': 1})
+        response = EventStreamResponse(['a'], str(number - 1))
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn('id: %d\n' % number, body)
+
+    @override_settings(SSE_MAX_AGE=10)
+    def test_asgi_stream_does_not_hold_pool_thread(self):
+        broker = pubsub.get_broker()
+
+        def application(environ, start_response):
+            if environ['PATH_INFO'] == '/plain/':
+                start_response('200 OK', [])
+                return [b'plain']
+            response = EventStreamResponse(['a'])
+            broker.publish('a', 'post', {'id': 1})
+            start_response('200 OK', list(response.items()))
+            return response
+
+        asgi = WsgiToAsgi(application, threads=1)
+
+        async def request(path, sent, disconnect):
+            messages = [{'type': 'http.request', 'body': b''}]
+
+            async def receive():
+                if messages:
+                    return messages.pop()
+                await disconnect.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                sent.append(message)
+
+            await asgi({'type': 'http', 'method': 'GET', 'path': path,
+                        'headers': []}, receive, send)
+
+        async def main():
+            stream, plain = [], []
+            disconnect = asyncio.Event()
+            streaming = asyncio.ensure_future(
+                request('/events/', stream, disconnect))
+            # Единственный поток пула свободен, пока поток SSE открыт.
+            await asyncio.wait_for(
+                request('/plain/', plain, asyncio.Event()), 2)
+            while len(stream) < 3:
+                await asyncio.sleep(0.01)
+            disconnect.set()
+            await asyncio.wait_for(streaming, 2)
+            return stream, plain
+
+        stream, plain = asyncio.run(main())
+        self.assertEqual(plain[1]['body'], b'plain')
+        self.assertEqual(stream[0]['status'], 200)
+        self.assertIn(b'event: post', stream[2]['body'])
@@ -0,0 +1,106 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from core import tasks
+from core.models import Task
+from posts import search
+from posts.models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+calls = []
+
+
+@tasks.task
+def remember(value):
+    calls.append(value)
+
+
+@tasks.task(max_attempts=2)
+def explode(value):
+    raise RuntimeError('сбой %s' % value)
+
+
+@override_settings(TASKS_EAGER=False, TASKS_RETRY_DELAY=10)
+class TaskQueueTest(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_after_commit_with_key(self):
+        with transaction.atomic():
+            remember.enqueue(1, key='one')
+            self.assertFalse(Task.objects.exists())
+        remember.enqueue(1, key='one')
+        remember.enqueue(2)
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_rolled_back_transaction_enqueues_nothing(self):
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                remember.enqueue(1)
+                raise ValueError
+        self.assertFalse(Task.objects.exists())
+
+    def test_run_next_executes_and_deletes(self):
+        remember.enqueue('a')
+        remember.enqueue('b')
+        self.assertTrue(tasks.run_next())
+        self.assertTrue(tasks.run_next())
+        self.assertFalse(tasks.run_next())
+        self.assertEqual(calls, ['a', 'b'])
+        self.assertFalse(Task.objects.exists())
+
+    def test_retry_with_backoff_then_failed(self):
+        explode.enqueue(1)
+        with self.assertLogs('core.tasks', 'WARNING'):
+            tasks.run_next()
+        row = Task.objects.get()
+        self.assertEqual((row.state, row.attempts), (Task.PENDING, 1))
+        self.assertIn('сбой 1', row.last_error)
+        self.assertGreater(row.run_at,
+                           timezone.now() + timedelta(seconds=9))
+        self.assertFalse(tasks.run_next())
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('core.tasks', 'ERROR'):
+            tasks.run_next()
+        row.refresh_from_db()
+        self.assertEqual((row.state, row.attempts), (Task.FAILED, 2))
+        self.assertFalse(tasks.run_next())
+
+    def test_key_is_free_once_task_is_running(self):
+        remember.enqueue(1, key='same')
+        row = tasks.claim()
+        remember.enqueue(2, key='same')
+        self.assertEqual(Task.objects.filter(state=Task.PENDING).count(), 1)
+        tasks.execute(row)
+        self.assertTrue(tasks.run_next())
+        self.assertEqual(calls, [1, 2])
+
+    def test_expired_lease_is_reclaimed(self):
+        remember.enqueue(1)
+        tasks.claim()
+        self.assertIsNone(tasks.claim())
+        Task.objects.update(locked_until=timezone.now() - timedelta(1))
+        row = tasks.claim()
+        self.assertEqual(row.attempts, 2)
+
+    def test_worker_runs_post_side_effects(self):
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=author)
+        post = Post.objects.create(text='Фоновая публикация', author=author)
+        self.assertFalse(TimelineEntry.objects.exists())
+        # Один поток: общая тестовая база SQLite в памяти не выдерживает
+        # двух писателей сразу ("database table is locked").
+        call_command('run_worker', '--burst', '--threads', '1',
+                     stdout=StringIO())
+        self.assertFalse(Task.objects.exists())
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=reader, post=post).exists())
+        self.assertEqual(list(search.search('фоновая')), [post])
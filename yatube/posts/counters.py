@@ -0,0 +1,64 @@
+"""Денормализованные счётчики постов, комментариев и подписок."""
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from users.models import Profile
+
+from .models import Comment, Follow, Post, User
+
+
+def _shifted(field, delta):
+    # Разошедшийся счётчик не должен уйти в минус: поля беззнаковые.
+    return Greatest(F(field) + delta, 0)
+
+
+def change_profile(user_id, **deltas):
+    Profile.objects.filter(user_id=user_id).update(
+        **{field: _shifted(field, delta) for field, delta in deltas.items()})
+
+
+def change_comments(post_id, delta):
+    # Страница поста меняется вместе с комментариями: сдвигаем
+    # updated_at, по нему считаются ETag и Last-Modified.
+    Post.objects.filter(pk=post_id).update(
+        comments_count=_shifted('comments_count', delta),
+        updated_at=timezone.now())
+
+
+def _actual(model, field, outer='pk'):
+    rows = (model.objects.filter(**{field: OuterRef(outer)}).order_by()
+            .values(field).annotate(total=Count('pk')).values('total'))
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+def counters():
+    return [
+        (Profile, 'posts_count', _actual(Post, 'author', 'user_id')),
+        (Profile, 'followers_count', _actual(Follow, 'author', 'user_id')),
+        (Profile, 'following_count', _actual(Follow, 'user', 'user_id')),
+        (Post, 'comments_count', _actual(Comment, 'post')),
+    ]
+
+
+def reconcile(dry_run=False):
+    """Пересчитывает разошедшиеся счётчики одним UPDATE на счётчик.
+
+    Возвращает число исправленных (или найденных при dry_run) строк
+    для каждого счётчика.
+    """
+    missing = User.objects.filter(profile__isnull=True)
+    report = {'profiles_created': missing.count()}
+    if not dry_run:
+        Profile.objects.bulk_create(
+            [Profile(user_id=pk) for pk in missing.values_list('pk',
+                                                               flat=True)],
+            ignore_conflicts=True)
+    for model, field, actual in counters():
+        drifted = model.objects.exclude(**{field: actual})
+        label = '%s.%s' % (model._meta.model_name, field)
+        if dry_run:
+            report[label] = drifted.count()
+        else:
+            report[label] = drifted.update(**{field: actual})
+    return report
@@ -0,0 +1,30 @@
+"""События живых обновлений follow_index и post_detail.
+
+В событии только id и адрес фрагмента: страница сама запросит готовую
+разметку поста или комментария, а не перерисовывает ленту целиком.
+"""
+from django.urls import reverse
+
+from core.pubsub import publish_on_commit
+
+
+def author_channel(author_id):
+    return 'author:%s' % author_id
+
+
+def comments_channel(post_id):
+    return 'comments:%s' % post_id
+
+
+def post_published(post):
+    publish_on_commit(author_channel(post.author_id), 'post', {
+        'id': post.pk,
+        'url': reverse('posts:post_card', args=[post.pk]),
+    })
+
+
+def comment_added(comment):
+    publish_on_commit(comments_channel(comment.post_id), 'comment', {
+        'id': comment.pk,
+        'url': reverse('posts:comment', args=[comment.post_id, comment.pk]),
+    })
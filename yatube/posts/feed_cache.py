@@ -0,0 +1,84 @@
+"""Версионированный кеш фрагментов лент.
+
+Каждой области (вся лента, группа, автор, подписки пользователя)
+соответствует счётчик поколения. Ключ фрагмента включает счётчики всех
+областей, из которых собрана страница, и курсор страницы, поэтому после
+изменения поста достаточно увеличить счётчик: старые фрагменты больше
+не читаются и доживают в кеше до истечения срока.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+GENERATION_KEY = 'posts:generation:%s'
+ALL = 'all'
+
+
+def group_scope(group_id):
+    return 'group:%s' % group_id
+
+
+def author_scope(author_id):
+    return 'author:%s' % author_id
+
+
+def follower_scope(user_id):
+    return 'follower:%s' % user_id
+
+
+def comments_scope(post_id):
+    return 'comments:%s' % post_id
+
+
+def post_scopes(post, group_ids=()):
+    scopes = {ALL, author_scope(post.author_id)}
+    for group_id in {post.group_id, *group_ids}:
+        if group_id is not None:
+            scopes.add(group_scope(group_id))
+    return scopes
+
+
+def _initial_generation():
+    # Счётчик, вытесненный из кеша, не должен начаться заново с
+    # уже использованного значения, иначе вернутся старые фрагменты.
+    return int(time.time() * 1000)
+
+
+def generations(scopes):
+    keys = {GENERATION_KEY % scope: scope for scope in scopes}
+    found = cache.get_many(keys)
+    result = {}
+    for key, scope in keys.items():
+        if key not in found:
+            cache.add(key, _initial_generation(), None)
+            found[key] = cache.get(key)
+        result[scope] = found[key]
+    return result
+
+
+def bump(scopes):
+    for scope in scopes:
+        key = GENERATION_KEY % scope
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_generation(), None)
+
+
+class FeedCache:
+    """Ключ и время жизни фрагмента страницы ленты для ``{% cache %}``."""
+
+    def __init__(self, view, scopes, page_obj):
+        self.view = view
+        self.scopes = sorted(scopes)
+        self.page_obj = page_obj
+        self.timeout = settings.FEED_CACHE_TIMEOUT
+
+    @property
+    def key(self):
+        versions = generations(self.scopes)
+        parts = ['%s=%s' % (scope, versions[scope]) for scope in self.scopes]
+        return '%s|%s|%s|%s' % (self.view, self.page_obj.direction or '',
+                                self.page_obj.position or '',
+                                ','.join(parts))
@@ -1,5 +1,8 @@
 from django import forms
-from .models import Post, Comment
+from django.core.files.uploadedfile import UploadedFile
+
+from . import uploads
+from .models import Comment, Group, Post, User
 
 
 class PostForm(forms.ModelForm):
@@ -10,6 +13,14 @@ class PostForm(forms.ModelForm):
                       'group': 'Выберите группу'}
         fields = ('text', 'group', 'image')
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        # Без новой загрузки здесь лежит уже сохранённый файл или False.
+        if not isinstance(image, UploadedFile):
+            return image
+        uploads.check(image)
+        return uploads.normalize(image)
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -17,3 +28,39 @@ class CommentForm(forms.ModelForm):
         labels = {'text': 'Тeкст комментария'}
         help_texts = {'text': 'Введите текст комментария'}
         fields = ('text',)
+
+
+class GroupForm(forms.ModelForm):
+    class Meta:
+        model = Group
+        fields = ('title', 'slug', 'description')
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(label='Запрос', max_length=200, required=False)
+    group = forms.ModelChoiceField(
+        Group.objects.all(), label='Группа', to_field_name='slug',
+        required=False, empty_label='Все группы')
+    author = forms.ModelChoiceField(
+        User.objects.all(), label='Автор', to_field_name='username',
+        required=False, widget=forms.TextInput)
+
+
+class ExportForm(forms.Form):
+    format = forms.ChoiceField(label='Формат', required=False,
+                               choices=[('ndjson', 'NDJSON'), ('csv', 'CSV')])
+    group = forms.ModelChoiceField(
+        Group.objects.all(), label='Группа', to_field_name='slug',
+        required=False)
+    author = forms.ModelChoiceField(
+        User.objects.all(), label='Автор', to_field_name='username',
+        required=False)
+    since = forms.DateField(label='С даты', required=False)
+    until = forms.DateField(label='По дату', required=False)
+
+    def clean_format(self):
+        return self.cleaned_data['format'] or 'ndjson'
+
+    def filters(self):
+        return {name: self.cleaned_data[name]
+                for name in ('group', 'author', 'since', 'until')}
@@ -0,0 +1,55 @@
+"""Части страниц постов, свои для каждого зрителя (``core.page_cache``)."""
+from django.template.loader import render_to_string
+
+from core import sse
+from core.page_cache import register
+
+from .forms import CommentForm
+from .views import is_following
+
+
+@register('switcher')
+def switcher(request, index=False, follow=False):
+    return render_to_string('includes/switcher.html', {
+        'user': request.user, 'index': index, 'follow': follow})
+
+
+@register('follow_button')
+def follow_button(request, author_id, username):
+    return render_to_string('posts/includes/follow_button.html', {
+        'following': is_following(request, author_id),
+        'username': username,
+    })
+
+
+@register('post_edit_link')
+def post_edit_link(request, post_id, author_id):
+    if request.user.pk != author_id:
+        return ''
+    return render_to_string('posts/includes/post_edit_link.html',
+                            {'post_id': post_id})
+
+
+@register('comment_form')
+def comment_form(request, post_id):
+    if not request.user.is_authenticated:
+        return ''
+    # С request шаблон получит CSRF-токен этого зрителя.
+    return render_to_string('posts/includes/comment_form.html', {
+        'form': CommentForm(), 'post_id': post_id}, request=request)
+
+
+# Скрипты с EventSource — только там, где поток SSE можно открыть.
+@register('comment_events')
+def comment_events(request, post_id, order):
+    if not sse.available(request):
+        return ''
+    return render_to_string('posts/includes/comment_events.html', {
+        'post_id': post_id, 'order': order})
+
+
+@register('follow_events')
+def follow_events(request):
+    if not sse.available(request):
+        return ''
+    return render_to_string('posts/includes/follow_events.html')
@@ -0,0 +1,324 @@
+"""Массовая загрузка групп, постов, комментариев и подписок.
+
+Строки читаются из NDJSON или CSV по одной (формат тот же, что у
+выгрузки ``posts.export``), собираются в пачки по ``BATCH_SIZE`` и
+вставляются ``bulk_create`` — каждая пачка в своей транзакции. Авторы и
+группы ищутся по имени и слагу через кеш ``Lookup``: недостающие ключи
+пачки догружаются одним запросом.
+
+``bulk_create`` не вызывает ``save()`` и сигналы, поэтому счётчики,
+ленты подписок, поисковый индекс, варианты картинок и кеш лент после
+загрузки пересобираются один раз в ``finish``.
+"""
+import csv
+import json
+from contextlib import contextmanager
+from itertools import islice
+
+from django.core.management import call_command
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import counters, feed_cache, search, timeline
+from .models import Comment, Follow, Group, Post, User
+
+BATCH_SIZE: int = 1000
+# SQLite не принимает больше 999 параметров в запросе.
+LOOKUP_CHUNK: int = 500
+
+
+def read(file, format='ndjson'):
+    """Строки открытого текстового файла: словари CSV или строки NDJSON,
+    которые разбирает ``load``, чтобы битая строка попала в пропущенные.
+    """
+    if format == 'csv':
+        yield from csv.DictReader(file)
+        return
+    for line in file:
+        if line.strip():
+            yield line
+
+
+class Lookup:
+    """Кеш ``значение поля → pk``; отсутствующие значения тоже
+    запоминаются, как None."""
+
+    def __init__(self, queryset, field, values=('pk',)):
+        self.queryset = queryset
+        self.field = field
+        self.values = values
+        self.cache = {}
+
+    def load(self, keys):
+        # Значения другого типа (списки из JSON) отвергнет build.
+        missing = list({key for key in keys if isinstance(key, (str, int))
+                        and key not in self.cache})
+        for start in range(0, len(missing), LOOKUP_CHUNK):
+            chunk = missing[start:start + LOOKUP_CHUNK]
+            self.cache.update(dict.fromkeys(chunk))
+            found = self.queryset.filter(
+                **{'%s__in' % self.field: chunk}).values_list(
+                self.field, *self.values)
+            for key, *values in found:
+                self.cache[key] = values[0] if len(values) == 1 else values
+
+    def __getitem__(self, key):
+        return self.cache.get(key)
+
+
+class SkipRow(Exception):
+    pass
+
+
+# Ошибки данных в строке: она пропускается, загрузка идёт дальше.
+ROW_ERRORS = (SkipRow, KeyError, TypeError, ValueError)
+
+
+def _parse(row):
+    if isinstance(row, str):
+        row = json.loads(row)
+    if not isinstance(row, dict):
+        raise SkipRow('строка не объект JSON')
+    return row
+
+
+def _required(row, name):
+    value = row.get(name)
+    if value is None:
+        raise SkipRow('нет поля %r' % name)
+    return value
+
+
+def _moment(value):
+    if not value:
+        return timezone.now()
+    moment = parse_datetime(value)
+    if moment is None:
+        raise SkipRow('неверная дата %r' % value)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def _resolve(lookup, key, what):
+    pk = lookup[key]
+    if pk is None:
+        raise SkipRow('%s %r не найден' % (what, key))
+    return pk
+
+
+def _pk(row):
+    # Ключи сохраняются, чтобы комментарии могли сослаться на посты.
+    return int(row['id']) if row.get('id') else None
+
+
+class Importer:
+    """Превращает пачки строк одного вида в объекты модели."""
+
+    def __init__(self):
+        self.users = Lookup(User.objects, 'username')
+        self.groups = Lookup(Group.objects, 'slug')
+        # Постов могут быть миллионы, их кеш живёт одну пачку.
+        self.posts = Lookup(Post.objects, 'pk', ('author_id', 'group_id'))
+        # id постов этой загрузки: вставленных или уже лежавших в базе
+        # с тем же автором и текстом. None — посты не загружались, и
+        # комментарии ссылаются на посты, которые уже есть в базе.
+        self.imported_posts = None
+        self.scopes = set()
+
+    def prepare_groups(self, rows):
+        pass
+
+    def build_groups(self, row):
+        return Group(title=_required(row, 'title'),
+                     slug=_required(row, 'slug'),
+                     description=row.get('description') or '')
+
+    def prepare_posts(self, rows):
+        if self.imported_posts is None:
+            self.imported_posts = set()
+        self.users.load(row.get('author_username') for row in rows)
+        self.groups.load(row['group_slug'] for row in rows
+                         if row.get('group_slug'))
+
+    def build_posts(self, row):
+        author_id = _resolve(self.users, row.get('author_username'),
+                             'автор')
+        group_id = None
+        if row.get('group_slug'):
+            group_id = _resolve(self.groups, row['group_slug'], 'группа')
+        post = Post(id=_pk(row), text=_required(row, 'text'),
+                    author_id=author_id,
+                    group_id=group_id, image=row.get('image') or '',
+                    pub_date=_moment(row.get('pub_date')))
+        post.updated_at = (_moment(row['updated_at'])
+                           if row.get('updated_at') else post.pub_date)
+        self.scopes.update(feed_cache.post_scopes(post))
+        return post
+
+    def conflict_posts(self, post, current):
+        if (current.author_id, current.text) == (post.author_id, post.text):
+            # Повторная загрузка того же поста: комментарии к нему
+            # принимаются.
+            self.imported_posts.add(post.pk)
+            return 'пост %s уже загружен' % post.pk
+        return 'id %s занят другим постом' % post.pk
+
+    def created_posts(self, posts):
+        self.imported_posts.update(post.pk for post in posts
+                                   if post.pk is not None)
+
+    def prepare_comments(self, rows):
+        self.users.load(row.get('author_username') for row in rows)
+        self.posts.cache.clear()
+        self.posts.load(int(row['post_id']) for row in rows
+                        if str(row.get('post_id', '')).isdigit())
+
+    def build_comments(self, row):
+        author_id = _resolve(self.users, row.get('author_username'),
+                             'автор')
+        post_id = int(_required(row, 'post_id'))
+        post_author_id, post_group_id = _resolve(self.posts, post_id, 'пост')
+        if (self.imported_posts is not None
+                and post_id not in self.imported_posts):
+            raise SkipRow('пост %s не из этой загрузки' % post_id)
+        comment = Comment(id=_pk(row), text=_required(row, 'text'),
+                          author_id=author_id, post_id=post_id,
+                          pub_date=_moment(row.get('pub_date')))
+        comment.updated_at = (_moment(row['updated_at'])
+                              if row.get('updated_at') else comment.pub_date)
+        self.scopes.update(feed_cache.post_scopes(
+            Post(author_id=post_author_id, group_id=post_group_id)))
+        return comment
+
+    def prepare_follows(self, rows):
+        self.users.load(row.get(name) for row in rows
+                        for name in ('user_username', 'author_username'))
+
+    def build_follows(self, row):
+        user_id = _resolve(self.users, row.get('user_username'),
+                           'пользователь')
+        author_id = _resolve(self.users, row.get('author_username'), 'автор')
+        if user_id == author_id:
+            raise SkipRow('подписка на себя')
+        self.scopes.add(feed_cache.follower_scope(user_id))
+        return Follow(user_id=user_id, author_id=author_id)
+
+
+MODELS = {
+    'groups': Group,
+    'posts': Post,
+    'comments': Comment,
+    'follows': Follow,
+}
+
+
+@contextmanager
+def keep_timestamps(model):
+    """Отключает auto_now и auto_now_add: даты приходят из файла."""
+    fields = [field for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now', False)
+              or getattr(field, 'auto_now_add', False)]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _each(func, numbered, skip):
+    """``(номер, func(строка))`` для строк, на которых func не упала."""
+    result = []
+    for number, row in numbered:
+        try:
+            result.append((number, func(row)))
+        except ROW_ERRORS as error:
+            skip(number, error)
+    return result
+
+
+def _new_objects(importer, kind, built, skip):
+    """Объекты, чьи явные id ещё свободны.
+
+    ``bulk_create`` с ``ignore_conflicts`` молча пропустил бы строку с
+    занятым id, поэтому занятые id ищутся одним запросом на пачку и
+    строки с ними попадают в пропущенные.
+    """
+    pks = [obj.pk for _, obj in built if obj.pk is not None]
+    current = MODELS[kind].objects.in_bulk(pks) if pks else {}
+    conflict = getattr(importer, 'conflict_%s' % kind, None)
+    objects = []
+    for number, obj in built:
+        if obj.pk is None:
+            objects.append(obj)
+        elif obj.pk in current:
+            skip(number, SkipRow(
+                conflict(obj, current[obj.pk]) if conflict is not None
+                else 'id %s уже занят' % obj.pk))
+        else:
+            # Тот же id ниже в пачке — тоже конфликт.
+            current[obj.pk] = obj
+            objects.append(obj)
+    return objects
+
+
+def load(importer, kind, rows, batch_size=BATCH_SIZE, on_skip=None):
+    """Загружает строки одного вида; возвращает ``(прочитано, пропущено)``.
+
+    Строки с уже занятым id пропускаются и сообщаются в ``on_skip``;
+    существующие слаги и подписки пропускает база. Загрузку можно
+    повторить.
+    """
+    model = MODELS[kind]
+    prepare = getattr(importer, 'prepare_%s' % kind)
+    build = getattr(importer, 'build_%s' % kind)
+    created = getattr(importer, 'created_%s' % kind, None)
+    rows = iter(rows)
+    total = skipped = 0
+
+    def skip(number, error):
+        nonlocal skipped
+        skipped += 1
+        if on_skip is not None:
+            on_skip(number, error)
+
+    with keep_timestamps(model):
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            parsed = _each(_parse, enumerate(batch, total + 1), skip)
+            prepare([row for _, row in parsed])
+            built = _each(build, parsed, skip)
+            with transaction.atomic():
+                objects = _new_objects(importer, kind, built, skip)
+                model.objects.bulk_create(objects, ignore_conflicts=True)
+            if created is not None:
+                created(objects)
+            total += len(batch)
+    return total, skipped
+
+
+def finish(importer, kinds, images=True, stdout=None):
+    """Один раз делает то, что при обычном save() делают сигналы."""
+    models = [MODELS[kind] for kind in kinds]
+    # Явные id не двигают последовательности PostgreSQL.
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+    report = counters.reconcile()
+    if {'posts', 'follows'} & set(kinds):
+        report['timelines'] = timeline.rebuild()
+    if 'posts' in kinds:
+        report['search_index'] = search.get_backend().rebuild()
+        if images:
+            call_command('build_image_variants', stdout=stdout)
+    feed_cache.bump(importer.scopes | {feed_cache.ALL})
+    return report
@@ -0,0 +1,98 @@
+import random
+import time
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import search
+from posts.models import Group, Post
+
+User = get_user_model()
+
+CHUNK = 10000
+SYLLABLES = ('ка', 'ро', 'ми', 'ло', 'на', 'те', 'су', 'вы', 'пе', 'до',
+             'за', 'ли', 'го', 'ря', 'чу', 'бе')
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает полнотекстовый индекс с icontains на первой '
+            'странице поиска. С --seed создаёт синтетические посты и '
+            'откатывает их в конце, например --seed 1000000.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Создать N синтетических постов и откатить их в конце')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('queries', nargs='*',
+                            help='Запросы; по умолчанию слова из корпуса')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                vocabulary = []
+                if options['seed']:
+                    vocabulary = self.seed(options['seed'])
+                queries = options['queries'] or self.default_queries(
+                    vocabulary)
+                self.compare(queries, options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, total):
+        rng = random.Random(0)
+        vocabulary = sorted({
+            ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+            for _ in range(5000)})
+        # Частоты слов по закону Ципфа, как в живом тексте.
+        weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+        User.objects.bulk_create(
+            User(username=f'search_user_{i}') for i in range(100))
+        users = list(User.objects.filter(username__startswith='search_user_'))
+        Group.objects.bulk_create(
+            Group(title=f'Группа {i}', slug=f'search-group-{i}',
+                  description='') for i in range(10))
+        groups = list(Group.objects.filter(slug__startswith='search-group-'))
+        posts = (
+            Post(text=' '.join(rng.choices(vocabulary, weights, k=30)),
+                 author=rng.choice(users), group=rng.choice(groups))
+            for _ in range(total))
+        started = time.perf_counter()
+        while True:
+            chunk = list(islice(posts, CHUNK))
+            if not chunk:
+                break
+            Post.objects.bulk_create(chunk)
+        indexed = search.get_backend().rebuild()
+        self.stdout.write(
+            f'Создано постов: {total}, проиндексировано: {indexed} '
+            f'за {time.perf_counter() - started:.1f} с')
+        return vocabulary
+
+    def default_queries(self, vocabulary):
+        if not vocabulary:
+            return []
+        return [vocabulary[0], vocabulary[len(vocabulary) // 2],
+                vocabulary[-1], f'{vocabulary[1]} {vocabulary[2]}']
+
+    def compare(self, queries, repeat):
+        backends = [search.get_backend(), search.SimpleBackend()]
+        feed = Post.objects.for_feed().order_by(*search.ORDERING)
+        for query in queries:
+            self.stdout.write(self.style.MIGRATE_HEADING(f'«{query}»'))
+            for backend in backends:
+                queryset = search.search(query, feed, backend=backend)[:11]
+                started = time.perf_counter()
+                for _ in range(repeat):
+                    found = len(list(queryset))
+                elapsed = (time.perf_counter() - started) / repeat * 1000
+                self.stdout.write(
+                    f'{backend.name}: {elapsed:.2f} мс, строк: {found}')
+                self.stdout.write(queryset.explain())
@@ -0,0 +1,152 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.test import Client, override_settings
+
+from core.asgi import WsgiToAsgi, environ
+
+from .benchmark_views import percentile, view_targets
+
+MODES = ('wsgi', 'asgi')
+
+
+def with_db_latency(application, seconds):
+    """Добавляет к каждому SQL-запросу задержку сети до базы."""
+    def delay(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def wrapped(environ, start_response):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(delay))
+            return application(environ, start_response)
+    return wrapped
+
+
+def call_wsgi(application, scope):
+    statuses = []
+    result = application(environ(scope, b''),
+                         lambda status, headers, exc_info=None:
+                         statuses.append(int(status.split()[0])))
+    try:
+        for _ in result:
+            pass
+    finally:
+        result.close()
+    return statuses[0]
+
+
+async def call_asgi(application, scope):
+    statuses = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            statuses.append(message['status'])
+
+    await application(scope, receive, send)
+    return statuses[0]
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность yatube.wsgi с пулом '
+            'потоков, как у gunicorn --threads, и yatube.asgi при большом '
+            'числе одновременных клиентов. Запросы идут в приложение '
+            'напрямую, без сети; --db-latency-ms имитирует удалённую базу.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=64,
+                            help='Одновременных клиентов')
+        parser.add_argument('--requests', type=int, default=1000,
+                            help='Запросов на страницу и режим')
+        parser.add_argument('--wsgi-threads', type=int, default=8)
+        parser.add_argument('--asgi-threads', type=int,
+                            default=settings.ASGI_THREADS)
+        parser.add_argument('--db-latency-ms', type=float, default=0)
+        parser.add_argument('views', nargs='*',
+                            default=['index', 'follow_index'])
+
+    def handle(self, *args, **options):
+        targets = view_targets()
+        unknown = set(options['views']) - set(targets)
+        if unknown:
+            raise CommandError('Нет страниц: %s' % ', '.join(unknown))
+        application = get_wsgi_application()
+        if options['db_latency_ms']:
+            application = with_db_latency(application,
+                                          options['db_latency_ms'] / 1000)
+        self.stdout.write(
+            f'{"":16}{"режим":>6}{"rps":>10}{"p50_ms":>10}{"p95_ms":>10}'
+            f'{"ошибки":>8}')
+        with override_settings(DEBUG=False):
+            for name in options['views']:
+                scope = self.scope(*targets[name])
+                for mode in MODES:
+                    result = asyncio.run(
+                        self.measure(mode, application, scope, options))
+                    self.stdout.write(
+                        f'{name:16}{mode:>6}{result["rps"]:>10}'
+                        f'{result["p50_ms"]:>10}{result["p95_ms"]:>10}'
+                        f'{result["errors"]:>8}')
+
+    def scope(self, url, user):
+        path, _, query = url.partition('?')
+        headers = [(b'host', settings.ALLOWED_HOSTS[0].encode())]
+        if user is not None:
+            client = Client()
+            client.force_login(user)
+            cookie = client.cookies[settings.SESSION_COOKIE_NAME]
+            headers.append((b'cookie', ('%s=%s' % (
+                cookie.key, cookie.value)).encode()))
+        return {'type': 'http', 'method': 'GET', 'path': path,
+                'query_string': query.encode(), 'headers': headers,
+                'server': ('localhost', 80), 'client': ('127.0.0.1', 0)}
+
+    async def measure(self, mode, application, scope, options):
+        loop = asyncio.get_running_loop()
+        if mode == 'wsgi':
+            executor = ThreadPoolExecutor(options['wsgi_threads'])
+
+            def call():
+                return loop.run_in_executor(executor, call_wsgi,
+                                            application, scope)
+        else:
+            asgi = WsgiToAsgi(application, options['asgi_threads'])
+            executor = asgi.executor
+
+            def call():
+                return call_asgi(asgi, scope)
+        # Прогрев: импорты, кеш шаблонов и соединения потоков.
+        await asyncio.gather(*(call() for _ in range(options['concurrency'])))
+        latencies, errors = [], 0
+        remaining = options['requests']
+
+        async def client():
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                if await call() != 200:
+                    errors += 1
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client()
+                               for _ in range(options['concurrency'])))
+        elapsed = time.perf_counter() - started
+        executor.shutdown()
+        return {
+            'rps': round(len(latencies) / elapsed),
+            'p50_ms': round(percentile(latencies, 0.5), 1),
+            'p95_ms': round(percentile(latencies, 0.95), 1),
+            'errors': errors,
+        }
@@ -0,0 +1,162 @@
+import json
+import platform
+import time
+import tracemalloc
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Comment, Follow, Group, Post, User
+
+METRICS = ('queries', 'p50_ms', 'p95_ms', 'peak_kb')
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[max(int(round(len(values) * fraction)) - 1, 0)]
+
+
+def view_targets():
+    """Самые тяжёлые экземпляры каждой страницы."""
+    author = (User.objects.order_by('-profile__posts_count', 'pk')
+              .first())
+    reader = (User.objects.annotate(total=Count('follower'))
+              .order_by('-total', 'pk').first())
+    group = (Group.objects.annotate(total=Count('posts'))
+             .order_by('-total', 'pk').first())
+    post = Post.objects.order_by('-comments_count', '-pk').first()
+    if author is None or post is None:
+        raise CommandError('Нет данных, запустите seed_data')
+    word = post.text.split()[0]
+    targets = {
+        'index': (reverse('posts:index'), None),
+        'index_page_10': (reverse('posts:index') + '?page=10', None),
+        'profile': (reverse('posts:profile', args=[author.username]),
+                    None),
+        'post_detail': (reverse('posts:post_detail', args=[post.pk]),
+                        None),
+        'search': (reverse('posts:search') + f'?q={word}', None),
+    }
+    if group is not None:
+        targets['group_list'] = (
+            reverse('posts:group_list', args=[group.slug]), None)
+    if reader is not None:
+        targets['follow_index'] = (reverse('posts:follow_index'), reader)
+    return targets
+
+
+class Command(BaseCommand):
+    help = ('Замеряет основные страницы на текущих данных (например, после '
+            'seed_data): число запросов, задержку p50/p95 и пиковую память. '
+            'Пишет JSON-отчёт и сравнивает его с прошлым через --compare.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--cold', action='store_true',
+                            help='Очищать кеш перед каждым запросом')
+        parser.add_argument('--output', '-o', help='Куда записать отчёт')
+        parser.add_argument('--compare', metavar='REPORT',
+                            help='Отчёт прошлого запуска для сравнения')
+        parser.add_argument('views', nargs='*',
+                            help='Только эти страницы, например index')
+
+    def handle(self, *args, **options):
+        targets = view_targets()
+        if options['views']:
+            unknown = set(options['views']) - set(targets)
+            if unknown:
+                raise CommandError('Нет страниц: %s' % ', '.join(unknown))
+            targets = {name: targets[name] for name in options['views']}
+        # Как и в load_test_comments: с DEBUG замер показывал бы
+        # debug_toolbar, а не страницы.
+        with override_settings(DEBUG=False):
+            results = {
+                name: self.measure(url, user, options)
+                for name, (url, user) in targets.items()
+            }
+        report = {'meta': self.meta(options), 'views': results}
+        self.print_report(report)
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                self.print_comparison(json.load(file), report)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+
+    def measure(self, url, user, options):
+        client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+        if user is not None:
+            client.force_login(user)
+        # Первый запрос прогревает кеш и импорты и в замер не входит.
+        client.get(url)
+        latencies = []
+        queries = []
+        for _ in range(options['repeat']):
+            if options['cold']:
+                cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = client.get(url)
+                latencies.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+        if options['cold']:
+            cache.clear()
+        # tracemalloc замедляет работу, поэтому память — отдельным запросом.
+        tracemalloc.start()
+        try:
+            client.get(url)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return {
+            'url': url,
+            'status': response.status_code,
+            'queries': max(queries),
+            'p50_ms': round(percentile(latencies, 0.5), 2),
+            'p95_ms': round(percentile(latencies, 0.95), 2),
+            'peak_kb': round(peak / 1024, 1),
+        }
+
+    def meta(self, options):
+        return {
+            'created': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'cache': settings.CACHES['default']['BACKEND'],
+            'repeat': options['repeat'],
+            'cold': options['cold'],
+            'rows': {model._meta.model_name: model.objects.count()
+                     for model in (User, Group, Post, Comment, Follow)},
+        }
+
+    def print_report(self, report):
+        rows = report['meta']['rows']
+        self.stdout.write(', '.join(
+            f'{name}: {total}' for name, total in rows.items()))
+        self.stdout.write(f'{"":16}' + ''.join(f'{m:>10}' for m in METRICS))
+        for name, result in report['views'].items():
+            self.stdout.write(f'{name:16}' + ''.join(
+                f'{result[metric]:>10}' for metric in METRICS))
+
+    def print_comparison(self, old, new):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'Сравнение с отчётом от {old["meta"]["created"]}'))
+        for name, result in new['views'].items():
+            before = old['views'].get(name)
+            if before is None:
+                continue
+            changes = []
+            for metric in METRICS:
+                was, now = before[metric], result[metric]
+                delta = f'{(now - was) / was * 100:+.0f}%' if was else '—'
+                changes.append(f'{metric} {was} → {now} ({delta})')
+            self.stdout.write(f'{name}: ' + ', '.join(changes))
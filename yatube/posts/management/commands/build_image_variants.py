@@ -0,0 +1,58 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Строит миниатюры и адаптивные варианты для уже загруженных '
+            'картинок постов в пуле процессов')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int,
+                            default=os.cpu_count() or 1)
+        parser.add_argument('--all', action='store_true',
+                            help='Пересобрать и готовые варианты')
+        parser.add_argument('--chunk', type=int, default=200,
+                            help='Сколько постов отдавать пулу за раз')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').only(
+            'image', 'thumbnail', 'author_id', 'group_id').order_by('pk')
+        if not options['all']:
+            posts = posts.filter(image_variants__isnull=True)
+        started = time.monotonic()
+        done = failed = 0
+        last_pk = 0
+        while True:
+            chunk = {post.pk: post for post in posts.filter(pk__gt=last_pk)[
+                :options['chunk']]}
+            if not chunk:
+                break
+            last_pk = max(chunk)
+            # Дочерние процессы наследуют открытые соединения при fork,
+            # поэтому закрываем их заранее: база нужна только родителю.
+            connections.close_all()
+            with ProcessPoolExecutor(options['workers']) as pool:
+                futures = [
+                    pool.submit(thumbnails.render_path, post.pk,
+                                post.image.name)
+                    for post in chunk.values()
+                ]
+                for future in as_completed(futures):
+                    try:
+                        post_id, image_name, variants = future.result()
+                    except Exception as error:
+                        failed += 1
+                        self.stderr.write(f'Ошибка: {error}')
+                        continue
+                    thumbnails.store(chunk[post_id], image_name, variants)
+                    done += 1
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {done}, ошибок: {failed}, {elapsed:.1f} с'))
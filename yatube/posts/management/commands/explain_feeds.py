@@ -0,0 +1,92 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import timeline
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Печатает планы и время горячих запросов лент. '
+            'Для сравнения до/после запустите команду, откатив '
+            'миграцию posts 0003, и после "migrate".')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Создать N синтетических постов и откатить их в конце')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if options['seed']:
+                    self.seed(options['seed'])
+                self.explain_all(options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, total):
+        User.objects.bulk_create(
+            User(username=f'explain_user_{i}') for i in range(100))
+        users = list(User.objects.filter(username__startswith='explain_'))
+        Group.objects.bulk_create(
+            Group(title=f'Группа {i}', slug=f'explain-group-{i}',
+                  description='') for i in range(10))
+        groups = list(Group.objects.filter(slug__startswith='explain-'))
+        Post.objects.bulk_create(
+            (Post(text=f'Пост {i}', author=random.choice(users),
+                  group=random.choice(groups)) for i in range(total)))
+        reader = users[0]
+        Follow.objects.bulk_create(
+            Follow(user=reader, author=author) for author in users[1:20])
+        timeline.rebuild([reader.pk])
+        post = Post.objects.filter(author__in=users).first()
+        Comment.objects.bulk_create(
+            Comment(post=post, author=random.choice(users), text='...')
+            for _ in range(100))
+
+    def shapes(self):
+        post = Post.objects.order_by('-pub_date').first()
+        follow = Follow.objects.first()
+        if post is None:
+            return {}
+        reader = follow.user if follow else post.author
+        feed = Post.objects.for_feed().order_by('-pub_date', '-id')
+        shapes = {
+            'index': feed[:11],
+            'group_posts': feed.filter(group_id=post.group_id)[:11],
+            'profile': feed.filter(author_id=post.author_id)[:11],
+            'post_comments': Comment.objects.filter(
+                post=post).order_by('pub_date'),
+            'following_check': Follow.objects.filter(
+                user=reader, author_id=post.author_id),
+        }
+        # Страница ленты подписок — записи ленты и посты авторов,
+        # читаемых напрямую, если такие есть.
+        queries = timeline.feed(reader, Post.objects.for_feed()).queries(
+            [post.pub_date, post.pk])
+        for name, query in zip(('follow_index', 'follow_index_read_time'),
+                               queries):
+            shapes[name] = query
+        return shapes
+
+    def explain_all(self, repeat):
+        for name, queryset in self.shapes().items():
+            started = time.perf_counter()
+            for _ in range(repeat):
+                list(queryset)
+            elapsed = (time.perf_counter() - started) / repeat * 1000
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{name}: {elapsed:.2f} мс'))
+            self.stdout.write(queryset.explain())
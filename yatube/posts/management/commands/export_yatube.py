@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+from posts.forms import ExportForm
+
+
+class Command(BaseCommand):
+    help = ('Выгружает посты или комментарии в NDJSON или CSV, не загружая '
+            'таблицу в память')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(export.EXPORTS))
+        parser.add_argument('--format', default='ndjson',
+                            choices=sorted(export.FORMATS))
+        parser.add_argument('--group', help='Слаг группы')
+        parser.add_argument('--author', help='Имя пользователя автора')
+        parser.add_argument('--since', help='С даты, ГГГГ-ММ-ДД')
+        parser.add_argument('--until', help='По дату включительно')
+        parser.add_argument('--chunk-size', type=int,
+                            default=export.CHUNK_SIZE)
+        parser.add_argument('--output', '-o',
+                            help='Файл, по умолчанию stdout')
+
+    def handle(self, *args, **options):
+        form = ExportForm({name: options[name] for name in (
+            'format', 'group', 'author', 'since', 'until')})
+        if not form.is_valid():
+            raise CommandError(form.errors.as_text())
+        lines = export.export(
+            options['kind'], form.cleaned_data['format'],
+            chunk_size=options['chunk_size'], **form.filters())
+        if options['output']:
+            # newline='' — csv сам пишет \r\n.
+            with open(options['output'], 'w', encoding='utf-8',
+                      newline='') as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
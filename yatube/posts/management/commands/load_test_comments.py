@@ -0,0 +1,109 @@
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+User = get_user_model()
+
+# Настройки SQLite по умолчанию, для сравнения с SQLITE_PRAGMAS.
+BASELINE_PRAGMAS = {
+    'journal_mode': 'DELETE',
+    'synchronous': 'FULL',
+    'busy_timeout': 5000,
+}
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест записи: параллельные комментаторы шлют '
+            'комментарии через add_comment. Создаёт временных '
+            'пользователей и пост, в конце удаляет их.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--comments', type=int, default=50,
+                            help='Комментариев на поток')
+        parser.add_argument('--baseline', action='store_true',
+                            help='SQLite без WAL и с synchronous=FULL')
+        parser.add_argument('--keep', action='store_true',
+                            help='Не удалять созданные данные')
+
+    def handle(self, *args, **options):
+        pragmas = (BASELINE_PRAGMAS if options['baseline']
+                   else settings.SQLITE_PRAGMAS)
+        connections.close_all()
+        # С DEBUG запрос тратит больше времени на debug_toolbar и журнал
+        # SQL, чем на запись в базу.
+        with override_settings(SQLITE_PRAGMAS=pragmas, DEBUG=False):
+            users, post = self.prepare(options['threads'])
+            try:
+                report = self.run(users, post, options['comments'])
+            finally:
+                if not options['keep']:
+                    User.objects.filter(pk__in=[u.pk for u in users]).delete()
+                connections.close_all()
+        self.stdout.write(
+            'Потоков: {threads}, комментариев: {written}, ошибок: '
+            '{errors}\nВремя: {elapsed:.2f} с, {rate:.1f} комментариев/с\n'
+            'Задержка p50: {p50:.1f} мс, p95: {p95:.1f} мс'.format(**report))
+
+    def prepare(self, threads):
+        stamp = int(time.time())
+        users = [User.objects.create_user(username=f'load_{stamp}_{i}')
+                 for i in range(threads + 1)]
+        post = Post.objects.create(text='Нагрузочный тест',
+                                   author=users[0])
+        return users, post
+
+    def run(self, users, post, per_thread):
+        url = reverse('posts:add_comment', kwargs={'post_id': post.pk})
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+
+        def commenter(user):
+            # Test Client ходит в приложение без сети, тем же путём,
+            # что и настоящий запрос: middleware, сигналы, транзакции.
+            client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+            client.force_login(user)
+            try:
+                for i in range(per_thread):
+                    started = time.perf_counter()
+                    try:
+                        response = client.post(
+                            url, {'text': f'Комментарий {i}'})
+                        failed = response.status_code != 302
+                    except Exception:
+                        failed = True
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        (errors if failed else latencies).append(elapsed)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=commenter, args=(user,))
+                   for user in users[1:]]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        return {
+            'threads': len(threads),
+            'written': len(latencies),
+            'errors': len(errors),
+            'elapsed': elapsed,
+            'rate': len(latencies) / elapsed,
+            'p50': statistics.median(latencies) * 1000 if latencies else 0,
+            'p95': (latencies[int(len(latencies) * 0.95) - 1] * 1000
+                    if latencies else 0),
+        }
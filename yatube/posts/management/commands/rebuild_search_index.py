@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = ('Заново заполняет полнотекстовый индекс постов, например '
+            'после массовой загрузки в обход сигналов')
+
+    def handle(self, *args, **options):
+        backend = search.get_backend()
+        indexed = backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'{backend.name}: проиндексировано постов: {indexed}'))
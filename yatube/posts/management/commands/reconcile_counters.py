@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = ('Исправляет расхождения денормализованных счётчиков постов, '
+            'комментариев и подписок')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только посчитать расхождения')
+
+    def handle(self, *args, **options):
+        report = counters.reconcile(dry_run=options['dry_run'])
+        for counter, rows in report.items():
+            self.stdout.write(f'{counter}: {rows}')
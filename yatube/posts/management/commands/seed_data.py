@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import importer
+from posts.seeding import PASSWORD, Seeder
+
+
+class Command(BaseCommand):
+    help = ('Генерирует пользователей, группы, посты, комментарии и '
+            'подписки со степенным распределением активности авторов, '
+            f'например --posts 1000000. Пароль пользователей: {PASSWORD}')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=30000)
+        parser.add_argument('--follows', type=float, default=20,
+                            help='Среднее число подписок пользователя')
+        parser.add_argument('--alpha', type=float, default=1.1,
+                            help='Показатель степенного распределения')
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней разбросать публикации')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='seed',
+                            help='Префикс имён пользователей и слагов')
+        parser.add_argument('--locale', default='ru_RU')
+
+    def handle(self, *args, **options):
+        seeder = Seeder(seed=options['seed'], locale=options['locale'],
+                        alpha=options['alpha'], days=options['days'],
+                        prefix=options['prefix'])
+        user_ids = self.step('users', seeder.users, options['users'])
+        group_ids = self.step('groups', seeder.groups, options['groups'])
+        self.step('posts', seeder.posts, options['posts'], user_ids,
+                  group_ids)
+        self.step('comments', seeder.comments, options['comments'],
+                  user_ids)
+        self.step('follows', seeder.follows, options['follows'], user_ids)
+        started = time.monotonic()
+        report = importer.finish(importer.Importer(), list(importer.MODELS),
+                                 images=False)
+        for name, rows in report.items():
+            self.stdout.write(f'{name}: {rows}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересборка: {time.monotonic() - started:.1f} с'))
+
+    def step(self, name, method, *args):
+        started = time.monotonic()
+        result = method(*args)
+        total = len(result) if isinstance(result, list) else result
+        self.stdout.write(
+            f'{name}: {total}, {time.monotonic() - started:.1f} с')
+        return result
@@ -0,0 +1,26 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0003_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Комментариев'),
+        ),
+        migrations.RunSQL(
+            sql=(
+                'UPDATE posts_post SET comments_count = ('
+                'SELECT COUNT(*) FROM posts_comment '
+                'WHERE posts_comment.post_id = posts_post.id)'
+            ),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
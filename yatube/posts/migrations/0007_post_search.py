@@ -0,0 +1,55 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+import posts.models
+
+FTS_TABLE = 'posts_post_fts'
+PG_INDEX = 'posts_post_text_search_idx'
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE %s USING fts5("
+            "text, tokenize='unicode61 remove_diacritics 2')" % FTS_TABLE)
+        schema_editor.execute(
+            'INSERT INTO %s (rowid, text) SELECT id, text FROM posts_post'
+            % FTS_TABLE)
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE INDEX %s ON posts_post USING GIN "
+            "(to_tsvector('russian'::regconfig, COALESCE(text, '')))"
+            % PG_INDEX)
+
+
+def drop_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS %s' % FTS_TABLE)
+    elif vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS %s' % PG_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_postimagevariant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSearchEntry',
+            fields=[
+                ('post', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='posts.Post')),
+                ('text', posts.models.SearchTextField()),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'posts_post_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -1,6 +1,9 @@
+from django.conf import settings
 from django.db import models
+from django.templatetags.static import static
+from django.db.models import F, Q
 from django.contrib.auth import get_user_model
-from core.models import CreatedModel
+from core.models import TimestampedModel
 
 User = get_user_model()
 MIN_TEXT_MODEL: int = 20
@@ -17,7 +20,22 @@ class Group(models.Model):
         return self.title
 
 
-class Post(CreatedModel):
+class PostQuerySet(models.QuerySet):
+    FEED_FIELDS = (
+        'text', 'pub_date', 'image', 'comments_count',
+        'thumbnail', 'thumbnail_width', 'thumbnail_height',
+        'author__username', 'author__first_name', 'author__last_name',
+        'group__title', 'group__slug',
+    )
+
+    def for_feed(self):
+        """Посты для лент: автор и группа одним JOIN, только нужные поля."""
+        return (self.select_related('author', 'group')
+                .only(*self.FEED_FIELDS)
+                .prefetch_related('image_variants'))
+
+
+class Post(TimestampedModel):
     text = models.TextField(verbose_name='Текст поста',
                             help_text='Введите текст поста')
     author = models.ForeignKey(
@@ -39,15 +57,125 @@ class Post(CreatedModel):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Комментариев', default=0, editable=False)
+    thumbnail = models.ImageField(
+        'Миниатюра',
+        upload_to='posts/variants/',
+        blank=True,
+        editable=False,
+    )
+    thumbnail_width = models.PositiveIntegerField(null=True, editable=False)
+    thumbnail_height = models.PositiveIntegerField(null=True, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return self.text[:MIN_TEXT_MODEL]
 
+    @property
+    def thumbnail_url(self):
+        """Готовая миниатюра или заглушка, пока воркер её не сделал."""
+        if self.thumbnail:
+            return self.thumbnail.url
+        return static(settings.POST_THUMBNAIL_PLACEHOLDER)
+
+    def srcset(self, image_format):
+        return ', '.join(
+            '%s %sw' % (variant.file.url, variant.width)
+            for variant in self.image_variants.all()
+            if variant.format == image_format)
+
+    @property
+    def jpeg_srcset(self):
+        return self.srcset(PostImageVariant.JPEG)
+
+    @property
+    def webp_srcset(self):
+        return self.srcset(PostImageVariant.WEBP)
+
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_id_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+            # Для Last-Modified профиля и группы.
+            models.Index(fields=['author', 'updated_at'],
+                         name='post_author_updated_idx'),
+            models.Index(fields=['group', 'updated_at'],
+                         name='post_group_updated_idx'),
+        ]
+
+
+class PostImageVariant(models.Model):
+    """Производная картинки поста заданной ширины и формата."""
+    JPEG = 'jpeg'
+    WEBP = 'webp'
+    FORMATS = (
+        (JPEG, 'JPEG'),
+        (WEBP, 'WebP'),
+    )
+
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='image_variants',
+        verbose_name='Пост',
+    )
+    width = models.PositiveIntegerField('Ширина')
+    height = models.PositiveIntegerField('Высота')
+    format = models.CharField('Формат', max_length=4, choices=FORMATS)
+    file = models.ImageField('Файл', upload_to='posts/variants/')
+
+    class Meta:
+        ordering = ['width']
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'format', 'width'],
+                                    name='unique_post_image_variant'),
+        ]
+
+
+class SearchTextField(models.TextField):
+    """Колонка полнотекстового индекса с lookup ``match``."""
+
 
+@SearchTextField.register_lookup
+class Match(models.Lookup):
+    lookup_name = 'match'
 
-class Comment(CreatedModel):
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return '%s MATCH %s' % (lhs, rhs), lhs_params + rhs_params
+
+
+class PostSearchEntry(models.Model):
+    """Строка виртуальной таблицы FTS5, rowid совпадает с id поста.
+
+    Таблицу создаёт миграция только на SQLite и заполняют сигналы,
+    см. ``posts.search``.
+    """
+    post = models.OneToOneField(
+        Post,
+        primary_key=True,
+        db_column='rowid',
+        on_delete=models.DO_NOTHING,
+        related_name='search_entry',
+    )
+    text = SearchTextField()
+    # Скрытая колонка FTS5 со значением bm25: чем меньше, тем лучше.
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'posts_post_fts'
+
+
+class Comment(TimestampedModel):
     post = models.ForeignKey(Post,
                              on_delete=models.CASCADE,
                              related_name='comments',
@@ -62,6 +190,12 @@ class Comment(CreatedModel):
     text = models.TextField(verbose_name='Текст комментария',
                             help_text='Введите текст комментария')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'pub_date'],
+                         name='comment_post_pub_date_idx'),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -74,3 +208,36 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name='following',
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    name='unique_follow'),
+            models.CheckConstraint(check=~Q(user=F('author')),
+                                   name='no_self_follow'),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Пост в материализованной ленте подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_pub_post_idx'),
+        ]
@@ -0,0 +1,137 @@
+"""Полнотекстовый поиск по постам.
+
+Бэкенд выбирается по СУБД: на SQLite посты лежат в виртуальной таблице
+FTS5 ``posts_post_fts``, которую обновляет фоновая задача ``sync``, на
+PostgreSQL ищет GIN-индекс по ``to_tsvector``, его база поддерживает
+сама. На прочих СУБД остаётся ``icontains`` по каждому слову запроса.
+
+Все бэкенды аннотируют посты полем ``search_rank`` (больше — лучше), по
+нему и ``id`` работает курсорная пагинация. Слова запроса ищутся по
+префиксу, чтобы находились и другие формы слова.
+"""
+import re
+
+from django.db import connection
+from django.db.models import F, FloatField, Q, Value
+
+from core.tasks import task
+
+from .models import Post
+
+ORDERING = ('-search_rank', '-id')
+MAX_WORDS: int = 10
+WORD_RE = re.compile(r'\w+')
+
+
+def words(query):
+    return WORD_RE.findall(query)[:MAX_WORDS]
+
+
+class SimpleBackend:
+    """``LIKE '%слово%'``: полный просмотр таблицы, без ранжирования."""
+    name = 'simple'
+
+    def filter(self, queryset, query):
+        condition = Q()
+        for word in words(query):
+            condition &= Q(text__icontains=word)
+        return queryset.filter(condition).annotate(
+            search_rank=Value(0.0, output_field=FloatField()))
+
+    def index(self, post):
+        pass
+
+    def remove(self, post_id):
+        pass
+
+    def rebuild(self):
+        return Post.objects.count()
+
+
+class SQLiteBackend(SimpleBackend):
+    name = 'fts5'
+    table = 'posts_post_fts'
+
+    def filter(self, queryset, query):
+        match = ' '.join('"%s"*' % word for word in words(query))
+        # bm25 у FTS5 отрицательный: лучшие совпадения меньше.
+        return queryset.filter(search_entry__text__match=match).annotate(
+            search_rank=F('search_entry__rank') * -1)
+
+    def index(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'DELETE FROM %s WHERE rowid = %%s' % self.table, [post.pk])
+            cursor.execute(
+                'INSERT INTO %s (rowid, text) VALUES (%%s, %%s)' % self.table,
+                [post.pk, post.text])
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'DELETE FROM %s WHERE rowid = %%s' % self.table, [post_id])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM %s' % self.table)
+            cursor.execute(
+                'INSERT INTO %s (rowid, text) SELECT id, text FROM posts_post'
+                % self.table)
+            count = cursor.rowcount
+            cursor.execute(
+                "INSERT INTO %s (%s) VALUES ('optimize')"
+                % (self.table, self.table))
+        return count
+
+
+class PostgreSQLBackend(SimpleBackend):
+    name = 'postgresql'
+    # Выражение должно совпадать с индексом из миграции 0007.
+    config = 'russian'
+
+    def filter(self, queryset, query):
+        from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                                    SearchVector)
+
+        vector = SearchVector('text', config=self.config)
+        search_query = SearchQuery(
+            ' & '.join("'%s':*" % word for word in words(query)),
+            config=self.config, search_type='raw')
+        return queryset.annotate(search_vector=vector).filter(
+            search_vector=search_query).annotate(
+            search_rank=SearchRank(vector, search_query))
+
+
+BACKENDS = {
+    'sqlite': SQLiteBackend,
+    'postgresql': PostgreSQLBackend,
+}
+
+
+def get_backend():
+    return BACKENDS.get(connection.vendor, SimpleBackend)()
+
+
+@task
+def sync(post_id):
+    """Приводит индекс к текущему тексту поста или удаляет из него
+    удалённый пост."""
+    post = Post.objects.filter(pk=post_id).only('text').first()
+    if post is None:
+        get_backend().remove(post_id)
+    else:
+        get_backend().index(post)
+
+
+def search(query, queryset=None, group=None, author=None, backend=None):
+    """Посты по запросу с ``search_rank``; пустой запрос ничего не находит.
+    """
+    if queryset is None:
+        queryset = Post.objects.all()
+    if not words(query):
+        return queryset.none()
+    if group is not None:
+        queryset = queryset.filter(group=group)
+    if author is not None:
+        queryset = queryset.filter(author=author)
+    return (backend or get_backend()).filter(queryset, query)
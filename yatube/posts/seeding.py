@@ -0,0 +1,163 @@
+"""Синтетические данные для нагрузочных замеров.
+
+Активность в сообществах распределена по степенному закону: немногие
+авторы пишут большую часть постов и собирают большую часть подписчиков.
+Поэтому авторы постов, комментаторы и цели подписок выбираются с весами
+``1 / rank ** alpha``. Тексты собираются из заранее сгенерированного
+Faker набора предложений: вызывать Faker на каждый из миллиона постов
+слишком долго.
+
+Объекты вставляются ``bulk_create`` пачками, сигналы не срабатывают, и
+в конце всё производное пересобирается ``importer.finish``.
+"""
+import random
+from array import array
+from datetime import datetime, timedelta
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+
+from . import importer
+from .models import Comment, Follow, Group, Post, User
+
+BATCH_SIZE: int = 5000
+SENTENCES: int = 2000
+# Пароль всех сгенерированных пользователей, чтобы под ними можно было
+# войти при ручной проверке.
+PASSWORD = 'yatube-seed'
+
+
+def power_law_weights(count, alpha):
+    """Накопленные веса для ``random.choices(cum_weights=...)``: иначе
+    choices пересчитывает их при каждом вызове."""
+    return list(accumulate(1 / (rank + 1) ** alpha for rank in range(count)))
+
+
+def _insert(model, objects, batch_size=BATCH_SIZE):
+    objects = iter(objects)
+    total = 0
+    with importer.keep_timestamps(model):
+        while True:
+            batch = list(islice(objects, batch_size))
+            if not batch:
+                return total
+            with transaction.atomic():
+                model.objects.bulk_create(batch, ignore_conflicts=True)
+            total += len(batch)
+
+
+class Seeder:
+    def __init__(self, seed=0, locale='ru_RU', alpha=1.1, days=365,
+                 prefix='seed'):
+        self.rng = random.Random(seed)
+        self.fake = Faker(locale)
+        self.fake.seed_instance(seed)
+        self.alpha = alpha
+        self.days = days
+        self.prefix = prefix
+        self.now = timezone.now()
+        self.sentences = [self.fake.sentence(nb_words=10)
+                          for _ in range(SENTENCES)]
+
+    def text(self, low, high):
+        return ' '.join(self.rng.choices(self.sentences,
+                                         k=self.rng.randint(low, high)))
+
+    def moment(self, after=None):
+        start = after or self.now - timedelta(days=self.days)
+        span = (self.now - start).total_seconds()
+        return start + timedelta(seconds=self.rng.random() * span)
+
+    def users(self, count):
+        password = make_password(PASSWORD)
+        _insert(User, (
+            User(username=f'{self.prefix}_{i}_{self.fake.user_name()}'[:150],
+                 first_name=self.fake.first_name(),
+                 last_name=self.fake.last_name(),
+                 email=self.fake.email(), password=password,
+                 date_joined=self.moment())
+            for i in range(count)))
+        # Порядок выборки задаёт ранг: первые самые активные.
+        return list(User.objects.filter(
+            username__startswith=f'{self.prefix}_').order_by('pk')
+            .values_list('pk', flat=True))
+
+    def groups(self, count):
+        _insert(Group, (
+            Group(title=self.fake.catch_phrase()[:200],
+                  slug=f'{self.prefix}-{i}',
+                  description=self.text(1, 3))
+            for i in range(count)))
+        return list(Group.objects.filter(
+            slug__startswith=f'{self.prefix}-').values_list('pk', flat=True))
+
+    def posts(self, count, user_ids, group_ids):
+        weights = power_law_weights(len(user_ids), self.alpha)
+        # Часть постов публикуется вне групп.
+        group_choices = group_ids + [None] * max(len(group_ids) // 3, 1)
+
+        def build():
+            authors = iter(())
+            for _ in range(count):
+                author_id = next(authors, None)
+                if author_id is None:
+                    authors = iter(self.rng.choices(
+                        user_ids, cum_weights=weights, k=BATCH_SIZE))
+                    author_id = next(authors)
+                pub_date = self.moment()
+                yield Post(author_id=author_id, text=self.text(1, 6),
+                           group_id=self.rng.choice(group_choices),
+                           pub_date=pub_date, updated_at=pub_date)
+
+        return _insert(Post, build())
+
+    def comments(self, count, user_ids):
+        # Массивы вместо списка кортежей: на миллионе постов это десятки
+        # мегабайт, а не сотни.
+        post_ids, published = array('q'), array('d')
+        for post_id, pub_date in (
+                Post.objects.filter(author__username__startswith=(
+                    f'{self.prefix}_')).values_list('pk', 'pub_date')
+                .iterator()):
+            post_ids.append(post_id)
+            published.append(pub_date.timestamp())
+        if not post_ids:
+            return 0
+        weights = power_law_weights(len(user_ids), self.alpha)
+
+        def build():
+            for _ in range(count):
+                index = self.rng.randrange(len(post_ids))
+                pub_date = self.moment(datetime.fromtimestamp(
+                    published[index], timezone.utc))
+                yield Comment(post_id=post_ids[index], text=self.text(1, 2),
+                              author_id=self.rng.choices(
+                                  user_ids, cum_weights=weights)[0],
+                              pub_date=pub_date, updated_at=pub_date)
+
+        return _insert(Comment, build())
+
+    def follows(self, per_user, user_ids):
+        """В среднем ``per_user`` подписок; популярных авторов
+        выбирают чаще."""
+        # Популярность у читателей — свой ранг, не связанный с числом
+        # постов. Иначе у самых плодовитых авторов оказываются и все
+        # подписчики, и материализованные ленты растут квадратично.
+        authors_by_rank = list(user_ids)
+        self.rng.shuffle(authors_by_rank)
+        weights = power_law_weights(len(user_ids), self.alpha)
+
+        def build():
+            for user_id in user_ids:
+                count = min(int(self.rng.expovariate(1 / per_user)),
+                            len(user_ids) - 1) if per_user else 0
+                authors = set(self.rng.choices(
+                    authors_by_rank, cum_weights=weights, k=count))
+                authors.discard(user_id)
+                for author_id in authors:
+                    yield Follow(user_id=user_id, author_id=author_id)
+
+        return _insert(Follow, build())
@@ -0,0 +1,109 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import counters, events, feed_cache, search, thumbnails, timeline
+from .models import Comment, Follow, Post, User
+
+
+@receiver(post_init, sender=Post)
+def post_loaded(sender, instance, **kwargs):
+    # group_id может быть отложен через only(), поэтому без обращения к
+    # атрибуту, которое вызвало бы лишний запрос.
+    instance._loaded_group_id = instance.__dict__.get('group_id')
+    instance._loaded_image = str(instance.__dict__.get('image') or '')
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, update_fields=None,
+               **kwargs):
+    if raw:
+        return
+    if not update_fields or 'text' in update_fields:
+        search.sync.enqueue(instance.pk, key='search:%s' % instance.pk)
+    if created:
+        counters.change_profile(instance.author_id, posts_count=1)
+        timeline.publish.enqueue(instance.pk)
+        events.post_published(instance)
+    if str(instance.image or '') != instance._loaded_image:
+        if instance.thumbnail:
+            thumbnails.clear(instance)
+        if instance.image:
+            thumbnails.schedule(instance.pk)
+    feed_cache.bump(feed_cache.post_scopes(
+        instance, [instance._loaded_group_id]))
+    instance._loaded_group_id = instance.group_id
+    instance._loaded_image = str(instance.image or '')
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    search.sync.enqueue(instance.pk, key='search:%s' % instance.pk)
+    counters.change_profile(instance.author_id, posts_count=-1)
+    feed_cache.bump(feed_cache.post_scopes(instance))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.change_comments(instance.post_id, 1)
+        events.comment_added(instance)
+    _bump_comment_scopes(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_comments(instance.post_id, -1)
+    _bump_comment_scopes(instance)
+
+
+def _bump_comment_scopes(instance):
+    scopes = {feed_cache.comments_scope(instance.post_id)}
+    post = instance._state.fields_cache.get('post') or (
+        Post.objects.filter(pk=instance.post_id)
+        .only('author_id', 'group_id').first())
+    if post is not None:
+        scopes |= feed_cache.post_scopes(post)
+    feed_cache.bump(scopes)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_profile(instance.user_id, following_count=1)
+        counters.change_profile(instance.author_id, followers_count=1)
+        _sync_follow(instance)
+        feed_cache.bump([feed_cache.follower_scope(instance.user_id)])
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_profile(instance.user_id, following_count=-1)
+    counters.change_profile(instance.author_id, followers_count=-1)
+    _sync_follow(instance)
+    feed_cache.bump([feed_cache.follower_scope(instance.user_id)])
+
+
+def _sync_follow(instance):
+    timeline.sync_follow.enqueue(
+        instance.user_id, instance.author_id,
+        key='timeline:%s:%s' % (instance.user_id, instance.author_id))
+
+
+@receiver(post_save, sender=User)
+def author_saved(sender, instance, created, raw=False, update_fields=None,
+                 **kwargs):
+    # В лентах выводится имя автора, но вход в систему обновляет только
+    # last_login, и сбрасывать ради него кеш незачем.
+    if created or raw or update_fields == frozenset(['last_login']):
+        return
+    group_ids = (Post.objects.filter(author=instance)
+                 .exclude(group=None).values_list('group_id', flat=True)
+                 .distinct())
+    # Имя выводится и в комментариях под чужими постами.
+    commented = (Comment.objects.filter(author=instance)
+                 .values_list('post_id', flat=True).distinct())
+    feed_cache.bump([feed_cache.ALL, feed_cache.author_scope(instance.pk)]
+                    + [feed_cache.group_scope(pk) for pk in group_ids]
+                    + [feed_cache.comments_scope(pk) for pk in commented])
@@ -0,0 +1,80 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from users.models import Profile
+from ..models import Comment, Follow, Post
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def profile(self, user):
+        return Profile.objects.get(user=user)
+
+    def test_profile_is_created_with_user(self):
+        self.assertEqual(self.profile(self.author).posts_count, 0)
+
+    def test_posts_count(self):
+        post = Post.objects.create(text='Пост', author=self.author)
+        Post.objects.create(text='Ещё пост', author=self.author)
+        self.assertEqual(self.profile(self.author).posts_count, 2)
+        post.delete()
+        self.assertEqual(self.profile(self.author).posts_count, 1)
+
+    def test_comments_count(self):
+        post = Post.objects.create(text='Пост', author=self.author)
+        self.client.force_login(self.reader)
+        self.client.post(reverse('posts:add_comment',
+                                 kwargs={'post_id': post.pk}),
+                         {'text': 'Комментарий'})
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        Comment.objects.get(post=post).delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_follow_counts(self):
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.profile(self.author).followers_count, 1)
+        self.assertEqual(self.profile(self.reader).following_count, 1)
+        follow.delete()
+        self.assertEqual(self.profile(self.author).followers_count, 0)
+        self.assertEqual(self.profile(self.reader).following_count, 0)
+
+    def test_pages_show_counters(self):
+        post = Post.objects.create(text='Пост', author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.client.get(reverse('posts:post_detail',
+                                           kwargs={'post_id': post.pk}))
+        self.assertContains(response, '<span>1</span>', html=False)
+        response = self.client.get(reverse('posts:profile',
+                                           kwargs={'username': 'author'}))
+        self.assertContains(response, 'Подписчиков: 1')
+
+    def test_reconcile_repairs_drift(self):
+        post = Post.objects.create(text='Пост', author=self.author)
+        Comment.objects.create(post=post, author=self.reader, text='...')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Profile.objects.filter(user=self.author).update(
+            posts_count=10, followers_count=0)
+        Post.objects.filter(pk=post.pk).update(comments_count=7)
+        Profile.objects.filter(user=self.reader).delete()
+        output = StringIO()
+        call_command('reconcile_counters', stdout=output)
+        self.assertIn('profile.posts_count: 1', output.getvalue())
+        author = self.profile(self.author)
+        self.assertEqual((author.posts_count, author.followers_count),
+                         (1, 1))
+        self.assertEqual(self.profile(self.reader).following_count, 1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
@@ -0,0 +1,103 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core.asgi import ASYNC_STREAMS
+from core.pubsub import get_broker
+
+from .. import events
+from ..models import Comment, Follow, Post
+
+User = get_user_model()
+
+
+@override_settings(SSE_POLL_INTERVAL=0.01, SSE_MAX_AGE=0.1)
+class EventViewsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = Post.objects.create(text='Новый пост', author=cls.author)
+        cls.comment = Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Свежий комментарий')
+
+    def setUp(self):
+        cache.clear()
+
+    def read(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def stream(self, url):
+        """Запрос, как его передаёт core.asgi."""
+        return self.client.get(url, **{ASYNC_STREAMS: True})
+
+    def test_comment_events(self):
+        response = self.stream(reverse(
+            'posts:comment_events', kwargs={'post_id': self.post.pk}))
+        get_broker().publish(events.comments_channel(self.post.pk),
+                             'comment', {'id': self.comment.pk})
+        get_broker().publish(events.comments_channel(0), 'comment', {})
+        body = self.read(response)
+        self.assertEqual(body.count('event: comment'), 1)
+        self.assertIn('"id": %d' % self.comment.pk, body)
+
+    def test_follow_events_need_login(self):
+        url = reverse('posts:follow_events')
+        self.assertEqual(self.stream(url).status_code, 302)
+        self.client.force_login(self.reader)
+        response = self.stream(url)
+        get_broker().publish(events.author_channel(self.author.pk), 'post',
+                             {'id': self.post.pk})
+        self.assertIn('event: post', self.read(response))
+
+    def test_no_streams_under_wsgi(self):
+        self.client.force_login(self.reader)
+        post_url = reverse('posts:post_detail',
+                           kwargs={'post_id': self.post.pk})
+        pages = {
+            post_url: reverse('posts:comment_events',
+                              kwargs={'post_id': self.post.pk}),
+            reverse('posts:follow_index'): reverse('posts:follow_events'),
+        }
+        for page, events_url in pages.items():
+            with self.subTest(page=page):
+                # EventSource на 204 больше не переподключается.
+                self.assertEqual(self.client.get(events_url).status_code, 204)
+                self.assertNotContains(self.client.get(page), 'EventSource')
+                self.assertContains(self.stream(page), events_url)
+
+    def test_fragments(self):
+        response = self.client.get(reverse(
+            'posts:comment',
+            kwargs={'post_id': self.post.pk, 'comment_id': self.comment.pk}))
+        self.assertContains(response, 'id="comment-%d"' % self.comment.pk)
+        self.assertNotContains(response, '<html')
+        response = self.client.get(reverse(
+            'posts:post_card', kwargs={'post_id': self.post.pk}))
+        self.assertContains(response, 'Новый пост')
+        response = self.client.get(reverse(
+            'posts:comment',
+            kwargs={'post_id': self.post.pk + 1,
+                    'comment_id': self.comment.pk}))
+        self.assertEqual(response.status_code, 404)
+
+
+class PublishTest(TransactionTestCase):
+    def test_post_and_comment_are_published_after_commit(self):
+        author = User.objects.create_user(username='author')
+        broker = get_broker()
+        start = broker.last_id()
+        post = Post.objects.create(text='Пост', author=author)
+        comment = Comment.objects.create(post=post, author=author,
+                                         text='Комментарий')
+        published, _ = broker.read(start, {
+            events.author_channel(author.pk),
+            events.comments_channel(post.pk)})
+        self.assertEqual([(event, data['url'])
+                          for _, event, data in published], [
+            ('post', reverse('posts:post_card', args=[post.pk])),
+            ('comment', reverse('posts:comment',
+                                args=[post.pk, comment.pk])),
+        ])
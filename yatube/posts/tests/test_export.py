@@ -0,0 +1,121 @@
+import csv
+import datetime
+import io
+import json
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import export
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.post = Post.objects.create(text='Пост, "в кавычках"',
+                                       author=cls.author, group=cls.group)
+        cls.other_post = Post.objects.create(text='Другой', author=cls.other)
+        Comment.objects.create(post=cls.post, author=cls.other,
+                               text='Комментарий')
+
+    def test_ndjson(self):
+        lines = list(export.export('posts'))
+        self.assertEqual(len(lines), 2)
+        row = json.loads(lines[0])
+        self.assertEqual(row['id'], self.post.pk)
+        self.assertEqual(row['author_username'], 'author')
+        self.assertEqual(row['group_slug'], 'group')
+        self.assertEqual(row['text'], 'Пост, "в кавычках"')
+        self.assertEqual(row['pub_date'], self.post.pub_date.isoformat())
+
+    def test_csv(self):
+        rows = list(csv.DictReader(io.StringIO(
+            ''.join(export.export('comments', 'csv')))))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['post_id'], str(self.post.pk))
+        self.assertEqual(rows[0]['author_username'], 'other')
+
+    def test_filters(self):
+        lines = list(export.export('posts', author=self.other))
+        self.assertEqual(json.loads(lines[0])['id'], self.other_post.pk)
+        self.assertEqual(len(list(export.export('comments',
+                                                group=self.group))), 1)
+        today = self.post.pub_date.date()
+        self.assertEqual(len(list(export.export('posts', since=today))), 2)
+        self.assertEqual(
+            list(export.export('posts', until=today.replace(year=2000))), [])
+
+    def test_date_range_includes_whole_days(self):
+        day = datetime.date(2020, 3, 1)
+        moments = {
+            self.post.pk: datetime.datetime(2020, 3, 1, 0, 0),
+            self.other_post.pk: datetime.datetime(2020, 3, 1, 23, 59, 59),
+        }
+        for pk, moment in moments.items():
+            Post.objects.filter(pk=pk).update(
+                pub_date=timezone.make_aware(moment))
+        self.assertEqual(
+            len(list(export.rows('posts', since=day, until=day))), 2)
+        self.assertEqual(
+            list(export.rows('posts', until=day - datetime.timedelta(1))),
+            [])
+        self.assertEqual(
+            list(export.rows('posts', since=day + datetime.timedelta(1))),
+            [])
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('export_yatube', 'posts', '--format', 'csv',
+                     '--group', 'group', stdout=out)
+        rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+        self.assertEqual([row['id'] for row in rows], [str(self.post.pk)])
+
+    def test_view_is_staff_only(self):
+        url = reverse('posts:export', args=['posts'])
+        self.client.force_login(self.author)
+        self.assertEqual(self.client.get(url).status_code, 302)
+        User.objects.filter(pk=self.author.pk).update(is_staff=True)
+        response = self.client.get(url, {'format': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(len(content.splitlines()), 3)
+        self.assertEqual(self.client.get(
+            url, {'since': 'вчера'}).status_code, 400)
+        self.assertEqual(self.client.get(
+            reverse('posts:export', args=['users'])).status_code, 404)
+
+
+class ExportMemoryTest(TestCase):
+    POSTS = 4000
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='author')
+        Post.objects.bulk_create(
+            Post(text='x' * 1000, author=author) for _ in range(cls.POSTS))
+
+    def test_memory_does_not_grow_with_table(self):
+        size = 0
+        tracemalloc.start()
+        try:
+            for line in export.export('posts', chunk_size=100):
+                size += len(line)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertGreater(size, 4 * 1024 * 1024)
+        # Выгрузка больше 4 МБ, а в памяти одновременно одна пачка строк.
+        self.assertLess(peak, 1024 * 1024)
@@ -1,12 +1,17 @@
 import shutil
 import tempfile
+import tracemalloc
+from io import BytesIO
+from unittest import mock
 
 from django.test import TestCase, Client, override_settings
 from http import HTTPStatus
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
-from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadedfile import (SimpleUploadedFile,
+                                            TemporaryUploadedFile)
+from PIL import Image, ImageFile
 
 from ..models import Post, Group, Comment
 from ..forms import PostForm
@@ -138,3 +143,104 @@ class CommentFormTest(TestCase):
         self.assertEqual(response.status_code, HTTPStatus.OK)
         self.assertEqual(Comment.objects.count(),
                          posts_count)
+
+
+def image_with_exif(size, orientation, image_format='JPEG'):
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    exif[0x0110] = 'Camera'
+    buffer = BytesIO()
+    Image.new('RGB', size, 'blue').save(buffer, image_format,
+                                        exif=exif.tobytes())
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PostImageUploadTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='uploader')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def make_form(self, upload):
+        form = PostForm(data={'text': 'С картинкой'}, files={'image': upload})
+        form.instance.author = self.user
+        return form
+
+    @override_settings(POST_IMAGE_MAX_SIDE=500)
+    def test_downscales_and_strips_exif(self):
+        upload = SimpleUploadedFile(
+            'photo.jpeg', image_with_exif((1500, 1000), orientation=6),
+            content_type='image/jpeg')
+        form = self.make_form(upload)
+        self.assertTrue(form.is_valid(), form.errors)
+        post = form.save()
+        with Image.open(post.image.path) as image:
+            # Поворот из EXIF применён к пикселям, сам EXIF удалён.
+            self.assertEqual(image.size, (333, 500))
+            self.assertNotIn('exif', image.info)
+        self.assertTrue(post.image.name.endswith('.jpg'))
+
+    def test_strips_exif_from_png(self):
+        upload = SimpleUploadedFile(
+            'photo.png', image_with_exif((200, 100), orientation=1,
+                                         image_format='PNG'),
+            content_type='image/png')
+        form = self.make_form(upload)
+        self.assertTrue(form.is_valid(), form.errors)
+        post = form.save()
+        with Image.open(post.image.path) as image:
+            self.assertNotIn('exif', image.info)
+            self.assertNotIn(0x0110, image.getexif())
+        self.assertTrue(post.image.name.endswith('.png'))
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100 * 100)
+    def test_rejects_by_header_without_decoding(self):
+        upload = SimpleUploadedFile(
+            'photo.jpeg', image_with_exif((200, 100), orientation=1),
+            content_type='image/jpeg')
+        with mock.patch.object(ImageFile.ImageFile, 'load') as load:
+            form = self.make_form(upload)
+            self.assertFalse(form.is_valid())
+        load.assert_not_called()
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'too_many_pixels')
+
+    @override_settings(POST_IMAGE_MAX_UPLOAD_SIZE=100)
+    def test_rejects_large_file(self):
+        upload = SimpleUploadedFile(
+            'photo.jpeg', image_with_exif((200, 100), orientation=1),
+            content_type='image/jpeg')
+        form = self.make_form(upload)
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'file_too_large')
+
+    @override_settings(POST_IMAGE_MAX_SIDE=1000)
+    def test_large_upload_peak_memory(self):
+        size = (3000, 2000)
+        noise = Image.merge('RGB', [Image.effect_noise(size, 64)
+                                    for _ in range(3)])
+        upload = TemporaryUploadedFile('big.jpg', 'image/jpeg', 0, None)
+        noise.save(upload, 'JPEG', quality=95)
+        upload.size = upload.tell()
+        upload.seek(0)
+        form = self.make_form(upload)
+        tracemalloc.start()
+        try:
+            self.assertTrue(form.is_valid(), form.errors)
+            post = form.save()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+            upload.close()
+        # Файл ни разу не читается в память целиком.
+        self.assertGreater(upload.size, 4 * 1024 * 1024)
+        self.assertLess(peak, upload.size // 2)
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (1000, 667))
@@ -0,0 +1,177 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts import importer, search
+from posts.models import Comment, Follow, Group, Post, TimelineEntry
+
+User = get_user_model()
+
+POSTS = [
+    {'id': 101, 'pub_date': '2020-01-02T03:04:05+00:00',
+     'updated_at': '2020-01-03T00:00:00+00:00', 'author_username': 'author',
+     'group_slug': 'cats', 'text': 'Кошки и собаки'},
+    {'id': 102, 'pub_date': '2020-02-01T00:00:00+00:00',
+     'author_username': 'author', 'group_slug': '', 'text': 'Без группы'},
+    {'id': 103, 'author_username': 'nobody', 'text': 'Неизвестный автор'},
+]
+COMMENTS = [
+    {'post_id': 101, 'author_username': 'reader', 'text': 'Первый',
+     'pub_date': '2020-01-05T00:00:00+00:00'},
+    {'post_id': 101, 'author_username': 'reader', 'text': 'Второй'},
+    {'post_id': 999, 'author_username': 'reader', 'text': 'Нет поста'},
+]
+COMMENTS_102 = [{'post_id': 102, 'author_username': 'reader', 'text': 'Да'}]
+
+
+def ndjson(rows):
+    return ''.join(json.dumps(row, ensure_ascii=False) + '\n'
+                   for row in rows)
+
+
+class ImportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def write(self, name, content):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def run_import(self, **files):
+        out, err = StringIO(), StringIO()
+        call_command('import_yatube', '--no-images', stdout=out, stderr=err,
+                     **files)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_and_rebuild(self):
+        out, err = self.run_import(
+            groups=self.write('groups.csv',
+                              'title,slug,description\nКошки,cats,О кошках\n'),
+            posts=self.write('posts.ndjson', ndjson(POSTS)),
+            comments=self.write('comments.ndjson', ndjson(COMMENTS)),
+            follows=self.write('follows.csv',
+                               'user_username,author_username\n'
+                               'reader,author\nreader,reader\n'),
+        )
+        self.assertIn('строк/с', out)
+        self.assertIn("автор 'nobody' не найден", err)
+        self.assertIn('пост 999 не найден', err)
+        self.assertIn('подписка на себя', err)
+
+        post = Post.objects.get(pk=101)
+        self.assertEqual(post.group, Group.objects.get(slug='cats'))
+        self.assertEqual(post.pub_date.isoformat(),
+                         '2020-01-02T03:04:05+00:00')
+        self.assertEqual(post.updated_at.isoformat(),
+                         '2020-01-03T00:00:00+00:00')
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Comment.objects.filter(post=post).count(), 2)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(
+            Comment.objects.get(text='Первый').pub_date.isoformat(),
+            '2020-01-05T00:00:00+00:00')
+        # Сигналы не срабатывали, всё пересобрано после загрузки.
+        self.assertEqual(post.comments_count, 2)
+        self.author.profile.refresh_from_db()
+        self.assertEqual(self.author.profile.posts_count, 2)
+        self.assertEqual(self.author.profile.followers_count, 1)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2)
+        self.assertEqual(list(search.search('собаки')), [post])
+
+    def test_repeat_import_skips_existing(self):
+        path = self.write('posts.ndjson', ndjson(POSTS[1:2]))
+        comments = self.write('comments.ndjson', ndjson(COMMENTS_102))
+        self.run_import(posts=path)
+        out, err = self.run_import(posts=path, comments=comments)
+        self.assertIn('posts, строка 1: пост 102 уже загружен', err)
+        self.assertEqual(list(Post.objects.values_list('pk', flat=True)),
+                         [102])
+        # Тот же пост: комментарии к нему принимаются.
+        self.assertEqual(Comment.objects.filter(post_id=102).count(), 1)
+
+    def test_existing_id_of_other_post_is_skipped(self):
+        other = Post.objects.create(id=102, author=self.reader,
+                                    text='Чужой пост')
+        out, err = self.run_import(
+            posts=self.write('posts.ndjson', ndjson(POSTS[1:2])),
+            comments=self.write('comments.ndjson', ndjson(COMMENTS_102)),
+        )
+        self.assertIn('posts, строка 1: id 102 занят другим постом', err)
+        self.assertIn('comments, строка 1: пост 102 не из этой загрузки',
+                      err)
+        other.refresh_from_db()
+        self.assertEqual(other.text, 'Чужой пост')
+        self.assertFalse(Comment.objects.exists())
+
+    def test_reports_duplicate_ids_in_batch(self):
+        skips = []
+        total, skipped = importer.load(
+            importer.Importer(), 'posts', POSTS[1:2] * 2,
+            on_skip=lambda number, error: skips.append(number))
+        self.assertEqual((total, skipped), (2, 1))
+        self.assertEqual(skips, [2])
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_batches_use_lookup_cache(self):
+        loader = importer.Importer()
+        rows = [{'author_username': 'author', 'text': str(i)}
+                for i in range(10)]
+        # Авторы ищутся один раз, дальше по пачке: savepoint, вставка,
+        # release.
+        with self.assertNumQueries(1 + 5 * 3):
+            total, skipped = importer.load(loader, 'posts', rows,
+                                           batch_size=2)
+        self.assertEqual((total, skipped), (10, 0))
+        self.assertEqual(Post.objects.count(), 10)
+
+    def test_bad_rows_are_reported(self):
+        rows = ndjson(POSTS[:2]) + '{"id": 5,\n' + ndjson([
+            [1],
+            {'author_username': 'author', 'text': None},
+            {'author_username': 'author', 'text': 'Дата', 'pub_date': 5},
+        ])
+        comments = ndjson([
+            {'post_id': None, 'author_username': 'reader', 'text': 'Нет'},
+            {'post_id': 102, 'author_username': 'reader', 'text': None},
+        ])
+        out, err = self.run_import(
+            posts=self.write('posts.ndjson', rows),
+            comments=self.write('comments.ndjson', comments))
+        self.assertIn('posts: строк 6, пропущено 5', out)
+        self.assertIn('posts, строка 3: Expecting', err)
+        self.assertIn('posts, строка 4: строка не объект JSON', err)
+        self.assertIn("posts, строка 5: нет поля 'text'", err)
+        self.assertIn('posts, строка 6: ', err)
+        self.assertIn("comments, строка 1: нет поля 'post_id'", err)
+        self.assertIn("comments, строка 2: нет поля 'text'", err)
+        self.assertEqual(list(Post.objects.values_list('pk', flat=True)),
+                         [102])
+
+    def test_failed_batch_still_rebuilds_loaded_rows(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        with mock.patch.object(importer.Importer, 'build_comments',
+                               side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.run_import(
+                    posts=self.write('posts.ndjson', ndjson(POSTS[1:2])),
+                    comments=self.write('comments.ndjson',
+                                        ndjson(COMMENTS_102)))
+        self.author.profile.refresh_from_db()
+        self.assertEqual(self.author.profile.posts_count, 1)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post_id=102).exists())
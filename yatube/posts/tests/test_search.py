@@ -0,0 +1,96 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import search
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='')
+        cls.once = Post.objects.create(
+            text='Кошка спит на диване', author=cls.author)
+        cls.twice = Post.objects.create(
+            text='Кошка и кошка играют', author=cls.other, group=cls.group)
+        cls.unrelated = Post.objects.create(
+            text='Собака гуляет', author=cls.author)
+
+    def found(self, query, **filters):
+        return list(search.search(query, **filters)
+                    .order_by(*search.ORDERING))
+
+    def test_ranking_and_prefix(self):
+        self.assertEqual(self.found('кошк'), [self.twice, self.once])
+        self.assertEqual(self.found('КОШКА диван'), [self.once])
+        self.assertEqual(self.found('"*) OR'), [])
+
+    def test_filters(self):
+        self.assertEqual(self.found('кошка', group=self.group), [self.twice])
+        self.assertEqual(self.found('кошка', author=self.author), [self.once])
+
+    def test_index_follows_post_changes(self):
+        # Свежие копии: объекты из setUpTestData общие для всех тестов.
+        post = Post.objects.get(pk=self.unrelated.pk)
+        post.text = 'Кошка прогнала собаку'
+        post.save()
+        self.assertIn(post, self.found('кошка'))
+        Post.objects.get(pk=self.once.pk).delete()
+        self.assertNotIn(self.once, self.found('кошка'))
+        self.assertEqual(self.found('диван'), [])
+
+    def test_simple_backend_matches(self):
+        found = set(search.search('Кошка',
+                                  backend=search.SimpleBackend()))
+        self.assertEqual(found, {self.once, self.twice})
+
+    def test_rebuild_command(self):
+        Post.objects.filter(pk=self.unrelated.pk).update(text='Кошка ждёт')
+        self.assertNotIn(self.unrelated, self.found('ждёт'))
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('3', out.getvalue())
+        self.assertEqual(self.found('ждёт'), [self.unrelated])
+
+    def test_view_paginates_by_cursor(self):
+        Post.objects.bulk_create(
+            Post(text=f'Кошка номер {i}', author=self.author)
+            for i in range(12))
+        search.get_backend().rebuild()
+        client = Client()
+        url = reverse('posts:search')
+        response = client.get(url, {'q': 'кошка'})
+        first = list(response.context['page_obj'])
+        self.assertEqual(len(first), 10)
+        response = client.get(url, {
+            'q': 'кошка', 'cursor': response.context['page_obj'].next_cursor})
+        second = list(response.context['page_obj'])
+        self.assertEqual(len(second), 4)
+        self.assertFalse(set(first) & set(second))
+
+    def test_view_filters_and_empty_query(self):
+        client = Client()
+        url = reverse('posts:search')
+        response = client.get(url)
+        self.assertIsNone(response.context['page_obj'])
+        response = client.get(url, {'q': 'кошка', 'author': 'other',
+                                    'group': 'group'})
+        self.assertEqual(list(response.context['page_obj']), [self.twice])
+
+    def test_admin_uses_index(self):
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(reverse('admin:posts_post_changelist'),
+                              {'q': 'кошка'})
+        self.assertEqual(set(response.context['cl'].result_list),
+                         {self.once, self.twice})
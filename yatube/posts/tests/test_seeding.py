@@ -0,0 +1,65 @@
+import json
+import os
+import statistics
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.models import Comment, Follow, Group, Post, TimelineEntry
+from users.models import Profile
+
+
+class SeedDataTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command('seed_data', '--users', 40, '--groups', 3, '--posts',
+                     400, '--comments', 300, '--follows', 4,
+                     stdout=StringIO())
+
+    def test_counts_and_rebuild(self):
+        self.assertEqual(Profile.objects.count(), 40)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 400)
+        self.assertEqual(Comment.objects.count(), 300)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(TimelineEntry.objects.exists())
+        self.assertEqual(
+            sum(Post.objects.values_list('comments_count', flat=True)), 300)
+        comment = Comment.objects.select_related('post').first()
+        self.assertGreaterEqual(comment.pub_date, comment.post.pub_date)
+
+    def test_author_activity_is_skewed(self):
+        counts = sorted(Profile.objects.values_list('posts_count',
+                                                    flat=True))
+        self.assertEqual(sum(counts), 400)
+        self.assertGreater(counts[-1], 5 * statistics.median(counts))
+
+
+class BenchmarkViewsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command('seed_data', '--users', 10, '--groups', 2, '--posts',
+                     50, '--comments', 30, '--follows', 2,
+                     stdout=StringIO())
+
+    def test_report_and_compare(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'report.json')
+            call_command('benchmark_views', '--repeat', 2, '-o', path,
+                         stdout=StringIO())
+            with open(path, encoding='utf-8') as file:
+                report = json.load(file)
+            out = StringIO()
+            call_command('benchmark_views', 'index', '--repeat', 2, '--cold',
+                         '--compare', path, stdout=out)
+        self.assertEqual(report['meta']['rows']['post'], 50)
+        self.assertEqual(set(report['views']), {
+            'index', 'index_page_10', 'group_list', 'profile',
+            'post_detail', 'search', 'follow_index'})
+        for name, result in report['views'].items():
+            self.assertEqual(result['status'], 200, name)
+            self.assertGreaterEqual(result['p95_ms'], result['p50_ms'])
+            self.assertGreater(result['peak_kb'], 0)
+        self.assertIn('index: queries', out.getvalue())
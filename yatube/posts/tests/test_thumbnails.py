@@ -0,0 +1,128 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from ..models import Post, PostImageVariant
+from ..thumbnails import THUMBNAIL_SIZE, image_formats, render_all, store
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(name='photo.png', size=(200, 100), color='red'):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(),
+                              content_type='image/png')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    @override_settings(TASKS_EAGER=True)
+    def test_thumbnail_is_generated_on_save(self):
+        post = Post.objects.create(text='С картинкой', author=self.user,
+                                   image=make_image())
+        post.refresh_from_db()
+        self.assertTrue(post.thumbnail.name.startswith('posts/variants/'))
+        self.assertEqual((post.thumbnail_width, post.thumbnail_height),
+                         THUMBNAIL_SIZE)
+        with Image.open(post.thumbnail.path) as thumbnail:
+            self.assertEqual(thumbnail.size, THUMBNAIL_SIZE)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, post.thumbnail.url)
+
+    @override_settings(TASKS_EAGER=False)
+    def test_placeholder_until_thumbnail_is_ready(self):
+        post = Post.objects.create(text='С картинкой', author=self.user,
+                                   image=make_image())
+        post.refresh_from_db()
+        self.assertFalse(post.thumbnail)
+        response = self.client.get(reverse('posts:post_detail',
+                                           kwargs={'post_id': post.pk}))
+        self.assertContains(response, settings.POST_THUMBNAIL_PLACEHOLDER)
+
+    @override_settings(TASKS_EAGER=True)
+    def test_new_image_replaces_thumbnail(self):
+        post = Post.objects.create(text='С картинкой', author=self.user,
+                                   image=make_image())
+        post.image = make_image('other.png', color='blue')
+        post.save()
+        post.refresh_from_db()
+        with Image.open(post.thumbnail.path) as thumbnail:
+            red, green, blue = thumbnail.getpixel((480, 170))
+        self.assertGreater(blue, red)
+        post.image = None
+        post.save()
+        post.refresh_from_db()
+        self.assertFalse(post.thumbnail)
+
+    @override_settings(TASKS_EAGER=True, POST_IMAGE_WIDTHS=(320, 960))
+    def test_variants_and_srcset(self):
+        post = Post.objects.create(text='С картинкой', author=self.user,
+                                   image=make_image())
+        variants = PostImageVariant.objects.filter(post=post)
+        self.assertEqual(variants.count(), 2 * len(image_formats()))
+        small = variants.get(width=320, format=PostImageVariant.JPEG)
+        self.assertEqual(small.height, 113)
+        with Image.open(small.file.path) as image:
+            self.assertEqual(image.size, (320, 113))
+        response = self.client.get(reverse('posts:profile',
+                                           kwargs={'username': 'author'}))
+        self.assertContains(response, f'{small.file.url} 320w')
+        self.assertContains(response, 'sizes=')
+
+    @override_settings(TASKS_EAGER=False, POST_IMAGE_WIDTHS=(320, 960))
+    def test_backfill_command(self):
+        post = Post.objects.create(text='С картинкой', author=self.user,
+                                   image=make_image())
+        self.assertFalse(PostImageVariant.objects.exists())
+        call_command('build_image_variants', '--workers', '2',
+                     stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.thumbnail_width, 960)
+        self.assertEqual(
+            set(post.image_variants.values_list('width', flat=True)),
+            {320, 960})
+
+    @override_settings(TASKS_EAGER=False, POST_IMAGE_WIDTHS=(320, 960))
+    def test_stale_job_keeps_newer_result(self):
+        post = Post.objects.create(text='С картинкой', author=self.user,
+                                   image=make_image())
+        old_name = post.image.name
+        old_variants = render_all(post.image.path)
+        post.image = make_image('other.png', color='blue')
+        post.save()
+        # Задача для новой картинки закончила раньше старой.
+        self.assertTrue(store(post, post.image.name,
+                              render_all(post.image.path)))
+        post.refresh_from_db()
+        files = set(post.image_variants.values_list('file', flat=True))
+        on_disk = set(default_storage.listdir('posts/variants')[1])
+        self.assertFalse(store(post, old_name, old_variants))
+        post.refresh_from_db()
+        self.assertEqual(
+            set(post.image_variants.values_list('file', flat=True)), files)
+        self.assertIn(post.thumbnail.name, files)
+        # Опоздавшая задача не оставила своих файлов и не тронула чужие.
+        self.assertEqual(set(default_storage.listdir('posts/variants')[1]),
+                         on_disk)
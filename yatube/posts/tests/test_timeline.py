@@ -0,0 +1,108 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Follow, Post, TimelineEntry
+from .. import timeline
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.old_post = Post.objects.create(text='Старый пост',
+                                           author=cls.author)
+
+    def setUp(self):
+        self.client.force_login(self.reader)
+
+    def follow_feed(self):
+        response = self.client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_timeline(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=self.old_post).exists())
+        self.assertEqual(self.follow_feed(), [self.old_post])
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client.force_login(self.author)
+        self.client.post(reverse('posts:post_create'), {'text': 'Новый'})
+        post = Post.objects.get(text='Новый')
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post, pub_date=post.pub_date).exists())
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.other, post=post).exists())
+
+    def test_unfollow_prunes_timeline(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client.get(reverse('posts:profile_unfollow',
+                                kwargs={'username': 'author'}))
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.reader).exists())
+        self.assertEqual(self.follow_feed(), [])
+
+    @override_settings(TIMELINE_FANOUT_MAX_FOLLOWERS=0)
+    def test_popular_author_is_read_on_demand(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(text='Без раскладки',
+                                       author=self.author)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.follow_feed(), [new_post, self.old_post])
+
+    def test_rebuild_command(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', 'reader', stdout=StringIO())
+        self.assertEqual(
+            list(timeline.feed(self.reader).page()), [self.old_post])
+
+    def test_rebuild_skips_popular_authors(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.other)
+        other_post = Post.objects.create(text='Другой', author=self.other)
+        with override_settings(TIMELINE_FANOUT_MAX_FOLLOWERS=0):
+            timeline.rebuild()
+            self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(timeline.rebuild(), 2)
+        self.assertEqual(
+            set(TimelineEntry.objects.values_list('post_id', flat=True)),
+            {self.old_post.pk, other_post.pk})
+
+    @override_settings(TIMELINE_FANOUT_MAX_FOLLOWERS=1)
+    def test_pages_merge_timeline_and_read_time_authors(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.other)
+        Follow.objects.create(user=self.author, author=self.other)
+        for i in range(4):
+            Post.objects.create(text=f'Раскладка {i}', author=self.author)
+            Post.objects.create(text=f'Напрямую {i}', author=self.other)
+        self.assertFalse(TimelineEntry.objects.filter(
+            post__author=self.other).exists())
+        expected = list(Post.objects.order_by('-pub_date', '-id'))
+        paginator = timeline.TimelinePaginator(
+            self.reader, Post.objects.all(), per_page=3)
+        seen, page = [], paginator.page()
+        while True:
+            seen.extend(page)
+            if not page.has_next():
+                break
+            page = paginator.page(page.next_cursor)
+        self.assertEqual(seen, expected)
+        seen, page = [], paginator.page(paginator.page().last_cursor)
+        while True:
+            seen[:0] = page
+            if not page.has_previous():
+                break
+            page = paginator.page(page.previous_cursor)
+        self.assertEqual(seen, expected)
@@ -1,5 +1,6 @@
 from django.test import TestCase, Client
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from http import HTTPStatus
 from ..models import Post, Group, User
 
@@ -26,6 +27,7 @@ class TaskURLTests(TestCase):
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
         self.user = User.objects.create_user(username='testuser2')
+        cache.clear()
 
     def test_public_pages(self):
         url_names = {
@@ -1,16 +1,26 @@
+import shutil
+import tempfile
+
 from django import forms
-from django.test import TestCase, Client
+from django.conf import settings
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
-from ..utils import COUNT_POSTS
-from ..models import Post, Group, Follow
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from ..utils import (COMMENT_CURSOR_PARAM, COUNT_COMMENTS, COUNT_POSTS,
+                     CURSOR_PARAM, paginator)
+from ..models import Post, Group, Follow, Comment
 
 TEST_POST = 9
 User = get_user_model()
 
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
 
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class ViewsTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -44,10 +54,16 @@ class ViewsTests(TestCase):
             )
         Post.objects.bulk_create(cls.posts)
 
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
     def setUp(self):
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
+        cache.clear()
 
     def test_pages_uses_correct_template(self):
         templates_pages_names = {
@@ -109,18 +125,61 @@ class ViewsTests(TestCase):
             self.assertEqual(post_text[i], expected)
 
     def test_cache_index(self):
+        cache.clear()
         response = self.authorized_client.get(reverse('posts:index'))
         posts = response.content
-        Post.objects.create(
-            text='Тестовый текст',
-            author=self.user, )
+        Post.objects.filter(text='Тестовый пост 0').update(
+            text='Изменено в обход сигналов')
         response_old = self.authorized_client.get(reverse('posts:index'))
         post_old = response_old.content
         self.assertEqual(post_old, posts)
-        cache.clear()
+        Post.objects.create(
+            text='Тестовый текст',
+            author=self.user, )
         response_new = self.authorized_client.get(reverse('posts:index'))
         post_new = response_new.content
         self.assertNotEqual(post_old, post_new)
+        self.assertContains(response_new, 'Тестовый текст')
+
+    def test_cached_pages_differ_by_cursor(self):
+        cache.clear()
+        for number in range(COUNT_POSTS):
+            Post.objects.create(text=f'Ещё пост {number}', author=self.user)
+        first = self.authorized_client.get(reverse('posts:index'))
+        second = self.authorized_client.get(
+            reverse('posts:index'),
+            {CURSOR_PARAM: first.context['page_obj'].next_cursor})
+        self.assertNotEqual(first.content, second.content)
+        self.assertContains(second, 'Тестовый пост')
+
+    def test_cached_feeds_are_invalidated(self):
+        cache.clear()
+        post = Post.objects.create(text='Старый текст', author=self.user,
+                                   group=self.group)
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'test_slug'}),
+            reverse('posts:profile', kwargs={'username': 'testuser'}),
+        )
+        for url in urls:
+            self.authorized_client.get(url)
+        post.text = 'Новый текст'
+        post.save()
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertContains(response, 'Новый текст')
+        other_group = Group.objects.create(title='Другая', slug='other')
+        post.group = other_group
+        post.save()
+        response = self.authorized_client.get(urls[1])
+        self.assertNotContains(response, 'Новый текст')
+
+    def test_cached_feed_hit_skips_page_query(self):
+        cache.clear()
+        self.guest_client.get(reverse('posts:index'))
+        with self.assertNumQueries(0):
+            self.guest_client.get(reverse('posts:index'))
 
 
 class PaginatorViewsTest(TestCase):
@@ -147,6 +206,7 @@ class PaginatorViewsTest(TestCase):
         self.user = User.objects.create_user(username='Danya')
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
+        cache.clear()
 
     def test_first_page_contains_ten_posts(self):
         list_urls = {
@@ -163,16 +223,77 @@ class PaginatorViewsTest(TestCase):
 
     def test_second_page_contains_three_posts(self):
         list_urls = {
-            reverse('posts:index') + '?page=2': 'posts/index.html',
-            reverse('posts:group_list', kwargs={'slug': 'test_slug2'})
-            + '?page=2': 'posts/group_list.html',
-            reverse('posts:profile', kwargs={"username": "testuser2"})
-            + "?page=2": 'posts/profile.html',
+            reverse('posts:index'): 'posts/index.html',
+            reverse('posts:group_list', kwargs={'slug': 'test_slug2'}):
+                'posts/group_list.html',
+            reverse('posts:profile', kwargs={"username": "testuser2"}):
+                'posts/profile.html',
         }
         for tested_url in list_urls.keys():
-            response = self.client.get(tested_url)
-            self.assertEqual(len(response.context.get('page_obj')
-                                 .object_list), 3)
+            first_page = self.client.get(tested_url).context['page_obj']
+            response = self.client.get(
+                tested_url, {CURSOR_PARAM: first_page.next_cursor})
+            page_obj = response.context.get('page_obj')
+            self.assertEqual(len(page_obj.object_list), 3)
+            self.assertFalse(page_obj.has_next())
+            self.assertTrue(page_obj.has_previous())
+
+    def test_cursor_pages_walk_whole_feed(self):
+        request = self.client.get(reverse('posts:index')).wsgi_request
+        seen = []
+        page_obj = paginator(Post.objects.all(), request)
+        while True:
+            seen.extend(post.pk for post in page_obj)
+            if not page_obj.has_next():
+                break
+            request.GET = request.GET.copy()
+            request.GET[CURSOR_PARAM] = page_obj.next_cursor
+            page_obj = paginator(Post.objects.all(), request)
+        expected = list(Post.objects.order_by('-pub_date', '-id')
+                        .values_list('pk', flat=True))
+        self.assertEqual(seen, expected)
+        request.GET[CURSOR_PARAM] = page_obj.previous_cursor
+        previous_page = paginator(Post.objects.all(), request)
+        self.assertEqual([post.pk for post in previous_page],
+                         expected[:COUNT_POSTS])
+
+    def test_last_page_cursor(self):
+        first_page = self.client.get(reverse('posts:index')).context[
+            'page_obj']
+        response = self.client.get(
+            reverse('posts:index'), {CURSOR_PARAM: first_page.last_cursor})
+        page_obj = response.context['page_obj']
+        oldest = list(Post.objects.order_by('pub_date', 'id')
+                      .values_list('pk', flat=True)[:COUNT_POSTS])
+        self.assertEqual([post.pk for post in page_obj], oldest[::-1])
+        self.assertFalse(page_obj.has_next())
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        for cursor in ('garbage', 'WyJuIiwxXQ', 'WyJ4IixudWxsXQ'):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(
+                    reverse('posts:index'), {CURSOR_PARAM: cursor})
+                self.assertEqual(len(response.context['page_obj']),
+                                 COUNT_POSTS)
+
+    def test_cursor_page_does_not_use_offset(self):
+        first_page = self.client.get(reverse('posts:index')).context[
+            'page_obj']
+        request = self.client.get(
+            reverse('posts:index'),
+            {CURSOR_PARAM: first_page.next_cursor}).wsgi_request
+        with CaptureQueriesContext(connection) as queries:
+            list(paginator(Post.objects.all(), request))
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('OFFSET', queries[0]['sql'])
+        self.assertNotIn('COUNT', queries[0]['sql'])
+
+    def test_approximate_count(self):
+        request = self.client.get(reverse('posts:index')).wsgi_request
+        page_obj = paginator(Post.objects.all(), request,
+                             count='approximate')
+        self.assertEqual(page_obj.count, Post.objects.count())
+        self.assertTrue(page_obj.count_is_exact)
 
 
 class FollowTest(TestCase):
@@ -228,3 +349,292 @@ class FollowTest(TestCase):
         response_2 = self.authorized_client.get(reverse('posts:follow_index'))
         posts2 = response_2.context['page_obj']
         self.assertIn(post, posts2)
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Имя', last_name='Фамилия')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='feed_group', description='Описание')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.client.force_login(self.reader)
+        cache.clear()
+
+    def feed_urls(self):
+        return {
+            reverse('posts:index'): 4,
+            # Плюс запрос состояния страницы для ETag/Last-Modified.
+            reverse('posts:group_list', kwargs={'slug': 'feed_group'}): 6,
+            reverse('posts:profile', kwargs={'username': 'author'}): 7,
+            # Плюс список авторов, чьи посты читаются без раскладки.
+            reverse('posts:follow_index'): 5,
+        }
+
+    def create_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(text=f'Пост {i}', author=self.author,
+                                       group=self.group)
+            Comment.objects.create(post=post, author=self.reader,
+                                   text='Комментарий')
+
+    def test_feed_query_count_does_not_depend_on_page_size(self):
+        for posts_count in (1, COUNT_POSTS - 1):
+            self.create_posts(posts_count)
+            for url, queries in self.feed_urls().items():
+                with self.subTest(url=url, posts=Post.objects.count()):
+                    cache.clear()
+                    with self.assertNumQueries(queries):
+                        response = self.client.get(url)
+                    self.assertEqual(len(response.context['page_obj']),
+                                     Post.objects.count())
+
+    def test_feed_posts_have_comments_count(self):
+        self.create_posts(2)
+        response = self.client.get(reverse('posts:index'))
+        for post in response.context['page_obj']:
+            self.assertEqual(post.comments_count, 1)
+
+    def test_post_detail_comments_are_loaded_with_authors(self):
+        post = Post.objects.create(text='Пост', author=self.author)
+        url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        counts = []
+        for total in (1, 12):
+            Comment.objects.bulk_create(
+                Comment(post=post, author=self.reader, text=str(i))
+                for i in range(total - post.comments.count()))
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+
+class CommentThreadTest(TestCase):
+    EXTRA = 5
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+        for i in range(COUNT_COMMENTS + cls.EXTRA):
+            Comment.objects.create(post=cls.post, author=cls.reader,
+                                   text=f'Комментарий {i}')
+
+    def setUp(self):
+        cache.clear()
+        self.detail_url = reverse('posts:post_detail',
+                                  kwargs={'post_id': self.post.pk})
+        self.fragment_url = reverse('posts:post_comments',
+                                    kwargs={'post_id': self.post.pk})
+
+    def texts(self, page):
+        return [comment.text for comment in page]
+
+    def test_first_page_and_load_more(self):
+        response = self.client.get(self.detail_url)
+        comments = response.context['comments']
+        self.assertEqual(self.texts(comments),
+                         [f'Комментарий {i}' for i in range(COUNT_COMMENTS)])
+        self.assertContains(response, 'js-more-comments')
+        response = self.client.get(self.fragment_url, {
+            COMMENT_CURSOR_PARAM: comments.next_cursor, 'order': 'old'})
+        self.assertTemplateUsed(response, 'posts/includes/comment_list.html')
+        total = COUNT_COMMENTS + self.EXTRA
+        self.assertEqual(
+            self.texts(response.context['comments']),
+            [f'Комментарий {i}' for i in range(COUNT_COMMENTS, total)])
+        self.assertNotContains(response, 'js-more-comments')
+        self.assertNotContains(response, '<html')
+
+    def test_newest_first(self):
+        response = self.client.get(self.detail_url, {'order': 'new'})
+        texts = self.texts(response.context['comments'])
+        self.assertEqual(texts[0],
+                         f'Комментарий {COUNT_COMMENTS + self.EXTRA - 1}')
+
+    def test_comment_page_is_cached_until_new_comment(self):
+        self.client.get(self.detail_url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.fragment_url)
+        self.assertFalse(any('FROM "posts_comment"' in query['sql']
+                             for query in queries))
+        self.client.force_login(self.author)
+        self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'Свежий'})
+        response = self.client.get(self.fragment_url, {'order': 'new'})
+        self.assertContains(response, 'Свежий')
+
+    def test_missing_post(self):
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 10 ** 6}))
+        self.assertEqual(response.status_code, 404)
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='cond_group', description='Описание')
+        cls.post = Post.objects.create(text='Пост', author=cls.author,
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def urls(self):
+        return [
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:group_list', kwargs={'slug': 'cond_group'}),
+        ]
+
+    def test_not_modified_without_rendering(self):
+        for url in self.urls():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.has_header('Last-Modified'))
+                response = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.templates, [])
+
+    def test_if_modified_since(self):
+        url = self.urls()[2]
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(url,
+                                   HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_changes_invalidate_etag(self):
+        detail, profile, group = self.urls()
+        changes = [
+            (lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='Комментарий'),
+             [detail, profile, group]),
+            (lambda: Post.objects.create(
+                text='Ещё', author=self.author, group=self.group),
+             [detail, profile, group]),
+            (lambda: Post.objects.filter(text='Ещё').delete(),
+             [detail, profile, group]),
+            (lambda: Follow.objects.create(
+                user=self.reader, author=self.author),
+             [profile]),
+            # Под постом — имя комментатора.
+            (lambda: self.rename(self.reader, 'Читатель'), [detail]),
+        ]
+        for change, changed_urls in changes:
+            etags = {url: self.reader_client.get(url)['ETag']
+                     for url in self.urls()}
+            change()
+            for url, etag in etags.items():
+                with self.subTest(url=url, changed=changed_urls):
+                    response = self.reader_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag)
+                    self.assertEqual(response.status_code,
+                                     200 if url in changed_urls else 304)
+
+    @staticmethod
+    def rename(user, first_name):
+        user.first_name = first_name
+        user.save()
+
+    def test_etag_depends_on_viewer(self):
+        url = self.urls()[0]
+        self.assertNotEqual(self.client.get(url)['ETag'],
+                            self.reader_client.get(url)['ETag'])
+
+    def test_cache_control(self):
+        for url in self.urls() + [reverse('posts:index')]:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIn('public', response['Cache-Control'])
+                self.assertIn('max-age=60', response['Cache-Control'])
+                self.assertIn('Cookie', response['Vary'])
+                response = self.reader_client.get(url)
+                self.assertIn('private', response['Cache-Control'])
+                self.assertIn('no-cache', response['Cache-Control'])
+
+
+class PageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='page_group', description='Описание')
+        cls.post = Post.objects.create(text='Пост', author=cls.author,
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def urls(self):
+        return [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'page_group'}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ]
+
+    def test_second_request_skips_page_templates(self):
+        for url in self.urls():
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                second = self.client.get(url)
+                self.assertEqual(second.content, first.content)
+                self.assertNotIn('base.html',
+                                 [t.name for t in second.templates])
+                self.assertNotIn(b'<!--hole:', second.content)
+
+    def test_viewer_parts_are_rendered_per_request(self):
+        detail = self.urls()[3]
+        profile = self.urls()[2]
+        self.client.get(detail)
+        response = self.reader_client.get(detail)
+        self.assertContains(response, 'Пользователь: reader')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertNotContains(response, 'редактировать')
+        response = self.author_client.get(detail)
+        self.assertContains(response, 'Пользователь: author')
+        self.assertContains(response, 'редактировать')
+        response = self.client.get(detail)
+        self.assertContains(response, 'Войти')
+        self.assertNotContains(response, 'csrfmiddlewaretoken')
+
+        self.reader_client.get(profile)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertContains(self.reader_client.get(profile), 'Отписаться')
+        self.assertContains(self.client.get(profile), 'Подписаться')
+
+    def test_changes_invalidate_page(self):
+        for url in self.urls():
+            self.client.get(url)
+        Post.objects.create(text='Свежий пост', author=self.author,
+                            group=self.group)
+        for url in self.urls()[:3]:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Свежий пост')
+        detail = self.urls()[3]
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text='Новый комментарий')
+        self.assertContains(self.client.get(detail), 'Новый комментарий')
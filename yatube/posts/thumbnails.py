@@ -0,0 +1,168 @@
+"""Фоновая подготовка миниатюр и адаптивных вариантов картинок постов.
+
+Раньше миниатюру делал sorl прямо в шаблоне: на холодном кеше поток
+запроса открывал, декодировал и пережимал оригинал. Теперь после
+сохранения поста задача уходит в очередь ``core.tasks``, а шаблоны берут
+готовые URL из модели и до их появления показывают заглушку.
+
+Из оригинала получается набор ширин ``POST_IMAGE_WIDTHS`` в JPEG и, если
+Pillow собран с libwebp, в WebP. Самый широкий JPEG служит миниатюрой по
+умолчанию, остальные попадают в ``srcset``. Отрисовка (``render_all``) не
+трогает базу, поэтому её можно выполнять в отдельных процессах.
+"""
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from core.tasks import task
+
+from . import feed_cache
+from .models import Post, PostImageVariant
+
+THUMBNAIL_SIZE = (960, 339)
+THUMBNAIL_QUALITY: int = 85
+WEBP_QUALITY: int = 80
+
+
+def schedule(post_id):
+    """Ставит миниатюру в очередь после фиксации транзакции."""
+    generate.enqueue(post_id, key='thumbnails:%s' % post_id)
+
+
+def image_formats():
+    formats = [PostImageVariant.JPEG]
+    if features.check('webp'):
+        formats.append(PostImageVariant.WEBP)
+    return formats
+
+
+def _encode(image, image_format):
+    buffer = BytesIO()
+    if image_format == PostImageVariant.WEBP:
+        image.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=4)
+    else:
+        image.save(buffer, 'JPEG', quality=THUMBNAIL_QUALITY, optimize=True,
+                   progressive=True)
+    return buffer.getvalue()
+
+
+def render_all(image_file):
+    """Все варианты картинки: список словарей с размерами и байтами.
+
+    Оригинал декодируется один раз: сначала кадрируется по центру до
+    THUMBNAIL_SIZE (с увеличением мелких картинок), затем уменьшается до
+    каждой из ширин.
+    """
+    with Image.open(image_file) as image:
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        base = ImageOps.fit(image, THUMBNAIL_SIZE, Image.LANCZOS)
+    base_width, base_height = THUMBNAIL_SIZE
+    variants = []
+    widths = {min(width, base_width) for width in settings.POST_IMAGE_WIDTHS}
+    for width in sorted(widths, reverse=True):
+        height = round(base_height * width / base_width)
+        resized = base if width == base_width else base.resize(
+            (width, height), Image.LANCZOS)
+        for image_format in image_formats():
+            variants.append({
+                'width': width,
+                'height': height,
+                'format': image_format,
+                'content': _encode(resized, image_format),
+            })
+    return variants
+
+
+def render_path(post_id, image_name):
+    """Точка входа для дочерних процессов: только файлы, без базы."""
+    with default_storage.open(image_name, 'rb') as source:
+        return post_id, image_name, render_all(source)
+
+
+def _delete_files(names):
+    for name in names:
+        if name:
+            default_storage.delete(name)
+
+
+def clear(post):
+    if post.thumbnail:
+        post.thumbnail.storage.delete(post.thumbnail.name)
+    for variant in PostImageVariant.objects.filter(post_id=post.pk):
+        variant.file.storage.delete(variant.file.name)
+    PostImageVariant.objects.filter(post_id=post.pk).delete()
+    Post.objects.filter(pk=post.pk).update(
+        thumbnail='', thumbnail_width=None, thumbnail_height=None,
+        updated_at=timezone.now())
+
+
+def _replace(post, image_name, records):
+    """Ставит ``records`` на место прежних вариантов, если картинка поста
+    всё ещё ``image_name``. Возвращает имена файлов, которые больше не
+    нужны, или None, если картинку успели заменить."""
+    # Варианты идут по убыванию ширины: самый широкий JPEG — миниатюра.
+    thumbnail = next((record for record in records
+                      if record.format == PostImageVariant.JPEG), None)
+    with transaction.atomic():
+        previous = (Post.objects.select_for_update()
+                    .filter(pk=post.pk, image=image_name)
+                    .values_list('thumbnail', flat=True).first())
+        if previous is None:
+            return None
+        Post.objects.filter(pk=post.pk).update(
+            thumbnail=thumbnail.file.name if thumbnail else '',
+            thumbnail_width=thumbnail.width if thumbnail else None,
+            thumbnail_height=thumbnail.height if thumbnail else None,
+            updated_at=timezone.now(),
+        )
+        variants = PostImageVariant.objects.filter(post_id=post.pk)
+        unused = [previous, *variants.values_list('file', flat=True)]
+        variants.delete()
+        PostImageVariant.objects.bulk_create(records)
+    return unused
+
+
+def store(post, image_name, variants):
+    """Сохраняет отрисованные варианты, если картинка поста не менялась.
+
+    Прежние варианты удаляются только после того, как новые заняли их
+    место: задача, опоздавшая к уже заменённой картинке, убирает лишь
+    свои файлы и не трогает результат более новой задачи.
+    """
+    saved = []
+    for variant in variants:
+        record = PostImageVariant(
+            post_id=post.pk, width=variant['width'],
+            height=variant['height'], format=variant['format'])
+        record.file.save(
+            '%s-%s.%s' % (post.pk, variant['width'], variant['format']),
+            ContentFile(variant['content']), save=False)
+        saved.append(record)
+    unused = _replace(post, image_name, saved)
+    if unused is None:
+        _delete_files(record.file.name for record in saved)
+        return False
+    _delete_files(set(unused))
+    feed_cache.bump(feed_cache.post_scopes(post))
+    return True
+
+
+@task
+def generate(post_id):
+    post = (Post.objects.filter(pk=post_id)
+            .only('image', 'thumbnail', 'author_id', 'group_id').first())
+    if post is None:
+        return
+    if not post.image:
+        unused = _replace(post, '', [])
+        if unused is not None:
+            _delete_files(set(unused))
+        return
+    with post.image.open('rb') as source:
+        variants = render_all(source)
+    store(post, post.image.name, variants)
@@ -0,0 +1,178 @@
+"""Материализованная лента подписок (fan-out-on-write).
+
+Новый пост раскладывается по лентам подписчиков автора фоновой задачей
+после создания, поэтому follow_index читает готовый список по индексу
+``(user, pub_date, post)``. Посты авторов, у которых подписчиков больше
+``TIMELINE_FANOUT_MAX_FOLLOWERS``, не раскладываются: раскладка стоила бы
+слишком дорого, и такие посты подмешиваются в ленту при чтении.
+"""
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import prefetch_related_objects
+
+from core.tasks import task
+from users.models import Profile
+
+from . import feed_cache
+from .models import Follow, Post, PostQuerySet, TimelineEntry
+from .utils import COUNT_POSTS, CursorPaginator
+
+BATCH_SIZE: int = 1000
+
+
+def _bulk_insert(entries):
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, BATCH_SIZE))
+        if not batch:
+            break
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def is_fanout_author(author_id):
+    return not Profile.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_MAX_FOLLOWERS).exists()
+
+
+def read_time_authors(user):
+    """Авторы из подписок пользователя, чьи посты читаются напрямую."""
+    return Follow.objects.filter(
+        user=user,
+        author__profile__followers_count__gt=(
+            settings.TIMELINE_FANOUT_MAX_FOLLOWERS)).values('author')
+
+
+def fan_out(post):
+    if not is_fanout_author(post.author_id):
+        return
+    # Подписчиков у таких авторов не больше
+    # TIMELINE_FANOUT_MAX_FOLLOWERS, список помещается в память.
+    followers = list(Follow.objects.filter(author_id=post.author_id)
+                     .values_list('user_id', flat=True))
+    _bulk_insert(
+        TimelineEntry(user_id=user_id, post_id=post.pk,
+                      pub_date=post.pub_date)
+        for user_id in followers
+    )
+    # Ленты могли попасть в кеш между публикацией и раскладкой.
+    feed_cache.bump(feed_cache.follower_scope(user_id)
+                    for user_id in followers)
+
+
+@task
+def publish(post_id):
+    post = (Post.objects.filter(pk=post_id)
+            .only('author_id', 'pub_date').first())
+    if post is not None:
+        fan_out(post)
+
+
+def backfill(user_id, author_id):
+    if not is_fanout_author(author_id):
+        return
+    posts = (Post.objects.filter(author_id=author_id)
+             .values_list('pk', 'pub_date'))
+    _bulk_insert(
+        TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts.iterator()
+    )
+
+
+def prune(user_id, author_id):
+    TimelineEntry.objects.filter(user_id=user_id,
+                                 post__author_id=author_id).delete()
+
+
+@task
+def sync_follow(user_id, author_id):
+    """Приводит ленту к подписке, какой она стала к запуску задачи:
+    пока задача ждала очереди, подписку могли отменить или вернуть."""
+    if Follow.objects.filter(user_id=user_id, author_id=author_id).exists():
+        backfill(user_id, author_id)
+    else:
+        prune(user_id, author_id)
+    feed_cache.bump([feed_cache.follower_scope(user_id)])
+
+
+def rebuild(user_ids=None):
+    follows = Follow.objects.all()
+    entries = TimelineEntry.objects.all()
+    if user_ids is not None:
+        follows = follows.filter(user_id__in=user_ids)
+        entries = entries.filter(user_id__in=user_ids)
+    entries.delete()
+    # Одним INSERT ... SELECT: по запросу на подписку пересборка
+    # миллионов записей заняла бы часы.
+    rows = (follows.exclude(author__profile__followers_count__gt=(
+        settings.TIMELINE_FANOUT_MAX_FOLLOWERS))
+        .filter(author__posts__isnull=False)
+        .values_list('user_id', 'author__posts__id',
+                     'author__posts__pub_date'))
+    sql, params = rows.query.sql_with_params()
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute('INSERT INTO %s (%s, %s, %s) %s' % (
+            quote(TimelineEntry._meta.db_table), quote('user_id'),
+            quote('post_id'), quote('pub_date'), sql), params)
+    return follows.count()
+
+
+class TimelinePaginator(CursorPaginator):
+    """Лента подписок по ключу ``(pub_date, id)``.
+
+    Страница собирается из двух запросов по ``per_page + 1`` строк:
+    записи материализованной ленты по индексу ``(user, pub_date, post)``
+    и посты авторов, читаемых напрямую. Оба начинаются с позиции
+    курсора, так что страница стоит одинаково в любом месте ленты.
+    """
+
+    def __init__(self, user, queryset, per_page=COUNT_POSTS):
+        super().__init__(queryset, per_page)
+        self.user = user
+        self._authors = None
+
+    @property
+    def read_time_authors(self):
+        if self._authors is None:
+            self._authors = list(read_time_authors(self.user)
+                                 .values_list('author', flat=True))
+        return self._authors
+
+    def queries(self, position=None, backwards=False):
+        entries = (
+            TimelineEntry.objects.filter(user=self.user)
+            .select_related('post__author', 'post__group')
+            .only('pub_date', *('post__%s' % field
+                                for field in PostQuerySet.FEED_FIELDS)))
+        yield CursorPaginator(
+            entries, self.per_page, ordering=('-pub_date', '-post_id'),
+        ).query(position, backwards)
+        if self.read_time_authors:
+            # Варианты картинок догружаются разом для всей страницы.
+            posts = (self.queryset.filter(author__in=self.read_time_authors)
+                     .prefetch_related(None))
+            yield CursorPaginator(posts, self.per_page).query(position,
+                                                              backwards)
+
+    def fetch(self, position=None, backwards=False):
+        posts = {}
+        for query in self.queries(position, backwards):
+            for row in query:
+                post = row.post if isinstance(row, TimelineEntry) else row
+                # Пост мог попасть в ленту до того, как автор стал
+                # читаться напрямую.
+                posts[post.pk] = post
+        rows = sorted(posts.values(), key=lambda post: (post.pub_date,
+                                                        post.pk),
+                      reverse=not backwards)[:self.per_page + 1]
+        prefetch_related_objects(rows, 'image_variants')
+        return rows
+
+
+def feed(user, queryset=None):
+    if queryset is None:
+        queryset = Post.objects.all()
+    return TimelinePaginator(user, queryset)
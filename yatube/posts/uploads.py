@@ -0,0 +1,105 @@
+"""Проверка и нормализация картинок, которые загружают в посты.
+
+Размеры картинки читаются из заголовка, без декодирования пикселей, так
+что слишком большие снимки отбрасываются сразу. Принятый оригинал
+уменьшается до ``POST_IMAGE_MAX_SIDE`` по большей стороне и теряет EXIF
+(поворот из EXIF при этом применяется к пикселям). Результат пишется во
+временный файл, который уходит на диск после ``SPOOL_SIZE`` байт, и
+сохраняется в хранилище по кускам.
+"""
+import math
+import os
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+
+SPOOL_SIZE: int = 1024 * 1024
+JPEG_QUALITY: int = 90
+WEBP_QUALITY: int = 90
+# Форматы, в которых оригинал пересохраняется как есть; прочие
+# (BMP, TIFF и т.п.) после нормализации становятся PNG.
+SAVE_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp'}
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp', 'photoshop')
+
+
+def _open(upload):
+    upload.seek(0)
+    if hasattr(upload, 'temporary_file_path'):
+        return Image.open(upload.temporary_file_path())
+    return Image.open(upload)
+
+
+def check(upload):
+    """Отклоняет файл по размеру и по числу пикселей из заголовка."""
+    max_size = settings.POST_IMAGE_MAX_UPLOAD_SIZE
+    if upload.size > max_size:
+        raise ValidationError(
+            'Файл больше %(limit)s.',
+            code='file_too_large',
+            params={'limit': filesizeformat(max_size)},
+        )
+    with _open(upload) as image:
+        width, height = image.size
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Слишком большое изображение: %(width)s×%(height)s.',
+            code='too_many_pixels',
+            params={'width': width, 'height': height},
+        )
+
+
+def _needs_normalizing(image):
+    if max(image.size) > settings.POST_IMAGE_MAX_SIDE:
+        return True
+    return any(key in image.info for key in METADATA_KEYS)
+
+
+def _save_options(image_format, image):
+    options = {}
+    if image.info.get('icc_profile'):
+        options['icc_profile'] = image.info['icc_profile']
+    if image_format == 'JPEG':
+        options.update(quality=JPEG_QUALITY, optimize=True)
+    elif image_format == 'WEBP':
+        options.update(quality=WEBP_QUALITY)
+    elif 'transparency' in image.info:
+        options['transparency'] = image.info['transparency']
+    return options
+
+
+def normalize(upload):
+    """Уменьшенная копия без метаданных или сам ``upload``, если она
+    не нужна. Анимацию не трогаем: её ограничивает ``check``.
+    """
+    with _open(upload) as image:
+        if getattr(image, 'is_animated', False) or (
+                not _needs_normalizing(image)):
+            upload.seek(0)
+            return upload
+        image_format = image.format if image.format in SAVE_FORMATS else 'PNG'
+        max_side = settings.POST_IMAGE_MAX_SIDE
+        ratio = min(1, max_side / max(image.size))
+        # JPEG умеет декодироваться сразу с уменьшением в 2–8 раз:
+        # полноразмерный снимок в память не попадает.
+        image.draft('RGB', (math.ceil(image.width * ratio),
+                            math.ceil(image.height * ratio)))
+        options = _save_options(image_format, image)
+        result = ImageOps.exif_transpose(image)
+    result.thumbnail((max_side, max_side), Image.LANCZOS)
+    if image_format == 'JPEG' and result.mode not in ('RGB', 'L', 'CMYK'):
+        result = result.convert('RGB')
+    # PNG берёт EXIF не из параметров save, а из info картинки.
+    for key in METADATA_KEYS:
+        result.info.pop(key, None)
+    output = SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    result.save(output, image_format, **options)
+    size = output.tell()
+    output.seek(0)
+    name = '%s.%s' % (os.path.splitext(os.path.basename(upload.name))[0],
+                      SAVE_FORMATS[image_format])
+    return UploadedFile(output, name=name, size=size,
+                        content_type=Image.MIME[image_format])
@@ -1,10 +1,271 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connection
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
 
 COUNT_POSTS: int = 10
+CURSOR_PARAM: str = 'cursor'
+APPROXIMATE_COUNT_LIMIT: int = 1000
+FEED_ORDERING = ('-pub_date', '-id')
+COUNT_COMMENTS: int = 20
+COMMENT_CURSOR_PARAM: str = 'comment_cursor'
+COMMENT_ORDERINGS = {
+    'old': ('pub_date', 'id'),
+    'new': ('-pub_date', '-id'),
+}
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(direction, position=None):
+    raw = json.dumps([direction, position], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает (направление, позиция) или None для битого курсора."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, position = json.loads(
+            base64.urlsafe_b64decode(padded.encode()).decode())
+    except (binascii.Error, ValueError, TypeError, UnicodeDecodeError):
+        return None
+    if direction not in (NEXT, PREVIOUS):
+        return None
+    if position is not None and not isinstance(position, list):
+        return None
+    return direction, position
+
+
+class CursorPage(Sequence):
+    """Страница ленты, выбранная по ключу, а не по OFFSET.
+
+    Объекты загружаются лениво при первом обращении, поэтому страница,
+    которую отдал кеш шаблона, не стоит ни одного запроса к базе.
+    """
+
+    def __init__(self, paginator, direction=None, position=None):
+        self.paginator = paginator
+        self.direction = direction
+        self.position = position
+        self._object_list = None
+        self._has_more = False
+
+    def _fetch(self):
+        if self._object_list is not None:
+            return
+        per_page = self.paginator.per_page
+        backwards = self.direction == PREVIOUS
+        rows = self.paginator.fetch(self.position, backwards)
+        self._has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        if backwards:
+            rows.reverse()
+        self._object_list = rows
+
+    @property
+    def object_list(self):
+        self._fetch()
+        return self._object_list
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __repr__(self):
+        return '<CursorPage %s>' % (self.direction or 'first')
+
+    def _more_before(self):
+        self._fetch()
+        if self.direction == PREVIOUS:
+            return self._has_more
+        return self.position is not None
+
+    def _more_after(self):
+        self._fetch()
+        if self.direction == PREVIOUS:
+            return self.position is not None
+        return self._has_more
+
+    def has_next(self):
+        return bool(self.object_list) and self._more_after()
+
+    def has_previous(self):
+        return bool(self.object_list) and self._more_before()
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        if not self.has_next():
+            return None
+        return encode_cursor(
+            NEXT, self.paginator.position_of(self.object_list[-1]))
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous():
+            return None
+        return encode_cursor(
+            PREVIOUS, self.paginator.position_of(self.object_list[0]))
+
+    @property
+    def last_cursor(self):
+        return encode_cursor(PREVIOUS)
+
+    @property
+    def count(self):
+        return self.paginator.count
+
+    @property
+    def count_is_exact(self):
+        return self.paginator.count_is_exact
+
+
+class CursorPaginator:
+    """Пагинация по ключу сортировки (по умолчанию ``(pub_date, id)``).
+
+    Стоимость любой страницы одинакова: запрос ищет строки строго после
+    (или до) последнего показанного ключа и читает ``per_page + 1`` строк,
+    без ``OFFSET`` и без ``COUNT(*)``. Последнее поле сортировки должно
+    быть уникальным.
+    """
+
+    def __init__(self, queryset, per_page=COUNT_POSTS,
+                 ordering=FEED_ORDERING, count=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = list(ordering)
+        self.count_mode = count
+        self._count = None
+
+    @property
+    def fields(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def position_of(self, obj):
+        return [_dump_value(getattr(obj, field)) for field in self.fields]
+
+    def seek_filter(self, values, backwards=False):
+        """Условие ``(a, b) > (x, y)`` в виде, понятном любой СУБД."""
+        condition = Q()
+        for i, ordering in enumerate(self.ordering):
+            descending = ordering.startswith('-') != backwards
+            lookup = '%s__%s' % (self.fields[i], 'lt' if descending else 'gt')
+            step = Q(**{lookup: values[i]})
+            for field, value in zip(self.fields[:i], values[:i]):
+                step &= Q(**{field: value})
+            condition |= step
+        # Избыточное условие на первое поле даёт базе начать чтение
+        # индекса с позиции, а не с начала.
+        descending = self.ordering[0].startswith('-') != backwards
+        first = '%s__%s' % (self.fields[0], 'lte' if descending else 'gte')
+        return Q(**{first: values[0]}) & condition
+
+    def query(self, position=None, backwards=False):
+        """Запрос ``per_page + 1`` строк после позиции в порядке обхода."""
+        queryset = self.queryset
+        ordering = self.ordering
+        if backwards:
+            ordering = [_invert(field) for field in ordering]
+        if position is not None:
+            queryset = queryset.filter(self.seek_filter(position, backwards))
+        return queryset.order_by(*ordering)[:self.per_page + 1]
+
+    def fetch(self, position=None, backwards=False):
+        return list(self.query(position, backwards))
+
+    def load_position(self, position):
+        """Разбирает позицию из курсора, ValueError для чужих данных."""
+        if len(position) != len(self.fields):
+            raise ValueError('Неверная длина курсора')
+        values = []
+        for name, value in zip(self.fields, position):
+            try:
+                field = self.queryset.model._meta.get_field(name)
+            except FieldDoesNotExist:
+                values.append(value)
+                continue
+            if field.get_internal_type() == 'DateTimeField':
+                value = parse_datetime(str(value))
+                if value is None:
+                    raise ValueError('Неверная дата в курсоре')
+            else:
+                value = field.to_python(value)
+            values.append(value)
+        return values
+
+    def page(self, token=None):
+        cursor = decode_cursor(token)
+        if cursor is None:
+            return CursorPage(self)
+        direction, position = cursor
+        if position is not None:
+            try:
+                position = self.load_position(position)
+            except (ValueError, TypeError, ValidationError):
+                return CursorPage(self)
+        return CursorPage(self, direction, position)
+
+    @property
+    def count(self):
+        if self.count_mode is None:
+            return None
+        if self._count is None:
+            self._count = self._compute_count()
+        return self._count
+
+    @property
+    def count_is_exact(self):
+        if self.count_mode == 'exact':
+            return True
+        count = self.count
+        return count is not None and count < APPROXIMATE_COUNT_LIMIT
+
+    def _compute_count(self):
+        if self.count_mode == 'exact':
+            return self.queryset.count()
+        estimate = _table_estimate(self.queryset)
+        if estimate is not None:
+            return estimate
+        return self.queryset.order_by()[:APPROXIMATE_COUNT_LIMIT].count()
+
+
+def _invert(field):
+    return field[1:] if field.startswith('-') else '-' + field
+
+
+def _dump_value(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def _table_estimate(queryset):
+    """Оценка размера таблицы из статистики PostgreSQL без фильтров."""
+    if connection.vendor != 'postgresql' or queryset.query.where:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+            [queryset.model._meta.db_table])
+        row = cursor.fetchone()
+    if not row or row[0] < APPROXIMATE_COUNT_LIMIT:
+        return None
+    return row[0]
 
 
-def paginator(queryset, request):
-    paginator = Paginator(queryset, COUNT_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return page_obj
+def paginator(queryset, request, count=None, ordering=FEED_ORDERING):
+    return CursorPaginator(queryset, count=count, ordering=ordering).page(
+        request.GET.get(CURSOR_PARAM))
@@ -1,55 +1,250 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from .utils import paginator
-from .models import Post, Group, User, Follow
-from .forms import PostForm, CommentForm
+from django.http import Http404, HttpResponseBadRequest, StreamingHttpResponse
+from django.db.models import Max, OuterRef, Subquery
 
+from core.db_router import read_only
+from core.decorators import (cache_policy, conditional_page,
+                             page_state)
+from core.page_cache import cached_page
+from core.sse import EventStreamResponse, event_stream_view
+from . import events, export as post_export, feed_cache
+from . import search as post_search, timeline
+from .utils import (COMMENT_CURSOR_PARAM, COMMENT_ORDERINGS, COUNT_COMMENTS,
+                    CURSOR_PARAM, CursorPaginator, paginator)
+from .models import Comment, Post, Group, User, Follow
+from .forms import PostForm, CommentForm, ExportForm, SearchForm
 
+
+def _latest(*moments):
+    moments = [moment for moment in moments if moment is not None]
+    return max(moments) if moments else None
+
+
+def is_following(request, author_id):
+    """Подписан ли зритель на автора; один запрос на весь запрос."""
+    if not request.user.is_authenticated:
+        return False
+    following = request.__dict__.setdefault('_following', {})
+    if author_id not in following:
+        following[author_id] = Follow.objects.filter(
+            user=request.user, author_id=author_id).exists()
+    return following[author_id]
+
+
+def _last_updated(**filters):
+    """Время последней правки поста: один шаг по индексу
+    ``(автор или группа, updated_at)``, а не обход всех постов."""
+    return Subquery(Post.objects.filter(**filters).order_by('-updated_at')
+                    .values('updated_at')[:1])
+
+
+def group_state(request, slug):
+    state = (Group.objects.filter(slug=slug)
+             .annotate(last=_last_updated(group=OuterRef('pk')))
+             .values_list('pk', 'title', 'description', 'last').first())
+    if state is None:
+        return None
+    # Поколение ленты группы меняется и при удалении поста.
+    return state[-1], (*state, feed_cache.generations(
+        [feed_cache.group_scope(state[0])]))
+
+
+def profile_state(request, username):
+    state = (User.objects.filter(username=username)
+             .annotate(last=_last_updated(author=OuterRef('pk')))
+             .values_list('pk', 'first_name', 'last_name',
+                          'profile__posts_count', 'profile__followers_count',
+                          'profile__following_count', 'last').first())
+    if state is None:
+        return None
+    return state[-1], (*state, feed_cache.generations(
+        [feed_cache.author_scope(state[0])]), is_following(request, state[0]))
+
+
+def post_state(request, post_id):
+    state = (Post.objects.filter(pk=post_id)
+             .annotate(last_comment=Max('comments__updated_at'))
+             .values_list('updated_at', 'last_comment', 'comments_count',
+                          'author__username', 'author__profile__posts_count',
+                          'group__title', 'author_id').first())
+    if state is None:
+        return None
+    # Поколение комментариев меняется и при смене имени комментатора.
+    return _latest(state[0], state[1]), (*state, feed_cache.generations(
+        [feed_cache.comments_scope(post_id)]))
+
+
+# Ключи страниц в общем кеше: без зрителя (его части — дыры шаблонов),
+# зато с поколениями областей, из которых собрана лента.
+
+def index_key(request):
+    return [feed_cache.generations([feed_cache.ALL])]
+
+
+def group_key(request, slug):
+    state = page_state(request)
+    return None if state is None else list(state[1])
+
+
+def profile_key(request, username):
+    state = page_state(request)
+    # Последнее значение состояния — подписан ли зритель.
+    return None if state is None else list(state[1][:-1])
+
+
+def post_key(request, post_id):
+    state = page_state(request)
+    if state is None:
+        return None
+    # Предпоследнее значение состояния — автор поста.
+    return [*state[1], feed_cache.generations(
+        [feed_cache.author_scope(state[1][-2])])]
+
+
+@read_only
+@cache_policy
+@cached_page(index_key)
 def index(request):
-    page_obj = paginator(Post.objects.all(), request)
+    page_obj = paginator(Post.objects.for_feed(), request)
     context = {
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        'feed_cache': feed_cache.FeedCache(
+            'index', [feed_cache.ALL], page_obj),
     }
     return render(request, 'posts/index.html', context)
 
 
+@read_only
+@cache_policy
+@conditional_page(group_state)
+@cached_page(group_key)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    page_obj = paginator(Post.objects.filter(group=group), request)
+    page_obj = paginator(Post.objects.for_feed().filter(group=group),
+                         request)
     context = {
         'group': group,
         'page_obj': page_obj,
+        'feed_cache': feed_cache.FeedCache(
+            'group_posts', [feed_cache.group_scope(group.pk)], page_obj),
     }
     return render(request, "posts/group_list.html", context)
 
 
+@read_only
+@cache_policy
+@conditional_page(profile_state)
+@cached_page(profile_key)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    page_obj = paginator(Post.objects.filter(author=author), request)
-    following = (request.user.is_authenticated
-                 and Follow.objects.filter(
-                     user=request.user,
-                     author=author).exists())
+    author = get_object_or_404(User.objects.select_related('profile'),
+                               username=username)
+    page_obj = paginator(Post.objects.for_feed().filter(author=author),
+                         request)
     context = {
         'author': author,
         'page_obj': page_obj,
-        'following': following,
+        'feed_cache': feed_cache.FeedCache(
+            'profile', [feed_cache.author_scope(author.pk)], page_obj),
     }
     return render(request, 'posts/profile.html', context)
 
 
+@read_only
+def search(request):
+    form = SearchForm(request.GET or None)
+    page_obj = None
+    if form.is_valid() and post_search.words(form.cleaned_data['q']):
+        posts = post_search.search(
+            form.cleaned_data['q'],
+            Post.objects.for_feed(),
+            group=form.cleaned_data['group'],
+            author=form.cleaned_data['author'],
+        )
+        page_obj = paginator(posts, request, ordering=post_search.ORDERING)
+    context = {
+        'form': form,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@read_only
+@cache_policy
+@conditional_page(post_state)
+@cached_page(post_key)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    check = True if request.user == post.author else False
-    form = CommentForm()
+    post = get_object_or_404(
+        Post.objects.select_related('author__profile', 'group'), id=post_id)
     context = {
         'post': post,
-        'check': check,
-        'form': form,
+        **comments_context(request, post),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def comments_context(request, post):
+    """Страница комментариев и ключ её кеша, общего для всех зрителей."""
+    order = request.GET.get('order')
+    if order not in COMMENT_ORDERINGS:
+        order = 'old'
+    comments = CursorPaginator(
+        post.comments.select_related('author'), per_page=COUNT_COMMENTS,
+        ordering=COMMENT_ORDERINGS[order],
+    ).page(request.GET.get(COMMENT_CURSOR_PARAM))
+    return {
+        'comments': comments,
+        'comments_order': order,
+        'comments_cache': feed_cache.FeedCache(
+            'comments:%s:%s' % (post.pk, order),
+            [feed_cache.comments_scope(post.pk)], comments),
+    }
+
+
+@read_only
+@cache_policy
+@conditional_page(post_state)
+def post_comments(request, post_id):
+    """Следующая страница комментариев для кнопки «Показать ещё»."""
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    return render(request, 'posts/includes/comment_list.html',
+                  {'post': post, **comments_context(request, post)})
+
+
+@read_only
+def comment(request, post_id, comment_id):
+    """Один комментарий: его дописывает на страницу поток событий."""
+    comment = get_object_or_404(Comment.objects.select_related('author'),
+                                pk=comment_id, post_id=post_id)
+    return render(request, 'posts/includes/comment.html',
+                  {'comment': comment})
+
+
+@read_only
+def post_card(request, post_id):
+    """Пост в разметке ленты для новых постов в follow_index."""
+    post = get_object_or_404(Post.objects.for_feed(), pk=post_id)
+    return render(request, 'includes/post.html', {'post': post})
+
+
+@event_stream_view
+def comment_events(request, post_id):
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    return EventStreamResponse([events.comments_channel(post_id)],
+                               request.META.get('HTTP_LAST_EVENT_ID'))
+
+
+@event_stream_view
+@login_required
+def follow_events(request):
+    authors = (Follow.objects.filter(user=request.user)
+               .values_list('author_id', flat=True))
+    return EventStreamResponse(
+        [events.author_channel(author_id) for author_id in authors],
+        request.META.get('HTTP_LAST_EVENT_ID'))
+
+
 @login_required
 def post_create(request):
     is_edit = False
@@ -98,11 +293,18 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@read_only
 @login_required
 def follow_index(request):
-    page_obj = paginator(Post.objects.filter
-                         (author__following__user=request.user), request)
-    context = {'page_obj': page_obj}
+    page_obj = timeline.feed(request.user, Post.objects.for_feed()).page(
+        request.GET.get(CURSOR_PARAM))
+    context = {
+        'page_obj': page_obj,
+        'feed_cache': feed_cache.FeedCache(
+            'follow_index:%s' % request.user.pk,
+            [feed_cache.ALL, feed_cache.follower_scope(request.user.pk)],
+            page_obj),
+    }
     return render(request, 'posts/follow.html', context)
 
 
@@ -121,3 +323,20 @@ def profile_unfollow(request, username):
     if Follow.objects.filter(user=user, author__username=username).exists():
         Follow.objects.filter(user=user, author__username=username).delete()
     return redirect("posts:profile", username=username)
+
+
+@staff_member_required
+def export(request, kind):
+    if kind not in post_export.EXPORTS:
+        raise Http404
+    form = ExportForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest(form.errors.as_text())
+    export_format = form.cleaned_data['format']
+    content_type, extension = post_export.FORMATS[export_format]
+    response = StreamingHttpResponse(
+        post_export.export(kind, export_format, **form.filters()),
+        content_type='%s; charset=utf-8' % content_type)
+    response['Content-Disposition'] = (
+        'attachment; filename="%s.%s"' % (kind, extension))
+    return response
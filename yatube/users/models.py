@@ -1,3 +1,24 @@
+from django.contrib.auth import get_user_model
+from django.db import models
 
+User = get_user_model()
 
-# Create your models here.
+
+class Profile(models.Model):
+    """Денормализованные счётчики пользователя.
+
+    Счётчики меняются атомарно через F() в сигналах posts, расхождения
+    исправляет команда reconcile_counters.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='profile',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    def __str__(self):
+        return str(self.user)
@@ -42,6 +42,7 @@ INSTALLED_APPS = [
     'posts.apps.PostsConfig',
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
+    'api.apps.ApiConfig',
     'about.apps.AboutConfig',
     'django.contrib.admin',
     'django.contrib.auth',
@@ -54,7 +55,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.performance.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.db_router.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -93,12 +96,62 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+DB_ENGINES = {
+    'sqlite': 'django.db.backends.sqlite3',
+    'postgresql': 'django.db.backends.postgresql',
+}
+DB_ENGINE = os.getenv('DB_ENGINE', default='sqlite')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'ENGINE': DB_ENGINES[DB_ENGINE],
+        'NAME': os.getenv(
+            'DB_NAME', default=os.path.join(BASE_DIR, 'db.sqlite3')),
+        'USER': os.getenv('DB_USER', default=''),
+        'PASSWORD': os.getenv('DB_PASSWORD', default=''),
+        'HOST': os.getenv('DB_HOST', default=''),
+        'PORT': os.getenv('DB_PORT', default=''),
+        # Соединение живёт между запросами одного потока; пул из
+        # нескольких процессов лучше держать во внешнем pgbouncer.
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', default=60)),
+        # Проверка живости перед переиспользованием, см. core.db.
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
     }
 }
+if DB_ENGINE == 'sqlite':
+    # Сколько секунд писатель ждёт занятую базу, прежде чем упасть
+    # с "database is locked".
+    DATABASES['default']['OPTIONS']['timeout'] = 20
+
+# Реплики только для чтения: хосты для PostgreSQL или файлы для SQLite
+# через запятую. Остальные параметры берутся у default.
+REPLICA_DATABASES = []
+for number, location in enumerate(
+        filter(None, os.getenv('DB_REPLICAS', default='').split(',')), 1):
+    alias = f'replica_{number}'
+    DATABASES[alias] = dict(
+        DATABASES['default'],
+        # В тестах реплики смотрят в тестовую default.
+        TEST={'MIRROR': 'default'},
+        **({'NAME': location} if DB_ENGINE == 'sqlite'
+           else {'HOST': location}),
+    )
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+# Сколько секунд после записи пользователь читает с основной базы.
+REPLICA_PIN_SECONDS = 10
+REPLICA_PIN_COOKIE = 'pin_primary'
+
+# Применяются к каждому новому соединению SQLite. WAL даёт читателям
+# работать параллельно с писателем, NORMAL в режиме WAL не теряет
+# целостность и не делает fsync на каждый коммит.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+}
 
 
 # Password validation
@@ -143,8 +196,101 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Кеш выбирается через окружение. locmem живёт внутри процесса, поэтому
+# при нескольких воркерах нужен общий кеш: file, memcached или redis
+# (подойдёт и встроенный сервер: python manage.py runcacheserver).
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'memcached': 'django.core.cache.backends.memcached.MemcachedCache',
+    'redis': 'core.cache_backends.redis.RedisCache',
+}
+CACHE_DEFAULT_LOCATIONS = {
+    'locmem': '',
+    'file': os.path.join(BASE_DIR, 'cache'),
+    'memcached': '127.0.0.1:11211',
+    'redis': 'redis://127.0.0.1:6379/0',
+}
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', default='locmem')
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION',
+            default=CACHE_DEFAULT_LOCATIONS[CACHE_BACKEND]),
+        'KEY_PREFIX': os.getenv('CACHE_KEY_PREFIX', default='yatube'),
     }
 }
+
+# Фрагменты лент сбрасываются сигналами при изменении постов,
+# поэтому их можно хранить долго.
+FEED_CACHE_TIMEOUT = 60 * 5
+# Страницы лент, профилей и постов целиком (core.page_cache); ключ
+# меняется вместе с содержимым, срок лишь ограничивает память.
+PAGE_CACHE_TIMEOUT = 60 * 5
+
+# Авторы с большим числом подписчиков не раскладываются по лентам
+# при публикации, их посты подмешиваются в follow_index при чтении.
+TIMELINE_FANOUT_MAX_FOLLOWERS = 1000
+
+# Миниатюры постов готовит фоновая задача после сохранения поста.
+POST_THUMBNAIL_PLACEHOLDER = 'img/post-placeholder.svg'
+# Ширины адаптивных вариантов картинок для srcset.
+POST_IMAGE_WIDTHS = (320, 640, 960)
+
+# Загрузка картинок постов. Файлы больше FILE_UPLOAD_MAX_MEMORY_SIZE
+# Django сам пишет во временный файл, а не держит в памяти.
+POST_IMAGE_MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+# Предел по заголовку, до декодирования пикселей.
+POST_IMAGE_MAX_PIXELS = 50 * 1000 * 1000
+# Оригиналы крупнее уменьшаются до этого размера по большей стороне.
+POST_IMAGE_MAX_SIDE = 2560
+
+# Сколько секунд общий кеш перед приложением может отдавать
+# страницы анонимам без перепроверки.
+ANONYMOUS_CACHE_MAX_AGE = 60
+
+# JSON API: размер страницы по умолчанию и предел для ?limit=.
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+
+# Замеры запросов (core.performance): заголовок Server-Timing, журнал
+# медленных запросов и метрики Prometheus на /metrics/ для адресов из
+# METRICS_ALLOWED_IPS.
+PERFORMANCE_SERVER_TIMING = True
+PERFORMANCE_SLOW_REQUEST_MS = int(
+    os.getenv('PERFORMANCE_SLOW_REQUEST_MS', default=500))
+PERFORMANCE_SLOW_QUERIES_LOGGED = 5
+METRICS_ALLOWED_IPS = os.getenv(
+    'METRICS_ALLOWED_IPS', default='127.0.0.1').split(',')
+# Поиск N+1: '' — выключен, 'log' — в журнал (для стенда), 'raise' —
+# исключение (включает core.testing). Срабатывает, когда запрос
+# одного вида повторяется больше NPLUSONE_THRESHOLD раз за запрос.
+NPLUSONE_MODE = os.getenv('NPLUSONE_MODE', default='')
+NPLUSONE_THRESHOLD = int(os.getenv('NPLUSONE_THRESHOLD', default=5))
+
+# Потоки, в которых yatube.asgi исполняет представления: столько
+# запросов одновременно работают с базой.
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', default=32))
+
+# Фоновые задачи (core.tasks): аренда задачи воркером, база паузы перед
+# повтором (удваивается с каждой попыткой) и потоки run_worker. С
+# TASKS_EAGER задачи выполняются сразу при постановке, без воркера.
+TASKS_LEASE = 300
+TASKS_RETRY_DELAY = 10
+TASKS_WORKER_THREADS = int(os.getenv('TASKS_WORKER_THREADS', default=4))
+TASKS_EAGER = os.getenv('TASKS_EAGER', default='') == '1'
+
+# События для потоков SSE (core.pubsub, core.sse): где хранится журнал
+# и сколько живёт событие, как часто поток опрашивает журнал, пингует
+# клиента, через сколько секунд закрывается и через сколько
+# миллисекунд EventSource переподключается.
+PUBSUB_BROKER = 'core.pubsub.CacheBroker'
+PUBSUB_RETENTION = 300
+SSE_POLL_INTERVAL = 1
+SSE_HEARTBEAT = 15
+SSE_MAX_AGE = 300
+SSE_RETRY_MS = 3000
+
+TEST_RUNNER = 'core.test_runner.TestRunner'